@@ -13,6 +13,7 @@
     ],
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "views/db_conn.xml",
         "views/migration_field.xml",
         "views/old_field.xml",
@@ -1,4 +1,5 @@
 from . import db_conn
 from . import migration_table
 from . import migration_field
+from . import migration_id_map
 from . import old_field
@@ -1,11 +1,15 @@
 from odoo import api, models, fields
-import xmlrpc.client
-import psycopg2
 import logging
 import ast
 import re
+import time
 from markupsafe import Markup
 
+from ..tools.id_cache import get_id_cache
+from ..tools.pool import get_pool, release
+from ..tools.rpc import PagedReader, get_rpc_session
+from ..tools.scheduler import DagScheduler, topological_stages
+
 _logger = logging.getLogger(__name__)
 
 
@@ -30,17 +34,159 @@ class DBconnection(models.Model):
     migration_table_ids = fields.One2many(
         "migration.table", "connection_id", string="Migration Tables"
     )
+    max_parallel_tables = fields.Integer("Parallel Tables", default=4)
+    pool_min_size = fields.Integer("Pool Min Connections", default=1)
+    pool_max_size = fields.Integer("Pool Max Connections", default=8)
+    pool_idle_timeout = fields.Integer("Pool Idle Timeout (s)", default=300)
+    rpc_page_size = fields.Integer("XML-RPC Page Size", default=500)
+    rpc_workers = fields.Integer("XML-RPC Clients", default=4)
+    rpc_retries = fields.Integer("XML-RPC Retries", default=3)
+    rpc_timeout = fields.Integer("XML-RPC Timeout (s)", default=300)
+    rpc_gzip_requests = fields.Boolean(
+        "Compress XML-RPC Requests",
+        help="gzip the XML-RPC requests, the old server (or its proxy) must accept gzip encoded request bodies. "
+        "Compressed responses are always accepted.",
+    )
+    old_filestore_path = fields.Char(
+        "Old Filestore",
+        help="Filestore directory of the old database (e.g. ~/.local/share/Odoo/filestore/<database>). "
+        "When set, binary fields stored as attachments are copied from it instead of over XML-RPC.",
+    )
+    filestore_hardlink = fields.Boolean(
+        "Hardlink Filestore Files",
+        default=True,
+        help="Hardlink the files into the current filestore when both are on the same file system, copy them otherwise.",
+    )
+    id_cache_max_entries = fields.Integer(
+        "Id Cache Size",
+        default=5000000,
+        help="Number of old_id to new id translations kept in memory across the migrate actions.",
+    )
+    id_map_compact_threshold = fields.Integer(
+        "Compact Id Maps From",
+        default=100000,
+        help="Id maps with at least this many ids are kept in sorted arrays (about 16 bytes per id "
+        "instead of about 100 for a dict). 0 keeps every map as a dict.",
+    )
+
+    def _get_old_pool(self):
+        """Connection pool to the old database, shared by every migration action."""
+        self.ensure_one()
+        return get_pool(
+            (self.env.cr.dbname, self.id, "old"),
+            {
+                "dbname": self.old_db_name,
+                "user": self.pg_username,
+                "password": self.pg_password,
+                "host": self.pg_host,
+            },
+            min_size=self.pool_min_size,
+            max_size=self.pool_max_size,
+            idle_timeout=self.pool_idle_timeout,
+            name=f"{self.old_db_name} (old)",
+        )
+
+    def _acquire_old_connection(self):
+        """Take a connection to the old database from the pool, give it back with release()."""
+        return self._get_old_pool().getconn()
+
+    def _get_rpc_session(self):
+        """XML-RPC session to the old server, kept alive across the migrate actions.
+
+        The uid stored by connect_to_database is reused instead of
+        authenticating again.
+        """
+        self.ensure_one()
+        session = get_rpc_session(
+            (self.env.cr.dbname, self.id),
+            self.old_odoo_url,
+            self.old_db_name,
+            self.old_username,
+            self.old_password,
+            timeout=self.rpc_timeout,
+            gzip_requests=self.rpc_gzip_requests,
+            retries=self.rpc_retries,
+            name=self.old_db_name,
+        )
+        if not session.uid and self.state == "connected" and self.uid:
+            session.uid = self.uid
+        return session
+
+    def _get_paged_reader(self, model, field_names, domain=None, page_size=None, context=None):
+        """PagedReader of a model of the old server, with the paging settings of the connection."""
+        self.ensure_one()
+        session = self._get_rpc_session()
+        uid = session.authenticate()
+        if not uid:
+            raise ValueError("Failed to authenticate to the old database.")
+        return PagedReader(
+            session.object_proxy,
+            self.old_db_name,
+            uid,
+            self.old_password,
+            model,
+            field_names,
+            domain=domain,
+            page_size=page_size or self.rpc_page_size,
+            max_workers=self.rpc_workers,
+            retries=self.rpc_retries,
+            context=context,
+        )
+
+    def _get_id_cache(self):
+        """old_id -> new id maps of this connection, shared by the migrate actions of a run."""
+        self.ensure_one()
+        return get_id_cache(
+            (self.env.cr.dbname, self.id),
+            max_entries=self.id_cache_max_entries,
+            compact_threshold=self.id_map_compact_threshold,
+            name=self.old_db_name,
+        )
+
+    def action_clear_id_cache(self):
+        """Drop the cached id maps, e.g. after records were changed outside the migration."""
+        self.ensure_one()
+        self._get_id_cache().clear()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": "Id Cache Cleared",
+                "message": "The id maps will be reloaded on their next use.",
+                "type": "info",
+                "sticky": False,
+            },
+        }
+
+    def action_show_pool_stats(self):
+        """Show the hit/miss counters of the old database pool and of the id cache."""
+        self.ensure_one()
+        stats = self._get_old_pool().stats()
+        message = (
+            f"{stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%}), {stats['in_use']} in use, {stats['idle']} idle, "
+            f"{stats['evicted']} evicted, {stats['health_failures']} failed health checks"
+        )
+        _logger.info(f"Connection pool stats of {self.old_db_name}: {message}")
+        id_cache = self._get_id_cache().summary()
+        _logger.info(f"Id cache stats of {self.old_db_name}: {id_cache}")
+        message = f"Pool: {message}. Id cache: {id_cache}"
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": "Connection Pools",
+                "message": message,
+                "type": "info",
+                "sticky": True,
+            },
+        }
 
     def connect_to_database(self):
         """Connect with the old database with the help of xmlrpc..."""
-        common_url = f"{self.old_odoo_url}/xmlrpc/2/common"  # For Common URL
-        object_url = f"{self.old_odoo_url}/xmlrpc/2/object"  # For Object URL
         try:
             # Connection Lines...
-            common = xmlrpc.client.ServerProxy(common_url)
-            uid = common.authenticate(
-                self.old_db_name, self.old_username, self.old_password, {}
-            )
+            uid = self._get_rpc_session().authenticate(refresh=True)
             # If connected then show below notification...
             if uid:
                 self.uid = uid
@@ -75,6 +221,11 @@ class DBconnection(models.Model):
         """For disconnecting the database connection..."""
         self.state = "not_connected"
         self.uid = None
+        self._get_old_pool().closeall()
+        session = self._get_rpc_session()
+        session.close()
+        session.uid = None
+        self._get_id_cache().clear()
 
         # Get tables from connection ID and unlink them...
         tables = self.env["migration.table"].search([("connection_id", "=", self.id)])
@@ -166,25 +317,21 @@ class DBconnection(models.Model):
     def _fetch_old_db_tables(self):
         """Fetch all tables from the old database using psycopg2..."""
         if self.state == "connected":  # If the database is connected...
-            conn = psycopg2.connect(
-                dbname=self.old_db_name,
-                user=self.pg_username,
-                password=self.pg_password,
-                host=self.pg_host,
-            )
-
-            cursor = conn.cursor()
-            # SQL Query for getting the all public schemas from old connected database...
-            cursor.execute(
+            conn = self._acquire_old_connection()
+
+            try:
+                cursor = conn.cursor()
+                # SQL Query for getting the all public schemas from old connected database...
+                cursor.execute(
+                    """
+                    SELECT tablename
+                    FROM pg_catalog.pg_tables
+                    WHERE schemaname NOT IN ('pg_catalog', 'information_schema');
                 """
-                SELECT tablename
-                FROM pg_catalog.pg_tables
-                WHERE schemaname NOT IN ('pg_catalog', 'information_schema');
-            """
-            )
-            old_db_tables = cursor.fetchall()
-
-            conn.close()
+                )
+                old_db_tables = cursor.fetchall()
+            finally:
+                release(conn)
 
             # Convert result to a list of dictionaries...
             return [{"name": table[0]} for table in old_db_tables]
@@ -193,13 +340,9 @@ class DBconnection(models.Model):
             return []
 
     def _fetch_current_db_tables(self):
-        """Fetch all tables from the current Odoo database using psycopg2..."""
+        """Fetch all tables from the current Odoo database with the request cursor."""
         if self.state == "connected":
-            current_conn = psycopg2.connect(
-                dbname=self._cr.dbname, user="odoo", password="odoo", host="localhost"
-            )
-
-            current_cursor = current_conn.cursor()
+            current_cursor = self.env.cr
             # SQL Query for getting the all public schemas from current odoo database...
             current_cursor.execute(
                 """
@@ -211,8 +354,6 @@ class DBconnection(models.Model):
 
             current_tables = current_cursor.fetchall()
 
-            current_conn.close()
-
             models = self.env["ir.model"].search([])
             model_table_mapping = {}
 
@@ -244,6 +385,108 @@ class DBconnection(models.Model):
         else:
             return []
 
+    def _fetch_old_table_sizes(self):
+        """Estimated row count of every table of the old database, from pg_class."""
+        with self._get_old_pool().connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r';"
+            )
+            return dict(cursor.fetchall())
+
+    def _build_migration_graph(self, tables):
+        """Dependency graph {table id: {table ids}} from the many2one fields of each model.
+
+        A table depends on the tables of the comodels of its many2one fields,
+        so get_related_fields can remap them once they are migrated.
+        """
+        model_tables = {table.current_db_table.model: table.id for table in tables}
+        migration_field = self.env["migration.field"]
+        graph = {}
+        for table in tables:
+            comodels = migration_field.get_related_fields(table.current_db_table.model).values()
+            graph[table.id] = {
+                model_tables[comodel]
+                for comodel in comodels
+                if comodel in model_tables and model_tables[comodel] != table.id
+            }
+        return graph
+
+    def action_migrate_all_tables(self):
+        """Migrate every matched table in dependency order, independent tables in parallel.
+
+        Each table runs in its own worker thread with its own cursor. Related
+        (rel) tables are not part of the graph and still migrate by hand.
+        """
+        self.ensure_one()
+        tables = self.migration_table_ids.filtered(
+            lambda t: t.matched and t.current_db_table and t.field_comparison_ids
+        )
+        graph = self._build_migration_graph(tables)
+        old_sizes = self._fetch_old_table_sizes()
+        table_names = {table.id: table.old_db_table for table in tables}
+        sizes = {table.id: old_sizes.get(table.old_db_table, 0) for table in tables}
+
+        # A run starts with an empty id cache, the tables fill it as they finish
+        id_cache = self._get_id_cache()
+        id_cache.clear()
+
+        registry = self.env.registry
+        uid = self.env.uid
+        context = dict(self.env.context)
+
+        def run_table(table_id):
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                result = env["migration.table"].browse(table_id).action_migrate_table()
+            params = result.get("params", {})
+            return params.get("type") != "danger", params.get("message")
+
+        scheduler = DagScheduler(
+            graph, run_table, max_workers=self.max_parallel_tables, sizes=sizes
+        )
+        stages = topological_stages(scheduler.graph)
+        _logger.info(
+            "Migration plan: "
+            + " | ".join(
+                ", ".join(table_names[t] for t in stage) for stage in stages
+            )
+        )
+
+        start = time.monotonic()
+        results = scheduler.run()
+        elapsed = time.monotonic() - start
+        _logger.info(f"Id cache after the migration run: {id_cache.summary()}")
+
+        states = [state for state, _info, _seconds in results.values()]
+        failed = [table_names[t] for t, (state, _i, _s) in results.items() if state == "failed"]
+        # The workers recorded their ANALYZE/VACUUM timings on their own cursors,
+        # a new transaction sees them
+        self.env.cr.commit()
+        tables.invalidate_recordset(["maintenance_statement", "maintenance_seconds"])
+        maintained = tables.filtered(lambda t: t.id in results and t.maintenance_statement)
+        for table in maintained:
+            _logger.info(
+                f"Maintenance of {table.old_db_table}: {table.maintenance_statement} in {table.maintenance_seconds:.1f}s"
+            )
+        message = (
+            f"{states.count('done')} tables migrated, {states.count('failed')} failed, "
+            f"{states.count('skipped')} skipped in {elapsed:.0f}s over {len(stages)} stages. "
+            f"{len(maintained)} tables analyzed in {sum(maintained.mapped('maintenance_seconds')):.0f}s."
+        )
+        if failed:
+            message += f" Failed: {', '.join(failed)}"
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": "Migration Finished",
+                "message": message,
+                "type": "danger" if failed else "success",
+                "sticky": True,
+            },
+        }
+
     def update_name(self):
         product_id = self.env['product.template'].search(['|', ('active', '=', True), ('active', '=', False)])
         if product_id:
@@ -2,10 +2,36 @@ import odoo
 from odoo import models, api, fields, SUPERUSER_ID
 import psycopg2
 import logging
-import xmlrpc.client
+import math
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+
+from ..tools.cdc import changed_rows_query
+from ..tools.commit_policy import CommitPolicy
+from ..tools.copy_loader import CopySink
+from ..tools.extract import DEFAULT_ITERSIZE, fetch_rows, iter_batches
+from ..tools.filestore import AttachmentCopier, old_attachment_query
+from ..tools.images import VariantResizer, variant_fields
+from ..tools.m2m import Many2manyCopier, old_relation
+from ..tools.pool import release
+from ..tools.properties import PropertyWriter
+from ..tools.relational import group_links
+from ..tools.session_profile import (
+    SessionProfile,
+    bulk_load_settings,
+    check_foreign_keys,
+    session_profile,
+)
+from ..tools.staging import StagingLoader, current_wal_lsn, wal_bytes_since
+from ..tools.upsert import BatchUpserter
+from ..tools.watermark import count_rows, delta_query, has_write_date, high_water_mark
+from .migration_id_map import record_pairs
 
 _logger = logging.getLogger(__name__)
 
+ACCOUNT_FIELDS = ["property_account_receivable_id", "property_account_payable_id"]
+PAYMENT_TERM_FIELDS = ["property_payment_term_id", "property_supplier_payment_term_id"]
+
 
 class MigrationField(models.Model):
     _name = "migration.field"
@@ -21,23 +47,209 @@ class MigrationField(models.Model):
     relation = fields.Char(string="Related Model")
     not_store = fields.Boolean("Not Stored", default=False)
 
-    def action_migrate_relational_fields(self):
-        """Migrate many2many, one2many, and binary fields using XML-RPC."""
+    def _copy_many2many_links(self, commit_policy):
+        """Copy the links of a many2many field straight from the old rel table.
+
+        The rel table and its columns come from ir_model_fields of the old
+        database, the pairs are streamed through a server-side cursor and
+        inserted by Many2manyCopier. Returns its summary, None when the old
+        database does not know the rel table (the caller falls back to
+        XML-RPC).
+        """
+        table = self.table_id
+        current_model_name = table.current_db_table.model
+        target_field = self.env[current_model_name]._fields.get(self.current_field_name.name)
+        if target_field is None or target_field.type != "many2many" or not target_field.store:
+            return None
 
+        conn_old = None
         try:
-            connection = self.table_id.connection_id
-            url = f"{connection.old_odoo_url}"
-            old_db = connection.old_db_name
-            username = connection.old_username
-            password = connection.old_password
+            conn_old = table.connection_id._acquire_old_connection()
+            with conn_old.cursor() as cursor_old:
+                relation = old_relation(
+                    cursor_old, table.old_db_table.replace("_", "."), self.old_field_name
+                )
+            if not relation:
+                return None
+            old_relation_table, old_column1, old_column2 = relation
+
+            copier = Many2manyCopier(
+                self.env.cr,
+                target_field.relation,
+                target_field.column1,
+                target_field.column2,
+                self._get_id_map(current_model_name),
+                self._get_id_map(self.relation or target_field.comodel_name),
+                batch_size=table.batch_size or 5000,
+            )
+            self.env.flush_all()
+            pairs = fetch_rows(
+                conn_old,
+                f'SELECT "{old_column1}", "{old_column2}" FROM "{old_relation_table}" ORDER BY "{old_column1}"',
+                stream=True,
+                itersize=table.extract_itersize or DEFAULT_ITERSIZE,
+            )
+            copier.copy(pairs, on_batch=commit_policy.record)
+            # Raw SQL writes bypass the ORM cache
+            self.env.invalidate_all()
+            _logger.info(f"{old_relation_table} -> {copier.summary()}")
+            return copier.summary()
+        finally:
+            if conn_old:
+                release(conn_old)
+
+    def _copy_binary_attachments(self, commit_policy):
+        """Copy the attachments of a binary field from the old ir_attachment and filestore.
+
+        Rows are streamed by SQL, files linked or copied by store_fname (a
+        checksum, so a file is copied once) and rows inserted in batches by
+        AttachmentCopier. Returns its summary, None when the old filestore
+        is not configured or either side keeps the field in a column (the
+        caller falls back to XML-RPC).
+        """
+        table = self.table_id
+        connection = table.connection_id
+        current_model_name = table.current_db_table.model
+        target_field = self.env[current_model_name]._fields.get(self.current_field_name.name)
+        if not connection.old_filestore_path or not getattr(target_field, "attachment", False):
+            return None
+
+        conn_old = None
+        try:
+            conn_old = connection._acquire_old_connection()
+            with conn_old.cursor() as cursor_old:
+                query = old_attachment_query(
+                    cursor_old, table.old_db_table, table.old_db_table.replace("_", "."), self.old_field_name
+                )
+            if not query:
+                return None
+
+            copier = AttachmentCopier(
+                self.env.cr,
+                connection.old_filestore_path,
+                self.env["ir.attachment"]._filestore(),
+                self._get_id_map(current_model_name),
+                current_model_name,
+                target_field.name,
+                uid=self.env.uid,
+                hardlink=connection.filestore_hardlink,
+                batch_size=min(table.batch_size or 500, 500),
+            )
+            self.env.flush_all()
+            rows = fetch_rows(
+                conn_old,
+                query[0],
+                query[1],
+                stream=True,
+                itersize=table.extract_itersize or DEFAULT_ITERSIZE,
+            )
+            copier.copy(rows, on_batch=commit_policy.record)
+            # Raw SQL writes bypass the ORM cache
+            self.env.invalidate_all()
+            _logger.info(copier.summary())
+            # The ORM never saw these images, their variants are generated here
+            variants = self._generate_image_variants(
+                current_model_name, target_field.name, copier.owner_ids, commit_policy
+            )
+            return f"{copier.summary()}. {variants}" if variants else copier.summary()
+        finally:
+            if conn_old:
+                release(conn_old)
+
+    def _write_original_images(self, model_name, field_name, images):
+        """Store original images as attachments, without the variants the ORM write would compute.
+
+        ``images`` maps a record id to its base64 image, the previous
+        attachment of the field is replaced.
+        """
+        attachments = self.env["ir.attachment"].sudo()
+        attachments.search([
+            ("res_model", "=", model_name),
+            ("res_field", "=", field_name),
+            ("res_id", "in", list(images)),
+        ]).unlink()
+        attachments.create([
+            {
+                "name": field_name,
+                "res_model": model_name,
+                "res_field": field_name,
+                "res_id": record_id,
+                "type": "binary",
+                "datas": data,
+            }
+            for record_id, data in images.items()
+        ])
+        self.env.invalidate_all()
+
+    def _generate_image_variants(self, model_name, field_name, record_ids, commit_policy):
+        """Resize the stored originals of an image field into its variants, in a process pool.
+
+        Originals are read a batch at a time, resized by a VariantResizer on
+        ``image_variant_workers`` processes, and the variant attachments of
+        the batch created together. Returns a summary, None when the field
+        has no variants.
+        """
+        variants = variant_fields(self.env[model_name], field_name)
+        if not variants or not record_ids:
+            return None
+        variant_names = [name for name, _width, _height in variants]
+        attachments = self.env["ir.attachment"].sudo()
+        start = time.monotonic()
+        resized = 0
+        with VariantResizer(self.table_id.image_variant_workers) as resizer:
+            for batch_ids in iter_batches(record_ids, 200):
+                originals = attachments.search([
+                    ("res_model", "=", model_name),
+                    ("res_field", "=", field_name),
+                    ("res_id", "in", batch_ids),
+                ])
+                jobs = [(original.res_id, original.raw, variants) for original in originals if original.raw]
+                vals_list = []
+                for record_id, images in resizer.resize(jobs):
+                    vals_list.extend(
+                        {
+                            "name": name,
+                            "res_model": model_name,
+                            "res_field": name,
+                            "res_id": record_id,
+                            "type": "binary",
+                            "raw": image,
+                        }
+                        for name, image in images.items()
+                        if image
+                    )
+                attachments.search([
+                    ("res_model", "=", model_name),
+                    ("res_field", "in", variant_names),
+                    ("res_id", "in", batch_ids),
+                ]).unlink()
+                attachments.create(vals_list)
+                resized += len(jobs)
+                commit_policy.record(len(vals_list))
+        self.env.invalidate_all()
+        elapsed = time.monotonic() - start
+        summary = (
+            f"{resized} {model_name}.{field_name} images resized into {len(variants)} variants "
+            f"in {elapsed:.1f}s ({resized / elapsed if elapsed else 0.0:.1f} images/s)"
+        )
+        if resizer.in_process:
+            summary += ", resized in process after the process pool failed"
+        _logger.info(summary)
+        return summary
 
-            common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
-            old_uid = common.authenticate(old_db, username, password, {})
-            if not old_uid:
-                raise ValueError("Failed to authenticate to the old database.")
+    def action_migrate_relational_fields(self):
+        """Migrate many2many, one2many, and binary fields.
 
-            # New database connection
-            models = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object")
+        Stored many2many fields are copied in SQL from the old rel table,
+        binary attachments from the old ir_attachment and filestore when it
+        is configured, the other fields are read over XML-RPC.
+        """
+
+        try:
+            connection = self.table_id.connection_id
+            # Kept-alive session, the uid of connect_to_database is reused
+            session = connection._get_rpc_session()
+            round_trips = session.round_trips
 
             selected_field_ids = self.env.context.get("active_ids", [])
             selected_fields = self.browse(selected_field_ids)
@@ -54,7 +266,21 @@ class MigrationField(models.Model):
                     },
                 }
 
+            commit_policy = self._get_commit_policy(
+                self.env.cr, self.env.cr.commit, self.env.cr.rollback
+            )
+
+            summaries = []
             for field in selected_fields:
+                summary = None
+                if field.current_data_type == "many2many":
+                    summary = field._copy_many2many_links(commit_policy)
+                elif field.current_data_type == "binary":
+                    summary = field._copy_binary_attachments(commit_policy)
+                if summary:
+                    summaries.append(summary)
+                    continue
+
                 old_table_name = self.table_id.old_db_table
                 old_table_cus_name = old_table_name.replace("_", ".")
                 current_model_name = self.table_id.current_db_table.model
@@ -62,70 +288,57 @@ class MigrationField(models.Model):
                 current_field_name = field.current_field_name.name
                 related_model = field.relation
 
-                # Fetch records from the old database
-                old_records = models.execute_kw(
-                    old_db,
-                    old_uid,
-                    password,
-                    old_table_cus_name,
-                    "search_read",
-                    [[]],
-                    {"fields": ["id", old_field_name]},
+                # Fetch records from the old database page by page, over several
+                # clients, the pages are written as they arrive
+                reader = connection._get_paged_reader(
+                    old_table_cus_name, ["id", old_field_name]
                 )
+                queries = self.env.cr.sql_log_count
 
-                if not isinstance(old_records, list):
-                    continue
+                # Both sides resolve through the id maps: one query per model, archived records included
+                current_ids = self._get_id_map(current_model_name)
+                skipped = 0
 
                 # Handle many2many and one2many fields
                 if field.current_data_type in ["many2many", "one2many"]:
-                    for old_record in old_records:
-                        old_id = old_record["id"]
-                        related_ids = old_record.get(old_field_name, [])
-
-                        if not isinstance(related_ids, list):
-                            continue
-
-                        related_ids = [
-                            rid for rid in related_ids if isinstance(rid, int)
-                        ]
-
-                        if not related_ids:
-                            continue
-
-                        current_record = self.env[current_model_name].search(
-                            [("old_id", "=", old_id)], limit=1
-                        )
-
-                        if current_record:
-                            new_related_ids = []
-
-                            for old_related_id in related_ids:
-                                if hasattr(self.env[related_model], "active"):
-                                    mapped_record = self.env[related_model].search(
-                                        [
-                                            ("old_id", "=", old_related_id),
-                                            "|",
-                                            ("active", "=", True),
-                                            ("active", "=", False),
-                                        ],
-                                        limit=1,
-                                    )
-                                else:
-                                    mapped_record = self.env[related_model].search(
-                                        [("old_id", "=", old_related_id)], limit=1
-                                    )
-
-                                if mapped_record:
-                                    new_related_ids.append(mapped_record.id)
-
-                            current_record.write(
-                                {current_field_name: [(6, 0, new_related_ids)]}
+                    related_ids_map = self._get_id_map(related_model)
+                    written = 0
+                    for page in reader:
+                        groups, page_skipped = group_links(page, old_field_name, current_ids, related_ids_map)
+                        skipped += page_skipped
+                        # One write per distinct link set of the page
+                        for new_related_ids, owner_ids in groups.items():
+                            self.env[current_model_name].browse(owner_ids).write(
+                                {current_field_name: [(6, 0, list(new_related_ids))]}
                             )
-                            self.env.cr.commit()
-                            _logger.info("Record Written Successfully...")
+                            commit_policy.record(len(owner_ids))
+                            written += len(owner_ids)
+                        _logger.info(f"{written} {current_model_name} records written...")
 
                 # Handle binary fields (e.g., images)
+                elif field.current_data_type == "binary" and self.table_id.offload_image_variants and variant_fields(
+                    self.env[current_model_name], current_field_name
+                ):
+                    # Originals first, page by page, then the variants in the process pool
+                    image_ids = []
+                    for page in reader:
+                        images = {}
+                        for old_record in page:
+                            current_id = current_ids.translate(old_record["id"])
+                            if current_id and old_record.get(old_field_name):
+                                images[current_id] = old_record[old_field_name]
+                        if images:
+                            field._write_original_images(current_model_name, current_field_name, images)
+                            commit_policy.record(len(images))
+                            image_ids.extend(images)
+                    variants = field._generate_image_variants(
+                        current_model_name, current_field_name, image_ids, commit_policy
+                    )
+                    if variants:
+                        summaries.append(variants)
+
                 elif field.current_data_type == "binary":
+                    old_records = (old_record for page in reader for old_record in page)
                     for old_record in old_records:
                         old_id = old_record["id"]
                         binary_data = old_record.get(old_field_name)
@@ -134,20 +347,31 @@ class MigrationField(models.Model):
                             continue
 
                         # Find the corresponding record in the new database
-                        current_record = self.env[current_model_name].search(
-                            [("old_id", "=", old_id)], limit=1
-                        )
+                        current_id = current_ids.translate(old_id)
 
-                        if current_record:
+                        if current_id:
+                            current_record = self.env[current_model_name].browse(current_id)
                             # Update the binary field with the fetched data
                             current_record.write({current_field_name: binary_data})
+                            commit_policy.record()
+
+                summary = f"{reader.summary()}, {self.env.cr.sql_log_count - queries} queries"
+                if skipped:
+                    summary += f", {skipped} records without links or not migrated skipped"
+                _logger.info(summary)
+                summaries.append(summary)
+
+            commit_policy.commit()
+            round_trips = session.round_trips - round_trips
+            _logger.info(f"Commit summary for {self.table_id.current_db_table.model}: {commit_policy.summary()}, {round_trips} XML-RPC round-trips")
 
             return {
                 "type": "ir.actions.client",
                 "tag": "display_notification",
                 "params": {
                     "title": "Fields Migration Successful",
-                    "message": f"Fields migrated into {current_model_name} successfully!",
+                    "message": f"Fields migrated into {self.table_id.current_db_table.model} successfully! {commit_policy.summary()}. "
+                    f"{'. '.join(summaries)}, {round_trips} XML-RPC round-trips.",
                     "type": "success",
                     "sticky": False,
                 },
@@ -175,13 +399,646 @@ class MigrationField(models.Model):
                 related_fields[field.name] = field.comodel_name
         return related_fields
 
+    def _get_id_cache(self):
+        return self.table_id.connection_id._get_id_cache()
+
+    def _load_id_map(self, model_name, key="old_id"):
+        """Read the key -> id pairs of a model.
+
+        old ids are only read from migration.id.map, through its (model,
+        old_id) index: the loaders keep it up to date. It is synced from the
+        old_id column here only while it holds nothing for the model, for
+        models migrated before the map existed. Other keys are read straight
+        from the table. Archived records are included, like the active
+        domains the migrate actions used to search with.
+        """
+        if key == "old_id":
+            id_map = self.env["migration.id.map"]
+            if not id_map._has_pairs(model_name):
+                id_map._sync_from_table(model_name)
+            return id_map._read_pairs(model_name)
+        model = self.env[model_name]
+        field = model._fields.get(key)
+        if not field or not field.store:
+            return {}
+        model.flush_model([key])
+        self.env.cr.execute(
+            f'SELECT "{key}", id FROM "{model._table}" WHERE "{key}" IS NOT NULL ORDER BY id'
+        )
+        return self.env.cr.fetchall()
+
+    def _get_id_map(self, model_name, key="old_id"):
+        """Cached IdMap or CompactIdMap of a model, see IdMapCache."""
+        return self._get_id_cache().get(model_name, self._load_id_map, key=key)
+
+    def _get_related_mappings(self, related_field_mappings, keys=None):
+        """IdMap per many2one field name, from get_related_fields' field -> comodel dict.
+
+        ``keys`` maps a comodel to the column its old values are matched on
+        instead of old_id. Fields sharing a comodel share one map.
+        """
+        keys = keys or {}
+        related_mappings = {}
+        for field_name, model_name in related_field_mappings.items():
+            try:
+                id_map = self._get_id_map(model_name, keys.get(model_name, "old_id"))
+            except Exception as e:
+                _logger.error(
+                    f"Error processing model {model_name} for field {field_name}: {str(e)}"
+                )
+                continue
+            if id_map:
+                related_mappings[field_name] = id_map
+        return related_mappings
+
+    def _get_session_settings(self):
+        """Settings of the session profile of the table, None for the default profile."""
+        table = self.table_id
+        if table.session_profile != "bulk_load" or "cdc_old_ids" in self.env.context:
+            return None
+        return bulk_load_settings(table.bulk_work_mem, table.bulk_statement_timeout)
+
+    def _start_session_profile(self, cursor):
+        settings = self._get_session_settings()
+        if not settings:
+            return None
+        return SessionProfile(
+            cursor, settings, name=f"bulk_load {self.table_id.old_db_table}"
+        ).apply()
+
+    def _check_integrity(self, cursor, table_name):
+        """Make the foreign key checks that the skipped triggers of a session profile would have made.
+
+        Runs before the final commit of the load, the first violations fail
+        the run: the error names every violated constraint with a few of the
+        keys that point nowhere.
+        """
+        violations = check_foreign_keys(cursor, table_name)
+        if not violations:
+            _logger.info(f"Integrity check of {table_name}: all foreign keys resolve")
+            return
+        reports = []
+        for name, referenced, count, keys in violations:
+            reports.append(
+                f"{count} rows violate {name} (references {referenced}, missing keys: "
+                + ", ".join(str(key) for key in keys)
+                + ")"
+            )
+            _logger.error(f"Integrity check of {table_name}: {reports[-1]}")
+        raise ValueError(f"Integrity check of {table_name} failed: " + "; ".join(reports))
+
+    def _get_commit_options(self):
+        """Commit policy settings of a migration run.
+
+        The table settings can be overridden for one run through the
+        ``migration_commit_mode``, ``migration_commit_rows`` and
+        ``migration_commit_seconds`` context keys.
+        """
+        context = self.env.context
+        table = self.table_id
+        return {
+            "mode": context.get("migration_commit_mode") or table.commit_mode,
+            "every_rows": context.get("migration_commit_rows") or table.commit_every_rows,
+            "every_seconds": context.get("migration_commit_seconds") or table.commit_every_seconds,
+        }
+
+    def _get_commit_policy(self, cursor, commit, rollback):
+        """Build the commit policy of a migration run."""
+        return CommitPolicy(cursor, commit, rollback, **self._get_commit_options())
+
+    def _get_load_options(self):
+        """Plain copy of the table load settings, safe to hand over to worker threads."""
+        table = self.table_id
+        connection = table.connection_id
+        return {
+            "load_method": table.load_method or "query",
+            "copy_format": table.copy_format or "text",
+            "upsert_key": table.upsert_key or "old_id",
+            "batch_size": table.batch_size or 5000,
+            "stream_extraction": table.stream_extraction,
+            "extract_itersize": table.extract_itersize or DEFAULT_ITERSIZE,
+            "partitions": 1 if "cdc_old_ids" in self.env.context else table.parallel_partitions or 1,
+            "partition_method": table.partition_method or "range",
+            "commit": self._get_commit_options(),
+            "session_settings": self._get_session_settings(),
+            # many2one field -> comodel, set by action_migrate for the staging load
+            "related_models": {},
+            # Failed batches and extracted rows of every load loop, partitions included
+            "failed_batches": [],
+            "extracted": [],
+            "model": table.current_db_table.model,
+            "old_pool": connection._get_old_pool(),
+            "pool_max_size": connection.pool_max_size or 1,
+            "registry": self.env.registry,
+        }
+
+    def _get_partition_predicates(self, conn_old, query, params, options):
+        """Split the rows of an old table query into id ranges or hash buckets on id."""
+        count = options["partitions"]
+        if options["partition_method"] == "hash":
+            # mod(), a % would clash with the query parameters
+            return [f"mod(old_id, {count}) = {bucket}" for bucket in range(count)]
+
+        cursor = conn_old.cursor()
+        try:
+            cursor.execute(
+                f"SELECT min(old_id), max(old_id) FROM ({query.strip().rstrip(';')}) AS extract",
+                params,
+            )
+            low, high = cursor.fetchone()
+        finally:
+            cursor.close()
+        if low is None:
+            return []
+        step = max(math.ceil((high - low + 1) / count), 1)
+        return [
+            f"old_id BETWEEN {start} AND {start + step - 1}"
+            for start in range(low, high + 1, step)
+        ]
+
+    def _start_incremental(self, conn_old, query, params, current_field_names):
+        """Restrict an extraction query to the rows changed since the table's watermark.
+
+        Captured changes replayed by migration.table (the cdc_old_ids
+        context) restrict the query to those rows instead. Returns None for
+        a full run (incremental off, no id selected or no write_date in the
+        old table), otherwise a dict with the query and params to run, the
+        rows of the full query and the mark to store once the load
+        succeeded. The new mark is read before extracting, rows changed
+        while loading are picked up by the next run.
+        """
+        table = self.table_id
+        cdc_old_ids = self.env.context.get("cdc_old_ids")
+        if cdc_old_ids is not None and query:
+            if "old_id" not in current_field_names:
+                _logger.warning(f"Captured changes of {table.old_db_table} need the id field, nothing replayed")
+                return {"query": None, "params": None, "total": 0, "mark": None, "changes": 0}
+            query, params = changed_rows_query(query, params, cdc_old_ids)
+            return {"query": query, "params": params, "total": 0, "mark": None, "changes": len(cdc_old_ids)}
+        if not table.incremental or not query:
+            return None
+        if "old_id" not in current_field_names:
+            _logger.warning(f"Incremental run of {table.old_db_table} needs the id field, loading everything")
+            return None
+        cursor = conn_old.cursor()
+        try:
+            if not has_write_date(cursor, table.old_db_table):
+                _logger.warning(f"{table.old_db_table} has no write_date, loading everything")
+                return None
+            mark = high_water_mark(cursor, table.old_db_table)
+            delta = {"query": query, "params": params, "total": 0, "mark": mark}
+            if table.watermark_date:
+                # The skipped rows are this count minus the rows the delta streams
+                delta["total"] = count_rows(cursor, query, params)
+                delta["query"], delta["params"] = delta_query(
+                    query, params, table.old_db_table, table.watermark_date, table.watermark_id
+                )
+        finally:
+            cursor.close()
+        _logger.info(
+            f"Incremental run of {table.old_db_table}: changed since {table.watermark_date or 'never'}"
+        )
+        return delta
+
+    def _end_incremental(self, delta, failed_batches=0, extracted=0):
+        """Store the mark of a successful incremental run, returns its summary.
+
+        ``extracted`` is the number of rows the delta query streamed. After
+        failed batches the mark stays where it was, the next run extracts
+        the same rows again instead of losing the failed ones.
+        """
+        if not delta:
+            return ""
+        if "changes" in delta:
+            # Captured changes move the change log position, not the watermark
+            return f", {delta['changes']} captured changes replayed"
+        table = self.table_id
+        since = table.watermark_date
+        skipped = max(delta["total"] - extracted, 0)
+        if failed_batches:
+            table.write({"incremental_skipped": skipped})
+            return f", {skipped} unchanged rows skipped, watermark kept after {failed_batches} failed batches"
+        mark_date, mark_id = delta["mark"]
+        if mark_date:
+            table.write({"watermark_date": mark_date, "watermark_id": mark_id})
+        table.write({"incremental_skipped": skipped})
+        if not since:
+            return f", watermark set at {mark_date}"
+        return f", {skipped} unchanged rows skipped (changed since {since})"
+
+    def _migrate_partitioned(self, conn_old, query, params, current_table, current_field_names, related_mappings, options):
+        """Extract, transform and load an old table in parallel partitions.
+
+        Every partition gets its own old connection and its own cursor from
+        the Odoo connection pool on a worker thread. Partitions are committed
+        independently. After a failed partition the ones not started yet are
+        cancelled, and the error lists the partitions already committed, so
+        a run can be resumed on the others.
+        """
+        predicates = self._get_partition_predicates(conn_old, query, params, options)
+        base_query = query.strip().rstrip(";")
+
+        def load_partition(predicate):
+            partition_old = None
+            try:
+                partition_old = options["old_pool"].getconn()
+                rows = fetch_rows(
+                    partition_old,
+                    f"SELECT * FROM ({base_query}) AS extract WHERE {predicate}",
+                    params,
+                    stream=options["stream_extraction"],
+                    itersize=options["extract_itersize"],
+                )
+                with options["registry"].cursor() as partition_cr, session_profile(
+                    partition_cr, options["session_settings"], name=f"bulk_load {current_table} {predicate}"
+                ):
+                    return self._load_fast_rows(
+                        partition_cr,
+                        rows,
+                        current_table,
+                        current_field_names,
+                        related_mappings,
+                        options,
+                    )
+            finally:
+                release(partition_old)
+
+        start = time.monotonic()
+        summaries = []
+        committed = []
+        failures = []
+        # The request itself holds a connection of the old pool and an Odoo cursor
+        workers = min(len(predicates), options["pool_max_size"] - 1, odoo.tools.config["db_maxconn"] - 1)
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            futures = {pool.submit(load_partition, predicate): predicate for predicate in predicates}
+            for future in as_completed(futures):
+                predicate = futures[future]
+                try:
+                    summary = future.result()
+                except CancelledError:
+                    continue
+                except Exception as e:
+                    if not failures:
+                        # The running partitions finish, the others are not started
+                        for pending in futures:
+                            pending.cancel()
+                    failures.append(f"{predicate} ({e})")
+                    _logger.error(f"Partition {predicate} of {current_table} failed: {e}")
+                    continue
+                _logger.info(f"Partition {predicate} of {current_table}: {summary}")
+                committed.append(predicate)
+                summaries.append(summary)
+        if failures:
+            not_run = [predicate for future, predicate in futures.items() if future.cancelled()]
+            raise ValueError(
+                f"Partitions of {current_table} failed: {'; '.join(failures)}. "
+                f"Committed: {', '.join(committed) or 'none'}. Not run: {', '.join(not_run) or 'none'}."
+            )
+        return (
+            f"{len(predicates)} partitions loaded in parallel in {time.monotonic() - start:.1f}s: "
+            + "; ".join(summaries)
+        )
+
+    def _fetch_old_rows(self, conn, query, params=None):
+        """Run a query on the old database.
+
+        With streaming extraction enabled on the table, the rows are yielded
+        through a server-side cursor ``extract_itersize`` rows at a time,
+        otherwise they are all fetched at once.
+        """
+        return fetch_rows(
+            conn,
+            query,
+            params,
+            stream=self.table_id.stream_extraction,
+            itersize=self.table_id.extract_itersize or DEFAULT_ITERSIZE,
+        )
+
+    def _load_fast_rows(self, cursor_current, rows, current_table, current_field_names, related_mappings, options):
+        """Transform and load old rows into a current table with raw SQL.
+
+        This is the load loop of the fast branch of action_migrate. It only
+        works on the given Odoo cursor and the plain ``options`` dict built by
+        _get_load_options, never on the ORM, so it can run in worker threads.
+        Returns a summary of what was loaded.
+        """
+        # COPY bulk load: rows not yet in the current table are streamed with COPY,
+        # existing ones are found in SQL and still go through the UPDATE queries below.
+        # product_product needs row by row visibility for the combination_indices check.
+        copy_sink = None
+        if (
+            options["load_method"] == "copy"
+            and current_table != "product_product"
+        ):
+            copy_sink = CopySink(
+                cursor_current,
+                current_table,
+                current_field_names,
+                format=options["copy_format"],
+                related_mappings=related_mappings,
+                skip_existing=("old_id", "default_code"),
+            )
+
+        # Set-based upsert: rows are collected per batch and upserted through a temp table
+        upserter = None
+        pending_records = []
+        if (
+            options["load_method"] == "upsert"
+            and current_table != "product_product"
+        ):
+            upserter = BatchUpserter(
+                cursor_current,
+                current_table,
+                current_field_names,
+                key=options["upsert_key"],
+                related_mappings=related_mappings,
+            )
+
+        # Unlogged staging: raw rows are staged, remapped in SQL and published at the end
+        stager = None
+        if (
+            options["load_method"] == "staging"
+            and current_table != "product_product"
+        ):
+            stager = StagingLoader(
+                cursor_current,
+                current_table,
+                current_field_names,
+                related_models=options["related_models"],
+            ).prepare()
+
+        commit_policy = CommitPolicy(
+            cursor_current, cursor_current.commit, cursor_current.rollback, **options["commit"]
+        )
+
+        extracted = 0
+        # The id map learns the ids of the rows written batch by batch, the staged
+        # rows only get theirs from the sync after the load
+        returning = " RETURNING old_id, id" if "old_id" in current_field_names else ""
+        # The staging table is committed with the first batch, it must not outlive a failed load
+        try:
+            for batch_index, batch in enumerate(iter_batches(rows, options["batch_size"])):
+                extracted += len(batch)
+                # Leftovers of a failed batch were rolled back with it
+                pending_records = []
+                batch_pairs = []
+                if copy_sink:
+                    copy_sink.discard()
+                if upserter:
+                    upserter.take_pairs()
+                if stager:
+                    stager.discard()
+                # Rows held by the COPY, upsert and staging buffers, accounted once they ship
+                buffered = 0
+
+                with commit_policy.batch(f"{batch_index + 1} of {current_table}"):
+                    records = []
+                    for row in batch:
+                        record_data = {}
+
+                        for idx, field_name in enumerate(current_field_names):
+                            value = row[idx] if row[idx] not in [None] else None
+                            record_data[field_name] = value
+
+                        # Skip if login is empty or in skip_logins
+                        skip_logins = ["default", "__system__", "portaltemplate", "public"]
+                        if "login" in record_data and (
+                            not record_data["login"] or record_data["login"] in skip_logins
+                        ):
+                            continue
+                        records.append(record_data)
+
+                    if copy_sink:
+                        # The sink does the many2one remapping itself, and hands back
+                        # the rows whose old_id or default_code is already taken
+                        loaded = copy_sink.rows
+                        for record_data in records:
+                            copy_sink.write(record_data)
+                        copy_sink.flush()
+                        buffered += copy_sink.rows - loaded
+                        batch_pairs.extend(copy_sink.take_pairs())
+                        records = copy_sink.take_existing()
+
+                    for record_data in records:
+                        if stager:
+                            stager.write(record_data)
+                            buffered += 1
+                            continue
+
+                        if upserter:
+                            # The upserter does the many2one remapping itself
+                            pending_records.append(record_data)
+                            buffered += 1
+                            continue
+
+                        # Handle Many2one fields, mapping old_id to the actual id in the current database
+                        for field_name, mapping in related_mappings.items():
+                            value = record_data.get(field_name)
+                            if value is not None:
+                                # Replace old_id with the corresponding current id
+                                record_data[field_name] = mapping.translate(value, value)
+
+                        # Additional check for duplicates specifically for product_product
+                        if (
+                            current_table == "product_product"
+                            and "product_tmpl_id" in record_data
+                            and "combination_indices" in record_data
+                        ):
+                            original_combination_indices = record_data[
+                                "combination_indices"
+                            ]
+                            duplicate_found = True
+                            suffix_counter = 1
+
+                            while duplicate_found:
+                                cursor_current.execute(
+                                    f"SELECT id FROM {current_table} WHERE product_tmpl_id = %s AND combination_indices = %s",
+                                    (
+                                        record_data["product_tmpl_id"],
+                                        record_data["combination_indices"],
+                                    ),
+                                )
+                                duplicate_record = cursor_current.fetchone()
+
+                                if duplicate_record:
+                                    # Record with the same product_tmpl_id and combination_indices exists, add suffix and check again
+                                    _logger.info(
+                                        f"Duplicate found for product_tmpl_id: {record_data['product_tmpl_id']} and combination_indices: {record_data['combination_indices']}. Trying a new suffix."
+                                    )
+                                    # Append or increment the suffix
+                                    record_data[
+                                        "combination_indices"
+                                    ] = f"{original_combination_indices}_{suffix_counter}"
+                                    suffix_counter += 1
+                                else:
+                                    # No duplicate found, we can insert this record
+                                    duplicate_found = False
+
+                        # if current_table == 'account_move' and 'name' in record_data and record_data['name']:
+                        #     original_name = record_data['name']
+                        #     duplicate_found = True
+                        #     suffix_counter = 1
+                        #
+                        #     while duplicate_found:
+                        #         cursor_current.execute(
+                        #             f"SELECT id FROM account_move WHERE name = %s",
+                        #            (record_data['name'],)
+                        #         )
+                        #         duplicate_record = cursor_current.fetchone()
+                        #
+                        #         if duplicate_record:
+                        #            _logger.info(
+                        #                f"Duplicate found in account_move for name: {record_data['name']}. Trying a new suffix."
+                        #            )
+                        #            record_data['name'] = f"{original_name}_dup{suffix_counter}"
+                        #            suffix_counter += 1
+                        #         else:
+                        #            duplicate_found = False
+
+                        if "default_code" in record_data and record_data["default_code"]:
+                            cursor_current.execute(
+                                f"SELECT id FROM {current_table} WHERE default_code = %s",
+                                (record_data["default_code"],),
+                            )
+                            existing_variant = cursor_current.fetchone()
+                        else:
+                            existing_variant = None
+
+                        if existing_variant:
+                            update_fields = ", ".join(
+                                [
+                                    f"{field} = %s"
+                                    for field in current_field_names
+                                    if field != "old_id"
+                                ]
+                            )
+                            update_values = [
+                                record_data[field]
+                                for field in current_field_names
+                                if field != "old_id"
+                            ]
+                            sql_update_query = f"UPDATE {current_table} SET {update_fields} WHERE default_code = %s{returning}"
+                            cursor_current.execute(
+                                sql_update_query,
+                                (*update_values, record_data["default_code"]),
+                            )
+                            if returning:
+                                batch_pairs.extend(cursor_current.fetchall())
+                            _logger.info(
+                                f"Updated variant with default_code: {record_data['default_code']}"
+                            )
+                            commit_policy.record()
+
+                        else:
+                            if "old_id" in record_data and record_data["old_id"]:
+                                cursor_current.execute(
+                                    f"SELECT id FROM {current_table} WHERE old_id = %s",
+                                    (record_data["old_id"],),
+                                )
+                                existing_record = cursor_current.fetchone()
+                            else:
+                                existing_record = None
+
+                            if existing_record:
+                                # _logger.info("Skipping the record...")
+                                # continue
+                                update_fields = ", ".join(
+                                    [
+                                        f"{field} = %s"
+                                        for field in current_field_names
+                                        if field != "old_id"
+                                    ]
+                                )
+                                update_values = [
+                                    record_data[field]
+                                    for field in current_field_names
+                                    if field != "old_id"
+                                ]
+                                sql_update_query = f"UPDATE {current_table} SET {update_fields} WHERE old_id = %s{returning}"
+                                cursor_current.execute(
+                                    sql_update_query,
+                                    (*update_values, record_data["old_id"]),
+                                )
+                                if returning:
+                                    batch_pairs.extend(cursor_current.fetchall())
+                                _logger.info(
+                                    f"Updated record with old_id: {record_data['old_id']}"
+                                )
+                                commit_policy.record()
+
+                            else:
+                                insert_fields = ", ".join(current_field_names)
+                                insert_placeholders = ", ".join(
+                                    ["%s"] * len(current_field_names)
+                                )
+                                sql_insert_query = f"INSERT INTO {current_table} ({insert_fields}) VALUES ({insert_placeholders}){returning}"
+                                insert_values = [
+                                    record_data[field] for field in current_field_names
+                                ]
+                                cursor_current.execute(sql_insert_query, insert_values)
+                                if returning:
+                                    batch_pairs.extend(cursor_current.fetchall())
+                                _logger.info(f"Inserted new record: {record_data}")
+                                commit_policy.record()
+
+                    # Ship the batch inside its savepoint, after its last row
+                    if upserter:
+                        upserter.upsert(pending_records)
+                        batch_pairs.extend(upserter.take_pairs())
+                    if stager:
+                        stager.flush()
+                    record_pairs(cursor_current, options["model"], batch_pairs)
+                    if buffered:
+                        commit_policy.record(buffered)
+
+            if stager:
+                # Published in the same transaction as the final commit
+                stager.publish()
+            if options.get("check_foreign_keys"):
+                self._check_integrity(cursor_current, current_table)
+        except Exception:
+            # The failed writes go first, an aborted transaction refuses the cleanup below
+            cursor_current.rollback()
+            if stager:
+                stager.close()
+                cursor_current.commit()
+            raise
+        finally:
+            # Temp tables live as long as the connection, which goes back to a pool
+            if copy_sink:
+                copy_sink.discard()
+                copy_sink.close()
+            if upserter:
+                upserter.close()
+        if stager:
+            stager.close()
+
+        commit_policy.commit()
+        options["failed_batches"].append(commit_policy.failed_batches)
+        options["extracted"].append(extracted)
+        summary = commit_policy.summary()
+        _logger.info(f"Commit summary for {current_table}: {summary}")
+        if copy_sink:
+            summary += f", COPY loaded {copy_sink.rows} rows ({copy_sink.rows_per_second:.0f} rows/sec)"
+        if upserter:
+            _logger.info(upserter.summary())
+            summary += f", {upserter.summary()}"
+        if stager:
+            _logger.info(stager.summary())
+            summary += f", {stager.summary()}"
+        return summary
+
     def action_migrate(self):
         conn_old = None
         cursor_old = None
-        conn_current = None
-        cursor_current = None
+        bulk_load = None
+        profile = None
+        failed = False
 
         try:
+            # A replay of captured changes writes a few rows: no index drop, session profile or maintenance
+            if self.env.context.get("active_ids") and "cdc_old_ids" not in self.env.context:
+                bulk_load = self.table_id._begin_bulk_load()
             old_table_name = self.table_id.old_db_table
             current_table_name = self.table_id.current_db_table
 
@@ -216,22 +1073,13 @@ class MigrationField(models.Model):
                 # "account_move_line"
             ):
                 connection = self.table_id.connection_id
-                conn_old = psycopg2.connect(
-                    dbname=connection.old_db_name,
-                    user=connection.pg_username,
-                    password=connection.pg_password,
-                    host=connection.pg_host,
-                )
+                conn_old = connection._acquire_old_connection()
                 cursor_old = conn_old.cursor()
 
-                # Connect to the current Odoo database
-                conn_current = psycopg2.connect(
-                    dbname=self.env.cr.dbname,
-                    user="odoo",
-                    password="odoo",
-                    host="localhost",
-                )
-                cursor_current = conn_current.cursor()
+                # Write through the request cursor, so the ORM lookups and the SQL
+                # writes share one transaction and snapshot
+                cursor_current = self.env.cr
+                self.env.flush_all()
 
                 # Fetching only the selected fields (marked in the list view)
                 selected_field_ids = self.env.context.get("active_ids", [])
@@ -249,6 +1097,9 @@ class MigrationField(models.Model):
                         },
                     }
 
+                # Only the raw SQL writes run under the profile, the ORM branch relies on the FK triggers
+                profile = self._start_session_profile(cursor_current)
+
                 # Getting the selected field names
                 old_field_names = ", ".join(
                     [field.old_field_name for field in selected_fields]
@@ -281,247 +1132,102 @@ class MigrationField(models.Model):
                 for model_name in models_to_check:
                     related_field_mappings.update(self.get_related_fields(model_name))
 
-                related_mappings = {}
-                for field_name, model_name in related_field_mappings.items():
-                    domain = []
-                    if model_name == "hr.employee":
-                        domain = ["|", ("active", "=", False), ("active", "=", True)]
-                    if model_name in (
-                        "res.partner",
-                        "res.users",
-                        "resource.resource",
-                        "product.template",
-                        "product.product",
-                        "product.pricelist",
-                        "stock.location",
-                    ):
-                        domain = ["|", ("active", "=", False), ("active", "=", True)]
-                    try:
-                        if model_name in ("res.currency"):
-                            mapped_values = (
-                                # self.env[model_name]
-                                # .search(domain)
-                                # .mapped(lambda r: (r.name, r.name))
-                                self.env[model_name]
-                                .search(domain)
-                                .mapped(lambda r: (r.old_id, r.id))
-                            )
-                        else:
-                            mapped_values = (
-                                self.env[model_name]
-                                .search(domain)
-                                .mapped(lambda r: (r.old_id, r.id))
-                            )
-
-                        if not mapped_values:
-                            continue
-
-                        related_mappings[field_name] = dict(mapped_values)
-
-                    except Exception as e:
-                        _logger.error(
-                            f"Error processing model {model_name} for field {field_name}: {str(e)}"
-                        )
-                        continue
+                related_mappings = self._get_related_mappings(related_field_mappings)
 
+                params = None
                 if old_table_name == 'res_users':
-                    cursor_old.execute(f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2 or id In (6, 46, 52);")
-                    rows = cursor_old.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2 or id In (6, 46, 52);"
                 elif old_table_name == 'product_product':
                     prefixed_field_names = ", ".join([f"pp.{f.strip()}" for f in old_field_names.split(",")])
-                    cursor_old.execute(f"""
+                    query = f"""
                         SELECT {prefixed_field_names}
                         FROM {old_table_name} pp
                         JOIN product_template pt ON pp.product_tmpl_id = pt.id
                         WHERE pt.company_id = 2 OR pt.company_id IS NULL;
-                    """)
-                    rows = cursor_old.fetchall()
+                    """
                 elif old_table_name in ['stock_quant', 'account_account', 'account_analytic_line', 'account_move',
                                         'account_move_line']:
-                    cursor_old.execute(f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2;")
-                    rows = cursor_old.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2;"
                 elif old_table_name == 'account_payment':
                     old_move_ids = self.env['account.move'].search([]).mapped('old_id') # already filtered by company earlier
                     if old_move_ids:
                         move_ids_tuple = tuple(old_move_ids)
                         query = f"SELECT {old_field_names} FROM {old_table_name} WHERE move_id IN %s"
-                        cursor_old.execute(query, (move_ids_tuple,))
-                        rows = cursor_old.fetchall()
+                        params = (move_ids_tuple,)
                     else:
-                        rows = []
+                        query = None
                 else:
-                    cursor_old.execute(f"SELECT {old_field_names} FROM {old_table_name}")
-                    rows = cursor_old.fetchall()
-
-                for row in rows:
-                    record_data = {}
-
-                    for idx, field_name in enumerate(current_field_names):
-                        value = row[idx] if row[idx] not in [None] else None
-                        record_data[field_name] = value
-
-                    # Handle Many2one fields, mapping old_id to the actual id in the current database
-                    for field_name, mapping in related_mappings.items():
-                        if (
-                            field_name in record_data
-                            and record_data[field_name] in mapping
-                        ):
-                            # Replace old_id with the corresponding current id
-                            record_data[field_name] = mapping[record_data[field_name]]
-
-                    # Skip if login is empty or in skip_logins
-                    skip_logins = ["default", "__system__", "portaltemplate", "public"]
-                    if "login" in record_data and (
-                        not record_data["login"] or record_data["login"] in skip_logins
-                    ):
-                        continue
-
-                    # current_table_model = current_table_name.model
-                    current_table = current_table_model.replace(".", "_")
-
-                    # Additional check for duplicates specifically for product_product
-                    if (
-                        current_table == "product_product"
-                        and "product_tmpl_id" in record_data
-                        and "combination_indices" in record_data
-                    ):
-                        original_combination_indices = record_data[
-                            "combination_indices"
-                        ]
-                        duplicate_found = True
-                        suffix_counter = 1
-
-                        while duplicate_found:
-                            cursor_current.execute(
-                                f"SELECT id FROM {current_table} WHERE product_tmpl_id = %s AND combination_indices = %s",
-                                (
-                                    record_data["product_tmpl_id"],
-                                    record_data["combination_indices"],
-                                ),
-                            )
-                            duplicate_record = cursor_current.fetchone()
-
-                            if duplicate_record:
-                                # Record with the same product_tmpl_id and combination_indices exists, add suffix and check again
-                                _logger.info(
-                                    f"Duplicate found for product_tmpl_id: {record_data['product_tmpl_id']} and combination_indices: {record_data['combination_indices']}. Trying a new suffix."
-                                )
-                                # Append or increment the suffix
-                                record_data[
-                                    "combination_indices"
-                                ] = f"{original_combination_indices}_{suffix_counter}"
-                                suffix_counter += 1
-                            else:
-                                # No duplicate found, we can insert this record
-                                duplicate_found = False
-
-                    # if current_table == 'account_move' and 'name' in record_data and record_data['name']:
-                    #     original_name = record_data['name']
-                    #     duplicate_found = True
-                    #     suffix_counter = 1
-                    #
-                    #     while duplicate_found:
-                    #         cursor_current.execute(
-                    #             f"SELECT id FROM account_move WHERE name = %s",
-                    #            (record_data['name'],)
-                    #         )
-                    #         duplicate_record = cursor_current.fetchone()
-                    #
-                    #         if duplicate_record:
-                    #            _logger.info(
-                    #                f"Duplicate found in account_move for name: {record_data['name']}. Trying a new suffix."
-                    #            )
-                    #            record_data['name'] = f"{original_name}_dup{suffix_counter}"
-                    #            suffix_counter += 1
-                    #         else:
-                    #            duplicate_found = False
-
-                    if "default_code" in record_data and record_data["default_code"]:
-                        cursor_current.execute(
-                            f"SELECT id FROM {current_table} WHERE default_code = %s",
-                            (record_data["default_code"],),
-                        )
-                        existing_variant = cursor_current.fetchone()
-                    else:
-                        existing_variant = None
-
-                    if existing_variant:
-                        update_fields = ", ".join(
-                            [
-                                f"{field} = %s"
-                                for field in current_field_names
-                                if field != "old_id"
-                            ]
-                        )
-                        update_values = [
-                            record_data[field]
-                            for field in current_field_names
-                            if field != "old_id"
-                        ]
-                        sql_update_query = f"UPDATE {current_table} SET {update_fields} WHERE default_code = %s"
-                        cursor_current.execute(
-                            sql_update_query,
-                            (*update_values, record_data["default_code"]),
-                        )
-                        _logger.info(
-                            f"Updated variant with default_code: {record_data['default_code']}"
-                        )
-                        conn_current.commit()
-
-                    else:
-                        if "old_id" in record_data and record_data["old_id"]:
-                            cursor_current.execute(
-                                f"SELECT id FROM {current_table} WHERE old_id = %s",
-                                (record_data["old_id"],),
-                            )
-                            existing_record = cursor_current.fetchone()
-                        else:
-                            existing_record = None
-
-                        if existing_record:
-                            # _logger.info("Skipping the record...")
-                            # continue
-                            update_fields = ", ".join(
-                                [
-                                    f"{field} = %s"
-                                    for field in current_field_names
-                                    if field != "old_id"
-                                ]
-                            )
-                            update_values = [
-                                record_data[field]
-                                for field in current_field_names
-                                if field != "old_id"
-                            ]
-                            sql_update_query = f"UPDATE {current_table} SET {update_fields} WHERE old_id = %s"
-                            cursor_current.execute(
-                                sql_update_query,
-                                (*update_values, record_data["old_id"]),
-                            )
-                            _logger.info(
-                                f"Updated record with old_id: {record_data['old_id']}"
-                            )
-                            conn_current.commit()
-
-                        else:
-                            insert_fields = ", ".join(current_field_names)
-                            insert_placeholders = ", ".join(
-                                ["%s"] * len(current_field_names)
-                            )
-                            sql_insert_query = f"INSERT INTO {current_table} ({insert_fields}) VALUES ({insert_placeholders})"
-                            insert_values = [
-                                record_data[field] for field in current_field_names
-                            ]
-                            cursor_current.execute(sql_insert_query, insert_values)
-                            _logger.info(f"Inserted new record: {record_data}")
-                            conn_current.commit()
+                    query = f"SELECT {old_field_names} FROM {old_table_name}"
+
+                delta = self._start_incremental(conn_old, query, params, current_field_names)
+                if delta:
+                    query, params = delta["query"], delta["params"]
+
+                current_table = current_table_model.replace(".", "_")
+                load_options = self._get_load_options()
+                load_options["related_models"] = related_field_mappings
+                # Cluster wide, so concurrent activity is counted too
+                wal_start = current_wal_lsn(cursor_current)
+                # Partitions need the old id, and product_product checks duplicates row by row
+                partitioned = (
+                    query
+                    and load_options["partitions"] > 1
+                    and "old_id" in current_field_names
+                    and current_table != "product_product"
+                )
+                skips_triggers = bool(profile and profile.skips_triggers)
+                # Partitions only see their own rows, the whole table is checked once they are done
+                load_options["check_foreign_keys"] = skips_triggers and not partitioned
+                if partitioned:
+                    summary = self._migrate_partitioned(
+                        conn_old,
+                        query,
+                        params,
+                        current_table,
+                        current_field_names,
+                        related_mappings,
+                        load_options,
+                    )
+                    if skips_triggers:
+                        # Already committed: the rows are reported, not rolled back
+                        with self.env.registry.cursor() as check_cr:
+                            self._check_integrity(check_cr, current_table)
+                else:
+                    rows = self._fetch_old_rows(conn_old, query, params) if query else []
+                    summary = self._load_fast_rows(
+                        cursor_current,
+                        rows,
+                        current_table,
+                        current_field_names,
+                        related_mappings,
+                        load_options,
+                    )
+                # Raw SQL writes bypass the ORM cache
+                self.env.invalidate_all()
+                wal_mib = wal_bytes_since(cursor_current, wal_start) / 1048576
+                staged = load_options["load_method"] == "staging" and current_table != "product_product"
+                self.table_id.write({"wal_mib_staging" if staged else "wal_mib_direct": wal_mib})
+                summary += (
+                    f", {wal_mib:.1f} MiB WAL (last direct load: {self.table_id.wal_mib_direct:.1f} MiB, "
+                    f"last staging load: {self.table_id.wal_mib_staging:.1f} MiB)"
+                )
+                if partitioned:
+                    # The partitions committed on their own cursors, outside of our snapshot
+                    with self.env.registry.cursor() as sync_cr:
+                        self.env(cr=sync_cr)["migration.id.map"]._sync_from_table(current_table_model)
+                else:
+                    self.env["migration.id.map"]._sync_from_table(current_table_model)
+                summary += self._end_incremental(
+                    delta, sum(load_options["failed_batches"]), sum(load_options["extracted"])
+                )
+                message = f"Migrated records into {current_table_name} successfully! {summary}."
 
                 return {
                     "type": "ir.actions.client",
                     "tag": "display_notification",
                     "params": {
                         "title": "Migration Successful",
-                        "message": f"Migrated records into {current_table_name} successfully!",
+                        "message": message,
                         "type": "success",
                         "sticky": False,
                     },
@@ -529,13 +1235,7 @@ class MigrationField(models.Model):
 
             else:
                 connection = self.table_id.connection_id
-                conn = psycopg2.connect(
-                    dbname=connection.old_db_name,
-                    user=connection.pg_username,
-                    password=connection.pg_password,
-                    host=connection.pg_host,
-                )
-                cursor = conn.cursor()
+                conn_old = connection._acquire_old_connection()
 
                 # Fetching only the selected fields (marked in the list view)
                 selected_field_ids = self.env.context.get("active_ids", [])
@@ -581,325 +1281,305 @@ class MigrationField(models.Model):
                 for model_name in models_to_check:
                     related_field_mappings.update(self.get_related_fields(model_name))
 
-                related_mappings = {}
-                for field_name, model_name in related_field_mappings.items():
-                    domain = []
-                    if model_name == "hr.employee":
-                        domain = ["|", ("active", "=", False), ("active", "=", True)]
-                    if model_name in (
-                        "res.partner",
-                        "res.users",
-                        "resource.resource",
-                        "product.product",
-                        "product.template",
-                        "stock.location",
-                        "product.pricelist",
-                    ):
-                        domain = ["|", ("active", "=", False), ("active", "=", True)]
-                    try:
-                        if model_name in ("res.country"):
-                            mapped_values = (
-                                self.env[model_name]
-                                .search(domain)
-                                .mapped(lambda r: (r.code, r.code))
-                            )
-                        else:
-                            mapped_values = (
-                                self.env[model_name]
-                                .search(domain)
-                                .mapped(lambda r: (r.old_id, r.id))
-                            )
-
-                        if not mapped_values:
-                            continue
-
-                        related_mappings[field_name] = dict(mapped_values)
-
-                    except Exception as e:
-                        _logger.error(
-                            f"Error processing model {model_name} for field {field_name}: {str(e)}"
-                        )
-                        continue
+                related_mappings = self._get_related_mappings(
+                    related_field_mappings, keys={"res.country": "code"}
+                )
 
                 # Fetching the old table data for the selected fields
                 BATCH_SIZE = 2500  # Define the batch size, you can adjust this value based on your needs
 
 
+                params = None
                 if old_table_name == 'res_company':
-                    cursor.execute(f"SELECT {old_field_names} FROM {old_table_name} WHERE id = 2;")
-                    rows = cursor.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name} WHERE id = 2;"
                 elif old_table_name == 'hr_employee':
-                    cursor.execute(f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2 OR id IN (15, 36, 40);")
-                    rows = cursor.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2 OR id IN (15, 36, 40);"
                 elif old_table_name == 'product_template':
-                    cursor.execute(f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2 OR company_id Is Null;")
-                    rows = cursor.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2 OR company_id Is Null;"
                 elif old_table_name == 'product_template_attribute_line':
                     template_records = self.env['product.template'].search([('old_id', '!=', False)])
                     old_template_ids = [tmpl.old_id for tmpl in template_records if tmpl.old_id]
                     id_list_str = ", ".join(map(str, old_template_ids))
-                    cursor.execute(f"SELECT {old_field_names} FROM {old_table_name} WHERE product_tmpl_id In ({id_list_str});")
-                    rows = cursor.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name} WHERE product_tmpl_id In ({id_list_str});"
                 elif old_table_name == 'product_template_attribute_value':
                     attribute_lines = self.env['product.template.attribute.line'].search([('old_id','!=', False)])
                     old_attribute_lines_ids = [atr_val.old_id for atr_val in attribute_lines if atr_val.old_id]
                     attribute_lines_id_list_str = ", ".join(map(str, old_attribute_lines_ids))
-                    cursor.execute(
-                        f"SELECT {old_field_names} FROM {old_table_name} WHERE attribute_line_id In ({attribute_lines_id_list_str});")
-                    rows = cursor.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name} WHERE attribute_line_id In ({attribute_lines_id_list_str});"
                 elif old_table_name == 'product_supplierinfo':
                     template_records = self.env['product.template'].search([('old_id', '!=', False)])
                     old_template_ids = [tmpl.old_id for tmpl in template_records if tmpl.old_id]
                     id_list_str = ", ".join(map(str, old_template_ids))
-                    cursor.execute(f"SELECT {old_field_names} FROM {old_table_name} WHERE product_tmpl_id In ({id_list_str});")
-                    rows = cursor.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name} WHERE product_tmpl_id In ({id_list_str});"
                 elif old_table_name in ['account_account', 'account_tax', 'account_tax_repartition_line', 'account_journal',
                                         'account_fiscal_position', 'account_fiscal_position_tax', 'account_tax_group',
                                         'account_analytic_account', 'hr_expense', 'hr_expense_sheet', 'account_partial_reconcile']:
-                    cursor.execute(f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2;")
-                    rows = cursor.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name} WHERE company_id = 2;"
                 elif old_table_name == 'pdc_account_payment':
                     old_journal_ids = self.env['account.journal'].search([]).mapped('old_id')  # already filtered by company earlier
                     if old_journal_ids:
                         journal_ids_tuple = tuple(old_journal_ids)
                         query = f"SELECT {old_field_names} FROM {old_table_name} WHERE journal_id IN %s"
-                        cursor.execute(query, (journal_ids_tuple,))
-                        rows = cursor.fetchall()
+                        params = (journal_ids_tuple,)
                     else:
-                        rows = []
+                        query = None
                 else:
-                    cursor.execute(f"SELECT {old_field_names} FROM {old_table_name};")
-                    rows = cursor.fetchall()
+                    query = f"SELECT {old_field_names} FROM {old_table_name};"
 
-                # Divide the rows into batches
-                total_rows = len(rows)
-                batches = [
-                    rows[i : i + BATCH_SIZE] for i in range(0, total_rows, BATCH_SIZE)
-                ]
+                delta = self._start_incremental(conn_old, query, params, current_field_names)
+                if delta:
+                    query, params = delta["query"], delta["params"]
+                rows = self._fetch_old_rows(conn_old, query, params) if query else []
+
+                # Divide the rows into batches, lazily when the rows are streamed
+                batches = iter_batches(rows, BATCH_SIZE)
+                commit_policy = self._get_commit_policy(
+                    self.env.cr, self.env.cr.commit, self.env.cr.rollback
+                )
 
+                # Existing records are found through the id map instead of a search per row,
+                # archived ones included
+                id_map = self.env["migration.id.map"]
+                current_ids = self._get_id_map(current_table)
+                current_model = self.env[current_table].with_context(active_test=False)
+                has_old_id_column = "old_id" in current_model._fields
+                migrated_ids = {}
+                batch_ids = {}
+
+                def find_migrated(old_id):
+                    new_id = (
+                        batch_ids.get(old_id)
+                        or migrated_ids.get(old_id)
+                        or current_ids.translate(old_id)
+                    )
+                    return current_model.browse(new_id) if new_id else current_model.browse()
+
+                extracted = 0
                 for batch_index, batch in enumerate(batches):
                     _logger.info(
-                        f"Processing batch {batch_index + 1}/{len(batches)} with {len(batch)} records"
+                        f"Processing batch {batch_index + 1} with {len(batch)} records"
                     )
+                    extracted += len(batch)
                     records_to_create = []
-
-                    for row in batch:
-                        record_data = {}
-                        skip_record = False
-
-                        # this for loop create record data = { fields : value, ...}
-                        for idx, field_name in enumerate(current_field_names):
-                            value = row[idx] if row[idx] not in [None, False] else None
-
-                            if field_name == "name" and not value:
-                                value = "Unknown"
-
-                            skip_logins = [
-                                "default",
-                                "__system__",
-                                "portaltemplate",
-                                "public",
-                            ]
-                            if field_name == "login":
-                                if not value or value in skip_logins:
-                                    continue
-
-                            field_obj = self.env[current_table]._fields.get(field_name)
-                            if field_obj and field_obj.type == "selection":
-                                if callable(field_obj.selection):
-                                    valid_selection_values = [
-                                        val[0] for val in field_obj.selection(self)
-                                    ]
+                    # Ids created by this batch, forgotten if the batch is rolled back
+                    batch_ids = {}
+
+                    with commit_policy.batch(f"{batch_index + 1} of {current_table}"):
+                        for row in batch:
+                            record_data = {}
+                            skip_record = False
+
+                            # this for loop create record data = { fields : value, ...}
+                            for idx, field_name in enumerate(current_field_names):
+                                value = row[idx] if row[idx] not in [None, False] else None
+
+                                if field_name == "name" and not value:
+                                    value = "Unknown"
+
+                                skip_logins = [
+                                    "default",
+                                    "__system__",
+                                    "portaltemplate",
+                                    "public",
+                                ]
+                                if field_name == "login":
+                                    if not value or value in skip_logins:
+                                        continue
+
+                                field_obj = self.env[current_table]._fields.get(field_name)
+                                if field_obj and field_obj.type == "selection":
+                                    if callable(field_obj.selection):
+                                        valid_selection_values = [
+                                            val[0] for val in field_obj.selection(self)
+                                        ]
+                                    else:
+                                        valid_selection_values = [
+                                            val[0] for val in field_obj.selection
+                                        ]
+
+                                    if value not in valid_selection_values:
+                                        skip_record = True
+                                        _logger.info(
+                                            f"Skipping record with invalid selection value '{value}' for field '{field_name}'"
+                                        )
+                                        break
+
+                                if field_name in related_mappings and value is not None:
+                                    record_data[field_name] = related_mappings[
+                                        field_name
+                                    ].translate(value, value)
                                 else:
-                                    valid_selection_values = [
-                                        val[0] for val in field_obj.selection
-                                    ]
+                                    record_data[field_name] = value
+
+                            if skip_record:
+                                continue
+
+                            old_id_value = record_data.get("old_id")
+                            default_code_value = record_data.get("default_code")
+                            name_value = record_data.get("name")
+                            if not has_old_id_column:
+                                # Mapped through migration.id.map only
+                                record_data.pop("old_id", None)
+
+                            if default_code_value:
+                                search_domain = [("default_code", "=", default_code_value)]
+                                if "active" in self.env[current_table]._fields:
+                                    search_domain = [
+                                        "|",
+                                        ("active", "=", True),
+                                        ("active", "=", False),
+                                    ] + search_domain
+                                existing_record = self.env[current_table].search(
+                                    search_domain, limit=1
+                                )
 
-                                if value not in valid_selection_values:
-                                    skip_record = True
-                                    _logger.info(
-                                        f"Skipping record with invalid selection value '{value}' for field '{field_name}'"
-                                    )
-                                    break
-
-                            if (
-                                field_name in related_mappings
-                                and value in related_mappings[field_name]
-                            ):
-                                record_data[field_name] = related_mappings[field_name][
-                                    value
-                                ]
-                            else:
-                                record_data[field_name] = value
+                                if existing_record:
+                                    keys_to_exclude = ["default_code"]
+                                    record_data_to_update = {
+                                        key: value
+                                        for key, value in record_data.items()
+                                        if key not in keys_to_exclude
+                                    }
+                                    try:
+                                        with self.env.cr.savepoint():
+                                            existing_record.write(record_data_to_update)
+                                        commit_policy.record()
+                                        _logger.info(
+                                            f"Record with default_code {default_code_value} updated successfully."
+                                        )
+                                    except Exception as update_error:
+                                        _logger.error(
+                                            f"Error updating record with default_code {default_code_value}: {update_error}"
+                                        )
+                                else:
+                                    if old_id_value:
+                                        existing_record = find_migrated(old_id_value)
+
+                                        if existing_record:
+                                            record_data_to_update = {
+                                                key: value
+                                                for key, value in record_data.items()
+                                                if key not in ["old_id", "default_code"]
+                                            }
+                                            try:
+                                                with self.env.cr.savepoint():
+                                                    existing_record.write(record_data_to_update)
+                                                commit_policy.record()
+                                                _logger.info(
+                                                    f"Record with old_id {old_id_value} updated successfully."
+                                                )
+                                            except Exception as update_error:
+                                                _logger.error(
+                                                    f"Error updating record with old_id {old_id_value}: {update_error}"
+                                                )
+                                        else:
+                                            try:
+                                                with self.env.cr.savepoint():
+                                                    new_record = self.env[current_table].sudo().create(
+                                                        record_data
+                                                    )
+                                                batch_ids[old_id_value] = new_record.id
+                                                commit_policy.record()
+                                                _logger.info(
+                                                    f"New record with old_id {old_id_value} created successfully."
+                                                )
+                                            except Exception as create_error:
+                                                _logger.error(
+                                                    f"Error creating new record with old_id {old_id_value}: {create_error}"
+                                                )
 
-                        if skip_record:
-                            continue
+                            elif old_id_value:
+                                existing_record = find_migrated(old_id_value)
 
-                        old_id_value = record_data.get("old_id")
-                        default_code_value = record_data.get("default_code")
-                        name_value = record_data.get("name")
-
-                        if default_code_value:
-                            search_domain = [("default_code", "=", default_code_value)]
-                            if "active" in self.env[current_table]._fields:
-                                search_domain = [
-                                    "|",
-                                    ("active", "=", True),
-                                    ("active", "=", False),
-                                ] + search_domain
-                            existing_record = self.env[current_table].search(
-                                search_domain, limit=1
-                            )
+                                if existing_record:
+                                    record_data_to_update = {
+                                        key: value
+                                        for key, value in record_data.items()
+                                        if key not in ["old_id", "default_code"]
+                                    }
+                                    try:
+                                        if current_table == "product.category" and "property_valuation" not in record_data_to_update:
+                                            record_data_to_update["property_valuation"] = "real_time"
 
-                            if existing_record:
-                                keys_to_exclude = ["default_code"]
-                                record_data_to_update = {
-                                    key: value
-                                    for key, value in record_data.items()
-                                    if key not in keys_to_exclude
-                                }
-                                try:
-                                    existing_record.write(record_data_to_update)
-                                    self.env.cr.commit()
-                                    _logger.info(
-                                        f"Record with default_code {default_code_value} updated successfully."
-                                    )
-                                except Exception as update_error:
-                                    _logger.error(
-                                        f"Error updating record with default_code {default_code_value}: {update_error}"
-                                    )
-                            else:
-                                if old_id_value:
-                                    search_domain = [("old_id", "=", old_id_value)]
-                                    if "active" in self.env[current_table]._fields:
-                                        search_domain = [
-                                            "|",
-                                            ("active", "=", True),
-                                            ("active", "=", False),
-                                        ] + search_domain
-
-                                    existing_record = self.env[current_table].search(
-                                        search_domain, limit=1
-                                    )
+                                        if current_table == "product.category" and "property_cost_method" not in record_data_to_update:
+                                            record_data_to_update["property_cost_method"] = "average"
 
-                                    if existing_record:
-                                        record_data_to_update = {
-                                            key: value
-                                            for key, value in record_data.items()
-                                            if key not in ["old_id", "default_code"]
-                                        }
-                                        try:
+                                        with self.env.cr.savepoint():
                                             existing_record.write(record_data_to_update)
-                                            self.env.cr.commit()
-                                            _logger.info(
-                                                f"Record with old_id {old_id_value} updated successfully."
-                                            )
-                                        except Exception as update_error:
-                                            _logger.error(
-                                                f"Error updating record with old_id {old_id_value}: {update_error}"
-                                            )
-                                    else:
-                                        try:
-                                            self.env[current_table].sudo().create(
-                                                record_data
-                                            )
-                                            self.env.cr.commit()
-                                            _logger.info(
-                                                f"New record with old_id {old_id_value} created successfully."
-                                            )
-                                        except Exception as create_error:
-                                            _logger.error(
-                                                f"Error creating new record with old_id {old_id_value}: {create_error}"
-                                            )
-
-                        elif old_id_value:
-                            search_domain = [("old_id", "=", old_id_value)]
-                            if "active" in self.env[current_table]._fields:
-                                search_domain = [
-                                    "|",
-                                    ("active", "=", True),
-                                    ("active", "=", False),
-                                ] + search_domain
-                            existing_record = self.env[current_table].search(
-                                search_domain, limit=1
-                            )
-
-                            if existing_record:
-                                record_data_to_update = {
-                                    key: value
-                                    for key, value in record_data.items()
-                                    if key not in ["old_id", "default_code"]
-                                }
-                                try:
-                                    if current_table == "product.category" and "property_valuation" not in record_data_to_update:
-                                        record_data_to_update["property_valuation"] = "real_time"
-
-                                    if current_table == "product.category" and "property_cost_method" not in record_data_to_update:
-                                        record_data_to_update["property_cost_method"] = "average"
-
-                                    existing_record.write(record_data_to_update)
-                                    self.env.cr.commit()
-                                    _logger.info(
-                                        f"Record with old_id {old_id_value} updated successfully."
-                                    )
-                                except Exception as update_error:
-                                    _logger.error(
-                                        f"Error updating record with old_id {old_id_value}: {update_error}"
-                                    )
+                                        commit_policy.record()
+                                        _logger.info(
+                                            f"Record with old_id {old_id_value} updated successfully."
+                                        )
+                                    except Exception as update_error:
+                                        _logger.error(
+                                            f"Error updating record with old_id {old_id_value}: {update_error}"
+                                        )
+                                else:
+                                    try:
+                                        if current_table == "product.category" and "property_valuation" not in record_data:
+                                            record_data["property_valuation"] = "real_time"
+
+                                        if current_table == "product.category" and "property_cost_method" not in record_data:
+                                            record_data["property_cost_method"] = "average"
+
+                                        if current_table == "account.journal" and old_id_value in [15, 16]:
+                                            for key, value in record_data.items():
+                                                if isinstance(value, dict):
+                                                    record_data[key] = value.get("en_US") or next(iter(value.values()),
+                                                                                                  None)
+                                                    _logger.warning(
+                                                        f"Converted dict to string for field '{key}' (old_id={old_id_value})"
+                                                    )
+
+                                        with self.env.cr.savepoint():
+                                            new_record = self.env[current_table].sudo().create(record_data)
+                                        batch_ids[old_id_value] = new_record.id
+                                        commit_policy.record()
+                                        _logger.info(
+                                            f"New record with old_id======___________========----- {old_id_value} created successfully."
+                                        )
+                                    except Exception as create_error:
+                                        _logger.error(
+                                            f"Error creating new record with old_id {old_id_value}: {create_error}"
+                                        )
                             else:
                                 try:
-                                    if current_table == "product.category" and "property_valuation" not in record_data:
-                                        record_data["property_valuation"] = "real_time"
-
-                                    if current_table == "product.category" and "property_cost_method" not in record_data:
-                                        record_data["property_cost_method"] = "average"
-
-                                    if current_table == "account.journal" and old_id_value in [15, 16]:
-                                        for key, value in record_data.items():
-                                            if isinstance(value, dict):
-                                                record_data[key] = value.get("en_US") or next(iter(value.values()),
-                                                                                              None)
-                                                _logger.warning(
-                                                    f"Converted dict to string for field '{key}' (old_id={old_id_value})"
-                                                )
-
-                                    self.env[current_table].sudo().create(record_data)
-                                    self.env.cr.commit()
+                                    with self.env.cr.savepoint():
+                                        self.env[current_table].sudo().create(record_data)
+                                    commit_policy.record()
                                     _logger.info(
-                                        f"New record with old_id======___________========----- {old_id_value} created successfully."
+                                        f"New record created successfully: {record_data}"
                                     )
                                 except Exception as create_error:
                                     _logger.error(
-                                        f"Error creating new record with old_id {old_id_value}: {create_error}"
+                                        f"Error creating new record: {create_error}"
                                     )
-                        else:
-                            try:
-                                self.env[current_table].sudo().create(record_data)
-                                self.env.cr.commit()
-                                _logger.info(
-                                    f"New record created successfully: {record_data}"
-                                )
-                            except Exception as create_error:
-                                _logger.error(
-                                    f"Error creating new record: {create_error}"
-                                )
 
-                        _logger.info(
-                            f"Batch {batch_index + 1}/{len(batches)} processed successfully"
-                        )
+                            _logger.info(
+                                f"Batch {batch_index + 1} processed successfully"
+                            )
+
+                        # Committed together with the records of the batch
+                        id_map._record_pairs(current_table, batch_ids.items())
+                        migrated_ids.update(batch_ids)
+
+                commit_policy.commit()
+                incremental = self._end_incremental(delta, commit_policy.failed_batches, extracted)
+                _logger.info(f"Commit summary for {current_table}: {commit_policy.summary()}{incremental}")
 
                 return {
                     "type": "ir.actions.client",
                     "tag": "display_notification",
                     "params": {
                         "title": "Migration Successful",
-                        "message": f"Migrated records for {current_table} successfully!",
+                        "message": f"Migrated records for {current_table} successfully! {commit_policy.summary()}{incremental}.",
                         "type": "success",
                         "sticky": False,
                     },
                 }
 
         except psycopg2.DatabaseError as e:
+            failed = True
             return {
                 "type": "ir.actions.client",
                 "tag": "display_notification",
@@ -912,6 +1592,7 @@ class MigrationField(models.Model):
             }
 
         except Exception as e:
+            failed = True
             return {
                 "type": "ir.actions.client",
                 "tag": "display_notification",
@@ -924,21 +1605,39 @@ class MigrationField(models.Model):
             }
 
         finally:
+            # A failed run may leave an aborted transaction, or writes the index
+            # rebuild below would commit: drop them first
+            if failed:
+                self.env.cr.rollback()
             # Close cursors and connections if they were created
             if cursor_old:
                 cursor_old.close()
             if conn_old:
-                conn_old.close()
-            if cursor_current:
-                cursor_current.close()
-            if conn_current:
-                conn_current.close()
+                release(conn_old)
+            if profile:
+                try:
+                    profile.reset()
+                except Exception as e:
+                    _logger.error(f"Ending the session profile failed: {e}")
+            if bulk_load:
+                try:
+                    self.table_id._finish_bulk_load(bulk_load)
+                except Exception as e:
+                    _logger.error(
+                        f"Restoring the indexes of {bulk_load['table']} failed, use Restore Indexes: {e}"
+                    )
+                try:
+                    self.table_id._maintain_after_load(bulk_load["table"])
+                except Exception as e:
+                    _logger.error(f"Maintenance of {bulk_load['table']} failed: {e}")
+            # Records were migrated into the model, even when the run failed halfway
+            if self.table_id.current_db_table:
+                self._get_id_cache().invalidate(self.table_id.current_db_table.model)
 
     def action_migrate_for_related_tables(self):
         conn_old = None
         cursor_old = None
-        conn_current = None
-        cursor_current = None
+        profile = None
 
         try:
             old_table_name = self.table_id.old_db_table
@@ -946,22 +1645,13 @@ class MigrationField(models.Model):
 
             # Connect to the old database
             connection = self.table_id.connection_id
-            conn_old = psycopg2.connect(
-                dbname=connection.old_db_name,
-                user=connection.pg_username,
-                password=connection.pg_password,
-                host=connection.pg_host,
-            )
+            conn_old = connection._acquire_old_connection()
             cursor_old = conn_old.cursor()
 
-            # Connect to the current Odoo database
-            conn_current = psycopg2.connect(
-                dbname=self.env.cr.dbname,
-                user="odoo",
-                password="odoo",
-                host="localhost",
-            )
-            cursor_current = conn_current.cursor()
+            # Write through the request cursor of the current Odoo database
+            cursor_current = self.env.cr
+            self.env.flush_all()
+            profile = self._start_session_profile(cursor_current)
 
             # Fetching only the selected fields
             selected_field_ids = self.env.context.get("active_ids", [])
@@ -993,32 +1683,32 @@ class MigrationField(models.Model):
                 [f"{field} = %s" for field in unique_fields]
             )
 
-            # Fetch data from old database
-            cursor_old.execute(f"SELECT {old_field_names} FROM {old_table_name};")
-            rows = cursor_old.fetchall()
-
-            if current_table_name == "account_move_line_account_tax_rel":
-                # Fetch specific company data from old database
-                cursor_old.execute(f"""
+            # Fetch data from old database, the move line relations only for the migrated company
+            if current_table_name in (
+                "account_move_line_account_tax_rel",
+                "account_account_tag_account_move_line_rel",
+            ):
+                rows = self._fetch_old_rows(conn_old, f"""
                     SELECT {old_field_names}
                     FROM {old_table_name} rel
                     JOIN account_move_line aml ON aml.id = rel.account_move_line_id
                     WHERE aml.company_id = 2;
                 """)
-                rows = cursor_old.fetchall()
+            else:
+                rows = self._fetch_old_rows(conn_old, f"SELECT {old_field_names} FROM {old_table_name};")
 
+            # old_id -> new id maps of both sides, instead of two lookups per row
+            if current_table_name == "account_move_line_account_tax_rel":
+                account_move_line_ids = self._get_id_map("account.move.line")
+                account_tax_ids = self._get_id_map("account.tax")
                 for row in rows:
                     old_move_line_id, old_tax_id = row
 
                     # Get new account.move.line ID using old_id
-                    cursor_current.execute("SELECT id FROM account_move_line WHERE old_id = %s", (old_move_line_id,))
-                    result = cursor_current.fetchone()
-                    new_move_line_id = result[0] if result else None
+                    new_move_line_id = account_move_line_ids.translate(old_move_line_id)
 
                     # Get new account.tax ID using old_id
-                    cursor_current.execute("SELECT id FROM account_tax WHERE old_id = %s", (old_tax_id,))
-                    result = cursor_current.fetchone()
-                    new_tax_id = result[0] if result else None
+                    new_tax_id = account_tax_ids.translate(old_tax_id)
 
                     # Skip if mapping fails
                     if not new_move_line_id or not new_tax_id:
@@ -1053,28 +1743,17 @@ class MigrationField(models.Model):
                         f"Inserted relation: account_move_line_id={new_move_line_id}, account_tax_id={new_tax_id}"
                     )
             elif current_table_name == "account_account_tag_account_move_line_rel":
-                # Fetch specific company data from old database
-                cursor_old.execute(f"""
-                    SELECT {old_field_names}
-                    FROM {old_table_name} rel
-                    JOIN account_move_line aml ON aml.id = rel.account_move_line_id
-                    WHERE aml.company_id = 2;
-                """)
-                rows = cursor_old.fetchall()
-
+                account_move_line_ids = self._get_id_map("account.move.line")
+                account_account_tag_ids = self._get_id_map("account.account.tag")
                 for row in rows:
                     # Assuming row contains old_move_line_id and old_tag_id from old DB
                     old_move_line_id, old_tag_id = row
 
                     # Get new account.move.line ID using old_id
-                    cursor_current.execute("SELECT id FROM account_move_line WHERE old_id = %s", (old_move_line_id,))
-                    result = cursor_current.fetchone()
-                    new_move_line_id = result[0] if result else None
+                    new_move_line_id = account_move_line_ids.translate(old_move_line_id)
 
                     # Get new account.account.tag ID using old_id
-                    cursor_current.execute("SELECT id FROM account_account_tag WHERE old_id = %s", (old_tag_id,))
-                    result = cursor_current.fetchone()
-                    new_tag_id = result[0] if result else None
+                    new_tag_id = account_account_tag_ids.translate(old_tag_id)
 
                     # Skip if mapping fails
                     if not new_move_line_id or not new_tag_id:
@@ -1109,18 +1788,16 @@ class MigrationField(models.Model):
                         f"Inserted relation: account_move_line_id={new_move_line_id}, account_account_tag_id={new_tag_id}"
                     )
             elif current_table_name in ["product_supplier_taxes_rel", "product_taxes_rel"]:
+                product_template_ids = self._get_id_map("product.template")
+                account_tax_ids = self._get_id_map("account.tax")
                 for row in rows:
                     old_prod_id, old_tax_id = row
 
                     # Get new product_template ID using old_id
-                    cursor_current.execute("SELECT id FROM product_template WHERE old_id = %s", (old_prod_id,))
-                    result = cursor_current.fetchone()
-                    new_prod_id = result[0] if result else None
+                    new_prod_id = product_template_ids.translate(old_prod_id)
 
                     # Get new account_tax ID using old_id
-                    cursor_current.execute("SELECT id FROM account_tax WHERE old_id = %s", (old_tax_id,))
-                    result = cursor_current.fetchone()
-                    new_tax_id = result[0] if result else None
+                    new_tax_id = account_tax_ids.translate(old_tax_id)
 
                     # Skip if either mapping not found
                     if not new_prod_id or not new_tax_id:
@@ -1150,18 +1827,16 @@ class MigrationField(models.Model):
 
             # For HR Expense tax_ids fields
             elif current_table_name == "expense_tax":
+                hr_expense_ids = self._get_id_map("hr.expense")
+                account_tax_ids = self._get_id_map("account.tax")
                 for row in rows:
                     old_expense_id, old_tax_id = row
 
                     # Get new hr_expense ID using old_id
-                    cursor_current.execute("SELECT id FROM hr_expense WHERE old_id = %s", (old_expense_id,))
-                    result = cursor_current.fetchone()
-                    new_expense_id = result[0] if result else None
+                    new_expense_id = hr_expense_ids.translate(old_expense_id)
 
                     # Get new account_tax ID using old_id
-                    cursor_current.execute("SELECT id FROM account_tax WHERE old_id = %s", (old_tax_id,))
-                    result = cursor_current.fetchone()
-                    new_tax_id = result[0] if result else None
+                    new_tax_id = account_tax_ids.translate(old_tax_id)
 
                     # Skip if mapping fails
                     if not new_expense_id or not new_tax_id:
@@ -1204,14 +1879,21 @@ class MigrationField(models.Model):
                     cursor_current.execute(sql_insert_query, insert_values)
                     _logger.info(f"Inserted new record with fields: {insert_values}")
 
-            cursor_current.connection.commit()
+            if profile:
+                profile.reset()
+                if profile.skips_triggers:
+                    self._check_integrity(cursor_current, current_table_name)
+            cursor_current.commit()
+            self.env.invalidate_all()
+            self.table_id._maintain_after_load(current_table_name)
+            message = f"Records migrated into {current_table_name} successfully!"
 
             return {
                 "type": "ir.actions.client",
                 "tag": "display_notification",
                 "params": {
                     "title": "Migration Successful",
-                    "message": f"Records migrated into {current_table_name} successfully!",
+                    "message": message,
                     "type": "success",
                     "sticky": False,
                 },
@@ -1221,30 +1903,62 @@ class MigrationField(models.Model):
             _logger.error(f"Error during migration: {str(e)}")
             raise
         finally:
+            if profile:
+                # No-op when the profile already ended before the commit
+                profile.reset()
             if cursor_old:
                 cursor_old.close()
             if conn_old:
-                conn_old.close()
-            if cursor_current:
-                cursor_current.close()
-            if conn_current:
-                conn_current.close()
+                release(conn_old)
+
+    def _read_account_codes(self, session, old_records, field_names, account_codes):
+        """Add the codes of the old accounts a page points to into ``account_codes``.
+
+        The accounts not seen on an earlier page are read with a single
+        account.account read.
+        """
+        account_ids = list(dict.fromkeys(
+            old_rec[field_name][0]
+            for old_rec in old_records
+            for field_name in field_names
+            if old_rec.get(field_name) and old_rec[field_name][0] not in account_codes
+        ))
+        if account_ids:
+            for acc_data in session.execute("account.account", "read", [account_ids], {"fields": ["code"]}):
+                account_codes[acc_data["id"]] = acc_data["code"]
+        return account_codes
+
+    def _get_account_index(self):
+        """code -> id of the current accounts, the first one per code like search(limit=1)."""
+        account_index = {}
+        for account in self.env["account.account"].search_read([], ["code"]):
+            account_index.setdefault(account["code"], account["id"])
+        return account_index
+
+    def _get_property_writer(self, model_name, field_names):
+        """PropertyWriter of the company-dependent fields among ``field_names``, None without any."""
+        model = self.env[model_name]
+        fields_info = {
+            name: (
+                self.env["ir.model.fields"]._get(model_name, name).id,
+                model._fields[name].type,
+                model._fields[name].comodel_name,
+            )
+            for name in field_names
+            if name in model._fields and model._fields[name].company_dependent
+        }
+        if not fields_info:
+            return None
+        return PropertyWriter(
+            self.env.cr, model_name, model._table, self.env.company.id, fields_info, uid=self.env.uid
+        )
 
     def action_migrate_not_stored_fields(self):
         try:
             connection = self.table_id.connection_id
-            url = f"{connection.old_odoo_url}"
-            old_db = connection.old_db_name
-            username = connection.old_username
-            password = connection.old_password
-
-            common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
-            old_uid = common.authenticate(old_db, username, password, {})
-            if not old_uid:
-                raise ValueError("Failed to authenticate to the old database.")
-
-            # Old database connection
-            models = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object")
+            # Kept-alive session, the uid of connect_to_database is reused
+            session = connection._get_rpc_session()
+            round_trips = session.round_trips
 
             selected_field_ids = self.env.context.get("active_ids", [])
             selected_fields = self.browse(selected_field_ids)
@@ -1278,58 +1992,81 @@ class MigrationField(models.Model):
             old_table_name = self.table_id.old_db_table
             old_table_cus_name = old_table_name.replace("_", ".")
 
-            # Fetch records from old DB
-            old_records = []
-            if old_table_name == "res_partner":
-                old_records = models.execute_kw(old_db, old_uid, password, old_table_cus_name, "search_read", [[]],
-                    {"fields": field_names, 'context': {'active_test': False}})
-            else:
-                old_records = models.execute_kw(old_db, old_uid, password, old_table_cus_name, "search_read", [[]],
-                    {"fields": field_names, 'context': {'active_test': False}})
-
-            for old_rec in old_records:
-                old_id = old_rec.get("id")
-                if not old_id:
-                    continue
+            # Fetch records from old DB, page by page
+            reader = connection._get_paged_reader(
+                old_table_cus_name, field_names, context={'active_test': False}
+            )
 
-                # Migrate data to current DB
-                current_rec = self.env[old_table_cus_name].search([("old_id", "=", old_id)], limit=1)
-                if not current_rec:
-                    continue
+            current_ids = self._get_id_map(old_table_cus_name)
+            payment_term_ids = self._get_id_map("account.payment.term")
+            account_fields = [name for name in field_names if name in ACCOUNT_FIELDS]
+            # old account id -> code, filled page by page, and current code -> id, built once
+            account_codes = {}
+            account_index = self._get_account_index() if account_fields else {}
+            # Company-dependent values are written set-based per page, not through the ORM
+            property_writer = self._get_property_writer(old_table_cus_name, field_names)
+
+            for page in reader:
+                # One read of the page's new accounts, the payment terms go through their id map
+                if account_fields:
+                    self._read_account_codes(session, page, account_fields, account_codes)
+                for old_rec in page:
+                    old_id = old_rec.get("id")
+                    if not old_id:
+                        continue
 
-                update_vals = {}
-                for field in selected_fields:
-                    if field.old_field_name == "id":
+                    # Migrate data to current DB
+                    current_id = current_ids.translate(old_id)
+                    if not current_id:
                         continue
+                    current_rec = self.env[old_table_cus_name].browse(current_id)
 
-                    if field.old_field_name in ["property_account_receivable_id", "property_account_payable_id"]:
-                        acc_field = old_rec.get(field.old_field_name)
-                        acc_id = acc_field[0] if acc_field else False # many2one field (ID only)
-                        acc_data = models.execute_kw(old_db, old_uid, password, "account.account", "read", [acc_id],
-                            {"fields": ["code"]})
-                        if acc_data:
-                            account_rec = self.env["account.account"].search([("code", "=", acc_data[0]['code'])], limit=1)
-                            if account_rec:
-                                update_vals[field.old_field_name] = account_rec.id
-                    elif field.old_field_name in ["property_payment_term_id", "property_supplier_payment_term_id"]:
-                        old_payment_term = old_rec.get(field.old_field_name)
-                        old_payment_term_id = old_payment_term[0] if old_payment_term else False # many2one field (ID only)
-                        new_payment_term_id = self.env["account.payment.term"].search([("old_id", "=", old_payment_term_id)], limit=1)
-                        if new_payment_term_id:
-                            update_vals[field.old_field_name] = new_payment_term_id.id
-                    else:
-                        update_vals[field.old_field_name] = old_rec.get(field.old_field_name)
+                    update_vals = {}
+                    for field in selected_fields:
+                        if field.old_field_name == "id":
+                            continue
+
+                        if field.old_field_name in ACCOUNT_FIELDS:
+                            acc_field = old_rec.get(field.old_field_name)
+                            acc_id = acc_field[0] if acc_field else False # many2one field (ID only)
+                            new_account_id = account_index.get(account_codes.get(acc_id))
+                            if new_account_id:
+                                update_vals[field.old_field_name] = new_account_id
+                        elif field.old_field_name in PAYMENT_TERM_FIELDS:
+                            old_payment_term = old_rec.get(field.old_field_name)
+                            old_payment_term_id = old_payment_term[0] if old_payment_term else False # many2one field (ID only)
+                            new_payment_term_id = payment_term_ids.translate(old_payment_term_id)
+                            if new_payment_term_id:
+                                update_vals[field.old_field_name] = new_payment_term_id
+                        else:
+                            update_vals[field.old_field_name] = old_rec.get(field.old_field_name)
 
-                if update_vals:
-                    current_rec.write(update_vals)
-                    _logger.info(f"Update record with : ID - {current_rec.id} | Old Id - {old_id} | Value - {update_vals}")
+                    if property_writer:
+                        for name in [name for name in update_vals if property_writer.handles(name)]:
+                            if not isinstance(update_vals[name], (list, tuple)):
+                                property_writer.add(current_id, name, update_vals.pop(name))
+
+                    if update_vals:
+                        current_rec.write(update_vals)
+                        _logger.info(f"Update record with : ID - {current_rec.id} | Old Id - {old_id} | Value - {update_vals}")
+
+                if property_writer:
+                    self.env.flush_all()
+                    property_writer.flush()
+
+            if property_writer:
+                # Raw SQL writes bypass the ORM cache
+                self.env.invalidate_all()
+                _logger.info(property_writer.summary())
 
             return {
                 "type": "ir.actions.client",
                 "tag": "display_notification",
                 "params": {
                     "title": "Fields Migration Successful",
-                    "message": f"Fields migrated into {old_table_cus_name} successfully!",
+                    "message": f"Fields migrated into {old_table_cus_name} successfully! "
+                    f"{reader.summary()}, {session.round_trips - round_trips} XML-RPC round-trips."
+                    + (f" {property_writer.summary()}." if property_writer else ""),
                     "type": "success",
                     "sticky": False,
                 },
@@ -1350,41 +2087,41 @@ class MigrationField(models.Model):
     def update_create_date(self):
         conn_old = None
         cursor_old = None
-        conn_current = None
-        cursor_current = None
         try:
             old_table_name = self.table_id.old_db_table
 
             # Connect to the old database
             connection = self.table_id.connection_id
-            conn_old = psycopg2.connect(
-                dbname=connection.old_db_name,
-                user=connection.pg_username,
-                password=connection.pg_password,
-                host=connection.pg_host,
-            )
+            conn_old = connection._acquire_old_connection()
             cursor_old = conn_old.cursor()
 
-            # Connect to the current Odoo database
-            conn_current = psycopg2.connect(
-                dbname=self.env.cr.dbname,
-                user="odoo",
-                password="odoo",
-                host="localhost",
-            )
-            cursor_current = conn_current.cursor()
+            # Write through the request cursor of the current Odoo database
+            cursor_current = self.env.cr
+            self.env.flush_all()
 
             # Fetch data from old database
             if old_table_name in [ 'hr_expense', 'hr_expense_sheet']:
-                cursor_old.execute(f"SELECT id, create_date FROM {old_table_name} WHERE company_id = 2;")
-                rows = cursor_old.fetchall()
+                rows = self._fetch_old_rows(conn_old, f"SELECT id, create_date FROM {old_table_name} WHERE company_id = 2;")
 
-                if rows:
-                    for old_id, create_date in rows:
-                        cursor_current.execute(f"""UPDATE {old_table_name} SET create_date = %s WHERE old_id = %s;""", (create_date, old_id))
-                        _logger.info(f"Updated : {old_table_name} , Old id : {old_id}, Total Record : {len(rows)}.")
+                total_rows = 0
+                model_name = old_table_name.replace("_", ".")
+                self.env["migration.id.map"]._sync_from_table(model_name)
+                for old_id, create_date in rows:
+                    # Indexed lookup of the current id instead of a scan on the old_id column
+                    cursor_current.execute(
+                        f"""
+                        UPDATE {old_table_name} SET create_date = %s
+                        WHERE id = (SELECT new_id FROM migration_id_map WHERE model = %s AND old_id = %s);
+                        """,
+                        (create_date, model_name, old_id),
+                    )
+                    total_rows += 1
+                    _logger.info(f"Updated : {old_table_name} , Old id : {old_id}.")
 
-                    conn_current.commit()
+                if total_rows:
+                    cursor_current.commit()
+                    self.env.invalidate_all()
+                    _logger.info(f"Updated create date of {total_rows} records in {old_table_name}.")
 
         except Exception as e:
             _logger.error(f"Error during migration: {str(e)}")
@@ -1393,11 +2130,7 @@ class MigrationField(models.Model):
             if cursor_old:
                 cursor_old.close()
             if conn_old:
-                conn_old.close()
-            if cursor_current:
-                cursor_current.close()
-            if conn_current:
-                conn_current.close()
+                release(conn_old)
 
     # def update_payment_terms(self):
     #     try:
@@ -0,0 +1,110 @@
+from odoo import models, fields
+from psycopg2.extras import execute_values
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def record_pairs(cursor, model_name, pairs, page_size=5000):
+    """Insert or update (old_id, new_id) pairs of a model in bulk, on any cursor.
+
+    An old id given twice keeps its newest record, like _sync_from_table.
+    Unchanged pairs are left alone.
+    """
+    new_ids = {}
+    for old_id, new_id in pairs:
+        if old_id and new_id:
+            new_ids[old_id] = max(new_id, new_ids.get(old_id, 0))
+    if not new_ids:
+        return 0
+    execute_values(
+        cursor,
+        """
+        INSERT INTO migration_id_map (model, old_id, new_id) VALUES %s
+        ON CONFLICT (model, old_id) DO UPDATE SET new_id = EXCLUDED.new_id
+        WHERE migration_id_map.new_id <> EXCLUDED.new_id
+        """,
+        [(model_name, old_id, new_id) for old_id, new_id in new_ids.items()],
+        page_size=page_size,
+    )
+    return len(new_ids)
+
+
+class MigrationIdMap(models.Model):
+    _name = "migration.id.map"
+    _description = "Old id to current id of every migrated record."
+    _log_access = False
+
+    model = fields.Char("Model", required=True)
+    old_id = fields.Integer("Old ID", required=True)
+    new_id = fields.Integer("Current ID", required=True)
+
+    _sql_constraints = [
+        (
+            "model_old_id_uniq",
+            "unique(model, old_id)",
+            "An old record can only be mapped once per model.",
+        ),
+    ]
+
+    def _record_pairs(self, model_name, pairs, page_size=5000):
+        """Insert or update (old_id, new_id) pairs of a model in bulk, see record_pairs()."""
+        return record_pairs(self.env.cr, model_name, pairs, page_size=page_size)
+
+    def _sync_from_table(self, model_name):
+        """Bring the map of a model in line with its table.
+
+        Pairs of deleted records are dropped, then the pairs of the old_id
+        column missing from the map or pointing elsewhere are written with
+        one statement, the unchanged ones are not touched. Run once after a
+        load; models without an old_id column only get their pairs from
+        _record_pairs.
+        """
+        model = self.env[model_name]
+        self.env.cr.execute(
+            f"""
+            DELETE FROM migration_id_map m
+            WHERE m.model = %s
+              AND NOT EXISTS (SELECT 1 FROM "{model._table}" t WHERE t.id = m.new_id)
+            """,
+            (model_name,),
+        )
+        field = model._fields.get("old_id")
+        if not field or not field.store:
+            return 0
+        model.flush_model(["old_id"])
+        # DISTINCT ON keeps one current record per old id, the newest like the dict maps
+        self.env.cr.execute(
+            f"""
+            INSERT INTO migration_id_map (model, old_id, new_id)
+            SELECT %s, t.old_id, t.id
+            FROM (
+                SELECT DISTINCT ON (old_id) old_id, id
+                FROM "{model._table}"
+                WHERE old_id IS NOT NULL
+                ORDER BY old_id, id DESC
+            ) t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM migration_id_map m
+                WHERE m.model = %s AND m.old_id = t.old_id AND m.new_id = t.id
+            )
+            ON CONFLICT (model, old_id) DO UPDATE SET new_id = EXCLUDED.new_id
+            """,
+            (model_name, model_name),
+        )
+        synced = self.env.cr.rowcount
+        if synced:
+            _logger.info(f"Id map: {synced} ids of {model_name} synced from {model._table}")
+        return synced
+
+    def _has_pairs(self, model_name):
+        self.env.cr.execute("SELECT 1 FROM migration_id_map WHERE model = %s LIMIT 1", (model_name,))
+        return bool(self.env.cr.fetchone())
+
+    def _read_pairs(self, model_name):
+        """(old_id, new_id) pairs of a model, read through the (model, old_id) index."""
+        self.env.cr.execute(
+            "SELECT old_id, new_id FROM migration_id_map WHERE model = %s ORDER BY old_id",
+            (model_name,),
+        )
+        return self.env.cr.fetchall()
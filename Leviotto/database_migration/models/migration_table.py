@@ -1,6 +1,20 @@
 from odoo import models, fields, api
 import psycopg2
+import json
 import logging
+import time
+
+from ..tools.cdc import install_capture, purge_changes, read_changes, remove_capture
+from ..tools.commit_policy import COMMIT_MODES
+from ..tools.index_manager import (
+    drop_indexes,
+    old_id_index_definition,
+    rebuild_indexes,
+    snapshot_indexes,
+)
+from ..tools.maintenance import MAINTENANCE_MODES, maintain_table
+from ..tools.pool import release
+from ..tools.session_profile import SESSION_PROFILES
 
 _logger = logging.getLogger(__name__)
 
@@ -22,6 +36,134 @@ class MigrationTable(models.Model):
     field_comparison_ids = fields.One2many(
         "migration.field", "table_id", string="Fields Comparison"
     )
+    load_method = fields.Selection(
+        [
+            ("query", "Row by Row Query"),
+            ("copy", "COPY Bulk Load"),
+            ("upsert", "Set-based Upsert"),
+            ("staging", "Unlogged Staging, then Publish"),
+        ],
+        string="Load Method",
+        default="query",
+    )
+    copy_format = fields.Selection(
+        [("text", "Text"), ("binary", "Binary")],
+        string="COPY Format",
+        default="text",
+    )
+    stream_extraction = fields.Boolean(
+        "Stream Extraction",
+        default=False,
+        help="Read the old table through a server-side cursor instead of fetching all rows at once.",
+    )
+    extract_itersize = fields.Integer("Rows per Fetch", default=2000)
+    upsert_key = fields.Selection(
+        [("old_id", "Old ID"), ("default_code", "Default Code, then Old ID")],
+        string="Upsert Key",
+        default="old_id",
+    )
+    batch_size = fields.Integer("Batch Size", default=5000)
+    commit_mode = fields.Selection(
+        COMMIT_MODES,
+        string="Commit Policy",
+        default="record",
+    )
+    commit_every_rows = fields.Integer("Commit Every N Rows", default=1000)
+    commit_every_seconds = fields.Float("Commit Every T Seconds", default=5.0)
+    parallel_partitions = fields.Integer(
+        "Parallel Partitions",
+        default=1,
+        help="Split the old table on id and migrate the partitions on that many connections at once (fast tables only).",
+    )
+    partition_method = fields.Selection(
+        [("range", "Id Ranges"), ("hash", "Hash Buckets on Id")],
+        string="Partition Method",
+        default="range",
+    )
+    session_profile = fields.Selection(
+        SESSION_PROFILES,
+        string="Session Profile",
+        default="default",
+        help="Bulk Load runs the raw SQL loads with synchronous_commit off, a bigger work_mem "
+        "and session_replication_role replica (FK triggers skipped, checked before the final commit, "
+        "the run fails on a violation).",
+    )
+    bulk_work_mem = fields.Char("Bulk Load work_mem", default="256MB")
+    bulk_statement_timeout = fields.Float(
+        "Bulk Load Statement Timeout (s)",
+        default=0.0,
+        help="Cancel any single batch statement running longer than this, 0 for no limit.",
+    )
+    manage_indexes = fields.Boolean(
+        "Drop Indexes While Loading",
+        default=False,
+        help="Drop the secondary indexes of the target table before a migration and rebuild them "
+        "in parallel afterwards. Indexes on old_id and default_code, unique indexes and "
+        "constraint indexes are kept.",
+    )
+    index_maintenance_work_mem = fields.Char("Index Build Memory", default="1GB")
+    index_snapshot = fields.Text(
+        "Dropped Index Definitions",
+        readonly=True,
+        help="Indexes dropped for a running migration, rebuilt when it ends or with Restore Indexes.",
+    )
+    index_rows_per_second = fields.Float(
+        "Rows/s With Indexes", readonly=True,
+        help="Write rate of the last migration that kept the indexes, the baseline of the time saved.",
+    )
+    index_load_seconds = fields.Float("Last Load (s)", readonly=True)
+    index_rebuild_seconds = fields.Float("Last Index Rebuild (s)", readonly=True)
+    index_time_saved = fields.Float(
+        "Time Saved (s)", readonly=True,
+        help="Estimated time the last migration saved by dropping the indexes, rebuild included.",
+    )
+
+    post_load_maintenance = fields.Selection(
+        MAINTENANCE_MODES,
+        string="After Loading",
+        default="auto",
+        help="Refresh the planner statistics of the target table once it is migrated, so the "
+        "lookups of the next tables get good plans.",
+    )
+    wal_mib_direct = fields.Float(
+        "WAL MiB (Direct)", readonly=True,
+        help="WAL written by the last fast migration that loaded the target table directly.",
+    )
+    wal_mib_staging = fields.Float(
+        "WAL MiB (Staging)", readonly=True,
+        help="WAL written by the last fast migration through unlogged staging tables.",
+    )
+    offload_image_variants = fields.Boolean(
+        "Offload Image Variants",
+        default=False,
+        help="Store the original images as attachments without resizing them, then generate "
+        "the image_1024 ... image_128 variants in a pool of processes. Images copied from the "
+        "old filestore always get their variants this way.",
+    )
+    image_variant_workers = fields.Integer(
+        "Image Processes", default=0, help="Processes resizing the images, 0 for one per core."
+    )
+    incremental = fields.Boolean(
+        "Incremental",
+        default=False,
+        help="Only extract the old rows changed since the last run (write_date, then id) and upsert "
+        "them. The first run loads everything and sets the mark. Needs the id field selected.",
+    )
+    watermark_date = fields.Datetime("Changed Until", readonly=True)
+    watermark_id = fields.Integer("Changed Until Id", readonly=True)
+    incremental_skipped = fields.Integer(
+        "Unchanged Rows Skipped", readonly=True, help="Old rows the last incremental run did not extract."
+    )
+    cdc_installed = fields.Boolean(
+        "Change Capture",
+        readonly=True,
+        help="A trigger on the old table logs every insert, update and delete. Apply Changes, or "
+        "the Apply Captured Changes scheduled action, replays them until the cutover.",
+    )
+    cdc_applied_changes = fields.Integer("Changes Applied", readonly=True)
+    cdc_last_apply = fields.Datetime("Last Apply", readonly=True)
+    maintenance_statement = fields.Char("Last Maintenance", readonly=True)
+    maintenance_seconds = fields.Float("Last Maintenance (s)", readonly=True)
 
     def unlink(self):
         for table in self:
@@ -93,6 +235,292 @@ class MigrationTable(models.Model):
         action = self.env.ref("database_migration.action_load_fields").read()[0]
         return action
 
+    def _get_migratable_fields(self):
+        """Matched and stored fields of the table that action_migrate can copy."""
+        return self.field_comparison_ids.filtered(
+            lambda f: f.matched
+            and f.current_field_name
+            and not f.not_store
+            and f.current_data_type not in ("one2many", "many2many", "binary")
+        )
+
+    def action_migrate_table(self):
+        """Migrate all matched fields of the table, like selecting them in the fields list."""
+        self.ensure_one()
+        migration_fields = self._get_migratable_fields()
+        if not migration_fields:
+            return {
+                "type": "ir.actions.client",
+                "tag": "display_notification",
+                "params": {
+                    "title": "No Fields Selected",
+                    "message": f"No matched fields to migrate for {self.old_db_table}.",
+                    "type": "warning",
+                    "sticky": False,
+                },
+            }
+        return migration_fields.with_context(
+            active_ids=migration_fields.ids
+        ).action_migrate()
+
+    def _get_current_table(self):
+        return self.env[self.current_db_table.model]._table
+
+    def _get_written_rows(self, table):
+        """Rows inserted and updated in a table so far, from pg_stat_user_tables (an estimate)."""
+        self.env.cr.execute("SELECT pg_stat_clear_snapshot()")
+        self.env.cr.execute(
+            "SELECT n_tup_ins + n_tup_upd FROM pg_stat_user_tables WHERE relname = %s",
+            (table,),
+        )
+        row = self.env.cr.fetchone()
+        return row[0] if row else 0
+
+    def _begin_bulk_load(self):
+        """Prepare the target table for a migration, returns the state _finish_bulk_load needs.
+
+        With manage_indexes the droppable indexes are snapshotted into
+        index_snapshot and dropped, then committed, so the partition and
+        index workers on other cursors are not blocked by the DROP locks.
+        """
+        self.ensure_one()
+        if not self.current_db_table:
+            return None
+        table = self._get_current_table()
+        state = {
+            "table": table,
+            "managed": self.manage_indexes,
+            "rows": self._get_written_rows(table),
+            "start": time.monotonic(),
+        }
+        if self.manage_indexes:
+            if self.index_snapshot:
+                # A previous run died before rebuilding, do not lose its definitions
+                self._restore_indexes()
+            dropped = drop_indexes(self.env.cr, snapshot_indexes(self.env.cr, table))
+            self.index_snapshot = json.dumps(dropped, indent=1) if dropped else False
+            self.env.cr.commit()
+            _logger.info(f"Dropped {len(dropped)} indexes of {table} for the migration")
+            state["start"] = time.monotonic()
+        return state
+
+    def _restore_indexes(self):
+        """Rebuild the indexes of index_snapshot and a missing old_id index, in parallel."""
+        self.ensure_one()
+        table = self._get_current_table()
+        definitions = json.loads(self.index_snapshot) if self.index_snapshot else []
+        old_id_index = old_id_index_definition(self.env.cr, table)
+        if old_id_index:
+            definitions.append(old_id_index)
+        # The workers need to see the loaded rows and must not wait on our locks
+        self.env.cr.commit()
+        start = time.monotonic()
+        timings = rebuild_indexes(
+            self.env.registry.cursor,
+            definitions,
+            maintenance_work_mem=self.index_maintenance_work_mem or "1GB",
+            max_workers=self.connection_id.max_parallel_tables or 4,
+        )
+        elapsed = time.monotonic() - start
+        failed = [definition for definition in definitions if definition not in timings]
+        self.index_snapshot = json.dumps(failed, indent=1) if failed else False
+        _logger.info(
+            f"Rebuilt {len(timings)} of {len(definitions)} indexes of {table} in {elapsed:.1f}s"
+        )
+        return elapsed
+
+    def _finish_bulk_load(self, state):
+        """Rebuild what _begin_bulk_load dropped and record the timings."""
+        if not state:
+            return
+        load_seconds = time.monotonic() - state["start"]
+        rebuild_seconds = self._restore_indexes() if state["managed"] else 0.0
+        rows = max(self._get_written_rows(state["table"]) - state["rows"], 0)
+        values = {"index_load_seconds": load_seconds, "index_rebuild_seconds": rebuild_seconds}
+        if not state["managed"]:
+            if rows and load_seconds:
+                values["index_rows_per_second"] = rows / load_seconds
+        elif rows and self.index_rows_per_second:
+            values["index_time_saved"] = (
+                rows / self.index_rows_per_second - load_seconds - rebuild_seconds
+            )
+        self.write(values)
+        _logger.info(
+            f"Bulk load of {state['table']}: {rows} rows in {load_seconds:.1f}s, "
+            f"indexes rebuilt in {rebuild_seconds:.1f}s"
+            + (f", {values['index_time_saved']:.1f}s saved" if "index_time_saved" in values else "")
+        )
+
+    def _maintain_after_load(self, table_name=None):
+        """ANALYZE, or VACUUM ANALYZE, the table just migrated on a connection of its own.
+
+        Our cursor is committed first, so the statistics cover the rows it
+        loaded. Tables migrated by Migrate All Tables are maintained by their
+        own worker, in parallel, before their dependents start.
+        """
+        self.ensure_one()
+        if not self.post_load_maintenance or self.post_load_maintenance == "none":
+            return
+        table_name = table_name or self._get_current_table()
+        self.env.cr.commit()
+        statement, elapsed = maintain_table(
+            self.env.registry.cursor, table_name, self.post_load_maintenance
+        )
+        self.write({"maintenance_statement": statement, "maintenance_seconds": elapsed})
+
+    def action_reset_watermark(self):
+        """Forget the high-water mark, the next incremental run loads the whole table again."""
+        self.write({"watermark_date": False, "watermark_id": 0, "incremental_skipped": 0})
+
+    def action_install_change_capture(self):
+        """Start logging the changes of the old table, to apply after the initial load.
+
+        Install it before the full migration: the changes made while the
+        table loads are then replayed by the first apply, which is harmless
+        since every load matches on old_id.
+        """
+        for table in self:
+            conn = table.connection_id._acquire_old_connection()
+            try:
+                install_capture(conn.cursor(), table.old_db_table)
+                conn.commit()
+            finally:
+                release(conn)
+            table.write({"cdc_installed": True, "cdc_applied_changes": 0})
+            _logger.info(f"Change capture installed on {table.old_db_table}")
+
+    def action_remove_change_capture(self):
+        """Drop the trigger of the old table and its pending changes, once the cutover is done."""
+        for table in self:
+            conn = table.connection_id._acquire_old_connection()
+            try:
+                remove_capture(conn.cursor(), table.old_db_table)
+                conn.commit()
+            finally:
+                release(conn)
+            table.write({"cdc_installed": False})
+            _logger.info(f"Change capture removed from {table.old_db_table}")
+
+    def action_apply_changes(self):
+        self.ensure_one()
+        applied, error = self._apply_changes()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": "Changes Not Applied" if error else "Changes Applied",
+                "message": error or f"{applied} captured changes of {self.old_db_table} applied.",
+                "type": "danger" if error else "success",
+                "sticky": bool(error),
+            },
+        }
+
+    def _apply_changes(self, limit=50000):
+        """Replay the changes captured on the old table, returns (changes applied, error).
+
+        Inserted and updated rows go through action_migrate restricted to
+        their ids, deleted rows are unlinked (archived when something still
+        references them) through the id map. The replay is not atomic, it
+        commits as it goes, in record mode so that a failing batch aborts it
+        instead of being skipped. The log entries are only purged once
+        everything they carry is committed here: a run that fails or dies is
+        replayed whole by the next one, and replaying an entry twice gives
+        the same result.
+        """
+        self.ensure_one()
+        if not self.cdc_installed:
+            return 0, f"No change capture on {self.old_db_table}."
+        migration_fields = self._get_migratable_fields()
+        applied = 0
+        while True:
+            conn = self.connection_id._acquire_old_connection()
+            try:
+                upserted, deleted, change_ids = read_changes(conn.cursor(), self.old_db_table, limit)
+            finally:
+                release(conn)
+            if not change_ids:
+                break
+            if upserted:
+                if not migration_fields:
+                    return applied, f"No matched fields to apply the changes of {self.old_db_table}."
+                result = migration_fields.with_context(
+                    active_ids=migration_fields.ids, cdc_old_ids=upserted, migration_commit_mode="record"
+                ).action_migrate()
+                params = (result or {}).get("params", {})
+                if params.get("type") == "danger":
+                    return applied, params.get("message")
+            if deleted:
+                self._apply_deletes(deleted)
+            applied += len(upserted) + len(deleted)
+            self.write({
+                "cdc_applied_changes": self.cdc_applied_changes + len(upserted) + len(deleted),
+                "cdc_last_apply": fields.Datetime.now(),
+            })
+            self.env.cr.commit()
+            conn = self.connection_id._acquire_old_connection()
+            try:
+                purge_changes(conn.cursor(), change_ids)
+                conn.commit()
+            finally:
+                release(conn)
+            _logger.info(
+                f"Applied {len(change_ids)} captured changes of {self.old_db_table}: "
+                f"{len(upserted)} rows upserted, {len(deleted)} deleted"
+            )
+            if len(change_ids) < limit:
+                break
+        return applied, None
+
+    def _apply_deletes(self, old_ids):
+        """Remove the records of deleted old rows, archive those still referenced."""
+        model_name = self.current_db_table.model
+        model = self.env[model_name].with_context(active_test=False)
+        self.env.cr.execute(
+            "SELECT new_id FROM migration_id_map WHERE model = %s AND old_id = ANY(%s)",
+            (model_name, list(old_ids)),
+        )
+        records = model.browse([row[0] for row in self.env.cr.fetchall()]).exists()
+        for record in records:
+            try:
+                with self.env.cr.savepoint():
+                    record.unlink()
+            except Exception as e:
+                if "active" not in model._fields:
+                    _logger.warning(f"Deleted old record {model_name}({record.id}) kept: {e}")
+                    continue
+                record.active = False
+                _logger.info(f"Deleted old record {model_name}({record.id}) archived, it is still referenced")
+        self.env.cr.execute(
+            "DELETE FROM migration_id_map WHERE model = %s AND old_id = ANY(%s)",
+            (model_name, list(old_ids)),
+        )
+        self.connection_id._get_id_cache().invalidate(model_name)
+
+    @api.model
+    def _cron_apply_changes(self):
+        """Scheduled action: apply the captured changes of every table with change capture."""
+        for table in self.search([("cdc_installed", "=", True)]):
+            applied, error = table._apply_changes()
+            if error:
+                _logger.error(f"Captured changes of {table.old_db_table} not applied: {error}")
+            elif applied:
+                _logger.info(f"Scheduled apply: {applied} changes of {table.old_db_table}")
+
+    def action_restore_indexes(self):
+        """Rebuild the indexes left dropped by an interrupted migration."""
+        self.ensure_one()
+        elapsed = self._restore_indexes()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": "Indexes Restored" if not self.index_snapshot else "Indexes Partly Restored",
+                "message": f"Indexes of {self.current_db_table.model} rebuilt in {elapsed:.1f}s.",
+                "type": "success" if not self.index_snapshot else "warning",
+                "sticky": False,
+            },
+        }
+
     def _create_field_in_current_table(self, field_name, field_type, model_name):
         model_record = self.env["ir.model"].search(
             [("model", "=", model_name)], limit=1
@@ -146,24 +574,21 @@ class MigrationTable(models.Model):
     def _fetch_old_db_fields(self, table_name):
         """Fetch fields from the old database including relational fields."""
         connection = self.connection_id
-        conn = psycopg2.connect(
-            dbname=connection.old_db_name,
-            user=connection.pg_username,
-            password=connection.pg_password,
-            host=connection.pg_host,
-        )
+        conn = connection._acquire_old_connection()
 
-        # Fetch standard fields from information_schema
-        cursor = conn.cursor()
-        cursor.execute(
-            f"""
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_name = '{table_name}';
-        """
-        )
-        standard_fields = cursor.fetchall()
-        conn.close()
+        try:
+            # Fetch standard fields from information_schema
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT column_name, data_type
+                FROM information_schema.columns
+                WHERE table_name = '{table_name}';
+            """
+            )
+            standard_fields = cursor.fetchall()
+        finally:
+            release(conn)
 
         m_name = table_name.replace("_", ".")
 
@@ -210,15 +635,7 @@ class MigrationTable(models.Model):
     def _fetch_current_db_fields(self, model_name, table_name):
         """Fetch fields from the current Odoo model, including One2many and Many2many fields."""
 
-        connection = self.connection_id
-        conn = psycopg2.connect(
-            dbname=self._cr.dbname,
-            user="odoo",
-            password="odoo",
-            host="localhost",
-        )
-
-        cursor = conn.cursor()
+        cursor = self.env.cr
         cursor.execute(
             f"""
             SELECT column_name, data_type
@@ -227,7 +644,6 @@ class MigrationTable(models.Model):
         """
         )
         standard_fields = cursor.fetchall()
-        conn.close()
 
         field_dict = {
             field[0]: {
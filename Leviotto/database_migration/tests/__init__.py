@@ -0,0 +1,7 @@
+from . import test_copy_loader
+from . import test_commit_policy
+from . import test_scheduler
+from . import test_pool
+from . import test_id_cache
+from . import test_id_map
+from . import test_relational
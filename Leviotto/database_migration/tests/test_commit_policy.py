@@ -0,0 +1,92 @@
+from odoo.tests.common import TransactionCase, tagged
+
+from ..tools.commit_policy import CommitPolicy
+
+
+@tagged("post_install", "-at_install")
+class TestCommitPolicy(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.cr = self.env.cr
+        self.cr.execute("CREATE TABLE test_commit_policy (value integer)")
+        self.commits = 0
+        self.rollbacks = 0
+
+    def _commit(self):
+        self.commits += 1
+
+    def _rollback(self):
+        self.rollbacks += 1
+
+    def _policy(self, mode, **options):
+        return CommitPolicy(self.cr, self._commit, self._rollback, mode=mode, **options)
+
+    def _insert(self, value):
+        self.cr.execute("INSERT INTO test_commit_policy VALUES (%s)", (value,))
+
+    def _values(self):
+        self.cr.execute("SELECT value FROM test_commit_policy ORDER BY value")
+        return [value for (value,) in self.cr.fetchall()]
+
+    def test_record_mode(self):
+        policy = self._policy("record", every_rows=50)
+        self.assertEqual(policy.every_rows, 1)
+        for value in range(3):
+            self._insert(value)
+            policy.record()
+        self.assertEqual((self.commits, policy.commits, policy.rows), (3, 3, 3))
+        # No savepoint, the error reaches the caller
+        with self.assertRaises(ValueError):
+            with policy.batch("1"):
+                raise ValueError("boom")
+        self.assertEqual(policy.failed_batches, 0)
+
+    def test_rows_mode(self):
+        policy = self._policy("rows", every_rows=2)
+        for _value in range(5):
+            policy.record()
+        self.assertEqual(self.commits, 2)
+        self.assertEqual(policy.pending, 1)
+        policy.commit()
+        policy.commit()
+        self.assertEqual((self.commits, policy.pending), (3, 0))
+
+    def test_seconds_mode(self):
+        policy = self._policy("seconds", every_seconds=60)
+        policy.record(10)
+        self.assertEqual(self.commits, 0)
+        policy._last_commit -= 61
+        policy.record()
+        self.assertEqual((self.commits, policy.rows), (1, 11))
+
+    def test_batch_mode(self):
+        policy = self._policy("batch")
+        with policy.batch("1"):
+            self._insert(1)
+            policy.record()
+            self._insert(2)
+            policy.record()
+            # Held back until the batch ends
+            self.assertEqual(self.commits, 0)
+        self.assertEqual(self.commits, 1)
+        with policy.batch("2"):
+            self._insert(3)
+            policy.record()
+            raise ValueError("boom")
+        # Only the failed batch was rolled back, to its savepoint
+        self.assertEqual(self._values(), [1, 2])
+        self.assertEqual((policy.failed_batches, policy.rollbacks, policy.rows, policy.pending), (1, 1, 2, 0))
+        self.assertEqual(self.commits, 1)
+
+    def test_rollback_forgets_pending_rows(self):
+        policy = self._policy("rows", every_rows=10)
+        policy.record(4)
+        policy.rollback()
+        self.assertEqual((self.rollbacks, policy.rows, policy.pending), (1, 0, 0))
+
+    def test_fsyncs(self):
+        self.cr.execute("SET LOCAL synchronous_commit TO off")
+        policy = self._policy("rows", every_rows=1)
+        policy.record()
+        self.assertEqual((policy.commits, policy.fsyncs), (1, 0))
+        self.assertIn("1 commits (0 WAL fsyncs)", policy.summary())
@@ -0,0 +1,114 @@
+import datetime
+import decimal
+
+from odoo.tests.common import TransactionCase, tagged
+
+from ..tools.copy_loader import CopySink, _text_escape
+
+
+class _Map(dict):
+    def translate(self, value, default=None):
+        return self.get(value, default)
+
+
+@tagged("post_install", "-at_install")
+class TestCopySink(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.cr = self.env.cr
+        self.cr.execute(
+            """
+            CREATE TABLE test_copy_sink (
+                id serial PRIMARY KEY,
+                old_id integer,
+                default_code varchar,
+                name text,
+                amount numeric,
+                ratio double precision,
+                active boolean,
+                day date,
+                moment timestamp,
+                payload jsonb
+            )
+            """
+        )
+
+    def _rows(self, columns):
+        self.cr.execute(f"SELECT {', '.join(columns)} FROM test_copy_sink ORDER BY id")
+        return self.cr.fetchall()
+
+    def test_text_escape(self):
+        self.assertEqual(_text_escape(None), "\\N")
+        self.assertEqual(_text_escape(True), "t")
+        self.assertEqual(_text_escape("a\tb\nc\\d"), "a\\tb\\nc\\\\d")
+        self.assertEqual(_text_escape(b"\x00\xff"), "\\\\x00ff")
+
+    def test_encoders_round_trip(self):
+        columns = ["old_id", "name", "amount", "ratio", "active", "day", "moment", "payload"]
+        values = [
+            [1, "tab\tand\nnew line", decimal.Decimal("12345.678"), 0.25, True,
+             datetime.date(1999, 12, 31), datetime.datetime(2024, 2, 29, 13, 45, 1, 250), {"a": [1, 2]}],
+            [2, "", decimal.Decimal("-0.0001"), -1.5, False,
+             datetime.date(2000, 1, 1), datetime.datetime(1970, 1, 1), []],
+            [3, None, decimal.Decimal("100000000"), None, None, None, None, None],
+            [4, "é", decimal.Decimal("0"), 0.0, True,
+             datetime.date(2031, 6, 1), datetime.datetime(2000, 1, 1, 0, 0, 0, 1), {}],
+        ]
+        for copy_format in ("text", "binary"):
+            self.cr.execute("TRUNCATE test_copy_sink")
+            sink = CopySink(self.cr, "test_copy_sink", columns, format=copy_format)
+            self.assertEqual(sink.format, copy_format)
+            for row in values:
+                sink.write(dict(zip(columns, row)))
+            self.assertEqual(sink.close(), len(values))
+            self.assertEqual([list(row) for row in self._rows(columns)], values, copy_format)
+
+    def test_binary_falls_back_to_text(self):
+        self.cr.execute("ALTER TABLE test_copy_sink ADD COLUMN span interval")
+        sink = CopySink(self.cr, "test_copy_sink", ["old_id", "span"], format="binary")
+        self.assertEqual(sink.format, "text")
+        sink.write({"old_id": 1, "span": "1 day"})
+        sink.close()
+        self.assertEqual(self._rows(["old_id", "span"]), [(1, datetime.timedelta(days=1))])
+
+    def test_remap_and_buffer(self):
+        sink = CopySink(
+            self.cr, "test_copy_sink", ["old_id", "name"],
+            related_mappings={"old_id": _Map({7: 70})}, buffer_rows=2,
+        )
+        sink.write({"old_id": 7, "name": "mapped"})
+        sink.write({"old_id": 8, "name": "kept"})
+        # Shipped once the buffer is full
+        self.assertEqual(self._rows(["old_id", "name"]), [(70, "mapped"), (8, "kept")])
+        sink.write({"old_id": 9, "name": "dropped"})
+        sink.discard()
+        self.assertEqual(sink.close(), 2)
+
+    def test_skip_existing(self):
+        self.cr.execute(
+            "INSERT INTO test_copy_sink (old_id, default_code, name) VALUES (1, 'A', 'one'), (NULL, 'B', 'bee')"
+        )
+        sink = CopySink(
+            self.cr, "test_copy_sink", ["old_id", "default_code", "name"],
+            skip_existing=("old_id", "default_code"),
+        )
+        records = [
+            {"old_id": 1, "default_code": "Z", "name": "old id taken"},
+            {"old_id": 2, "default_code": "B", "name": "code taken"},
+            {"old_id": 3, "default_code": None, "name": "new"},
+            {"old_id": 3, "default_code": None, "name": "taken earlier in the flush"},
+            {"old_id": None, "default_code": None, "name": "no key"},
+        ]
+        for record in records:
+            sink.write(dict(record))
+        self.assertEqual(sink.flush(), 2)
+        self.assertEqual(sink.take_existing(), [records[0], records[1], records[3]])
+        self.assertEqual(sink.take_existing(), [])
+        self.assertEqual([old_id for old_id, _id in sink.take_pairs()], [3, None])
+        sink.close()
+        self.assertEqual(
+            self._rows(["old_id", "name"]),
+            [(1, "one"), (None, "bee"), (3, "new"), (None, "no key")],
+        )
+        self.cr.execute("SELECT to_regclass('tmp_copy_test_copy_sink')")
+        self.assertIsNone(self.cr.fetchone()[0])
@@ -0,0 +1,58 @@
+from odoo.tests.common import BaseCase, tagged
+
+from ..tools.id_cache import IdMapCache
+from ..tools.id_map import CompactIdMap, IdMap
+
+
+@tagged("post_install", "-at_install")
+class TestIdMapCache(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.loads = []
+
+    def _loader(self, model_name, key):
+        self.loads.append(model_name)
+        return [(old_id, old_id + 100) for old_id in range(1, 4)]
+
+    def test_hits_and_misses(self):
+        cache = IdMapCache(max_entries=100)
+        id_map = cache.get("res.partner", self._loader)
+        self.assertIsInstance(id_map, IdMap)
+        self.assertIs(cache.get("res.partner", self._loader), id_map)
+        self.assertEqual(id_map.translate(2), 102)
+        self.assertEqual(self.loads, ["res.partner"])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        cache = IdMapCache(max_entries=7)
+        cache.get("a", self._loader)
+        cache.get("b", self._loader)
+        # a was used last, b is the least recently used map
+        cache.get("a", self._loader)
+        cache.get("c", self._loader)
+        self.assertEqual(cache.evictions, 1)
+        cache.get("a", self._loader)
+        cache.get("b", self._loader)
+        self.assertEqual(self.loads, ["a", "b", "c", "b"])
+        self.assertLessEqual(cache.stats()["entries"], 7)
+
+    def test_keeps_a_map_larger_than_the_cache(self):
+        cache = IdMapCache(max_entries=2)
+        cache.get("a", self._loader)
+        self.assertEqual((cache.stats()["models"], cache.evictions), (1, 0))
+
+    def test_invalidate_and_clear(self):
+        cache = IdMapCache()
+        cache.get("a", self._loader)
+        cache.get("a", self._loader, key="code")
+        cache.invalidate("a")
+        self.assertEqual(cache.invalidations, 2)
+        cache.get("a", self._loader)
+        self.assertEqual(self.loads, ["a", "a", "a"])
+        cache.clear()
+        self.assertEqual(cache.stats()["models"], 0)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+    def test_compact_threshold(self):
+        cache = IdMapCache(compact_threshold=3)
+        self.assertIsInstance(cache.get("a", self._loader), CompactIdMap)
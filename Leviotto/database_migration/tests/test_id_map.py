@@ -0,0 +1,57 @@
+from odoo.tests.common import BaseCase, tagged
+
+from ..tools.id_map import CompactIdMap, IdMap, make_id_map
+
+
+@tagged("post_install", "-at_install")
+class TestCompactIdMap(BaseCase):
+    def _check(self, id_map, pairs):
+        for old_id, new_id in pairs.items():
+            self.assertEqual(id_map.translate(old_id), new_id)
+            self.assertEqual(id_map[old_id], new_id)
+            self.assertIn(old_id, id_map)
+        self.assertEqual(len(id_map), len(pairs))
+        self.assertEqual(sorted(id_map.items()), sorted(pairs.items()))
+
+    def test_dense(self):
+        pairs = {old_id: old_id * 10 for old_id in range(5, 15) if old_id != 9}
+        id_map = CompactIdMap.from_pairs(pairs.items())
+        # One array indexed by the old id
+        self.assertEqual(id_map._offset, 5)
+        self._check(id_map, pairs)
+        self.assertIsNone(id_map.translate(9))
+        self.assertEqual(id_map.translate(4, "default"), "default")
+        self.assertEqual(id_map.translate(15, 0), 0)
+
+    def test_sparse(self):
+        pairs = {1: 11, 1000: 12, 50000: 13}
+        id_map = CompactIdMap.from_pairs(pairs.items())
+        self.assertIsNone(id_map._offset)
+        self._check(id_map, pairs)
+        self.assertEqual(id_map.translate(999, -1), -1)
+        self.assertEqual(id_map.get(2, "missing"), "missing")
+        with self.assertRaises(KeyError):
+            id_map[2]
+
+    def test_last_pair_wins(self):
+        id_map = CompactIdMap.from_pairs([(3, 30), (1, 10), (3, 31)])
+        self.assertEqual(id_map.translate(3), 31)
+        self.assertEqual(len(id_map), 2)
+
+    def test_translate_many_and_counters(self):
+        id_map = CompactIdMap.from_pairs([(1, 10), (2, 20)])
+        self.assertEqual(id_map.translate_many([1, 3, 2, None, "x"]), [10, None, 20, None, None])
+        self.assertEqual((id_map.hits, id_map.misses), (2, 3))
+
+    def test_empty(self):
+        id_map = CompactIdMap.from_pairs([])
+        self.assertEqual(len(id_map), 0)
+        self.assertIsNone(id_map.translate(1))
+
+    def test_make_id_map(self):
+        pairs = [(old_id, old_id + 1) for old_id in range(1, 11)]
+        self.assertIsInstance(make_id_map(pairs, compact_threshold=10), CompactIdMap)
+        self.assertIsInstance(make_id_map(pairs, compact_threshold=11), IdMap)
+        self.assertIsInstance(make_id_map(dict(pairs), compact_threshold=0), IdMap)
+        # Codes are never compacted
+        self.assertIsInstance(make_id_map([("BE", 1), ("FR", 2)], compact_threshold=1), IdMap)
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from odoo.sql_db import connection_info_for
+from odoo.tests.common import TransactionCase, tagged
+
+from ..tools.pool import ConnectionPool, PoolExhausted, release
+
+
+@tagged("post_install", "-at_install")
+class TestConnectionPool(TransactionCase):
+    def _pool(self, **options):
+        _db, connect_kwargs = connection_info_for(self.env.cr.dbname)
+        pool = ConnectionPool(connect_kwargs, **options)
+        self.addCleanup(pool.closeall)
+        return pool
+
+    def test_reuse(self):
+        pool = self._pool(max_size=2)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual((pool.stats()["hits"], pool.stats()["misses"]), (1, 1))
+        release(conn)
+        self.assertEqual(pool.stats()["idle"], 1)
+
+    def test_session_state_is_discarded(self):
+        pool = self._pool(max_size=1)
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SET work_mem = '77MB'")
+                cursor.execute("CREATE TEMP TABLE test_pool_leak (id integer)")
+        with pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SHOW work_mem")
+            self.assertNotEqual(cursor.fetchone()[0], "77MB")
+            cursor.execute("SELECT to_regclass('test_pool_leak')")
+            self.assertIsNone(cursor.fetchone()[0])
+
+    def test_acquire_timeout(self):
+        pool = self._pool(max_size=1, acquire_timeout=0.2)
+        conn = pool.getconn()
+        start = time.monotonic()
+        with self.assertRaises(PoolExhausted):
+            pool.getconn()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        pool.putconn(conn)
+
+    def test_waiter_gets_returned_connection(self):
+        pool = self._pool(max_size=1, acquire_timeout=10)
+        conn = pool.getconn()
+        timer = threading.Timer(0.2, pool.putconn, (conn,))
+        timer.start()
+        self.assertIs(pool.getconn(), conn)
+        timer.join()
+        self.assertEqual(pool.stats()["waits"], 1)
+        pool.putconn(conn)
+
+    def test_evict_idle_and_health_check(self):
+        pool = self._pool(min_size=0, max_size=2, idle_timeout=60, health_check_interval=0)
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        pool.putconn(second)
+        first.last_used -= 120
+        self.assertEqual(pool.evict_idle(), 1)
+        self.assertTrue(first.closed)
+        second.close()
+        # A dead idle connection is replaced by a new one
+        conn = pool.getconn()
+        self.assertIsNot(conn, second)
+        self.assertEqual(pool.stats()["health_failures"], 1)
+        pool.putconn(conn)
@@ -0,0 +1,100 @@
+import logging
+import random
+
+from odoo import Command
+from odoo.tests.common import BaseCase, TransactionCase, tagged
+
+from ..tools.id_map import IdMap
+from ..tools.relational import group_links
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("post_install", "-at_install")
+class TestGroupLinks(BaseCase):
+    def test_group_links(self):
+        owner_map = IdMap({1: 101, 2: 102, 3: 103, 5: 105})
+        target_map = IdMap({10: 1010, 11: 1011, 12: 1012})
+        old_records = [
+            {"id": 1, "tag_ids": [11, 10]},
+            {"id": 2, "tag_ids": [10, 11, 10]},
+            # Links to records not migrated are dropped
+            {"id": 3, "tag_ids": [12, 99]},
+            # Not migrated owner
+            {"id": 4, "tag_ids": [10]},
+            # No links, or no list
+            {"id": 5, "tag_ids": []},
+            {"id": 6, "tag_ids": False},
+            # Every link unknown: the owner loses its links
+            {"id": 5, "tag_ids": [98]},
+        ]
+        groups, skipped = group_links(old_records, "tag_ids", owner_map, target_map)
+        self.assertEqual(groups, {(1010, 1011): [101, 102], (1012,): [103], (): [105]})
+        self.assertEqual(skipped, 3)
+
+
+@tagged("-standard", "migration_benchmark")
+class TestGroupLinksQueries(TransactionCase):
+    """Queries of the per record and of the grouped x2many writes, on 100k links.
+
+    Not in the standard run, the fixture creates about 32k partners:
+    ``--test-tags /database_migration:migration_benchmark``.
+    """
+
+    LINKS = 100000
+    PAGE_SIZE = 500
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = random.Random(0)
+        tags = cls.env["res.partner.category"].create([{"name": f"Benchmark {i}"} for i in range(500)])
+        # Few distinct link sets, as on real data (categories, taxes, tags...)
+        palette = [sorted(rng.sample(range(1, 501), rng.randint(1, 6))) for _i in range(50)]
+        cls.old_records = []
+        links = 0
+        while links < cls.LINKS:
+            category_ids = rng.choice(palette) if rng.random() < 0.9 else []
+            cls.old_records.append({"id": len(cls.old_records) + 1, "category_id": category_ids})
+            links += len(category_ids)
+        cls.partners = cls.env["res.partner"].create(
+            [{"name": f"Benchmark {old_record['id']}"} for old_record in cls.old_records]
+        )
+        cls.owner_map = IdMap(zip([old_record["id"] for old_record in cls.old_records], cls.partners.ids))
+        cls.target_map = IdMap(zip(range(1, 501), tags.ids))
+
+    def _count_queries(self, write_page):
+        self.partners.write({"category_id": [Command.clear()]})
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.env.cr.sql_log_count
+        for first in range(0, len(self.old_records), self.PAGE_SIZE):
+            write_page(self.old_records[first:first + self.PAGE_SIZE])
+        self.env.flush_all()
+        return self.env.cr.sql_log_count - start
+
+    def _write_per_record(self, page):
+        partners = self.env["res.partner"]
+        for old_record in page:
+            owner = self.owner_map.translate(old_record["id"])
+            if owner and old_record["category_id"]:
+                new_ids = [new_id for new_id in map(self.target_map.translate, old_record["category_id"]) if new_id]
+                partners.browse(owner).write({"category_id": [(6, 0, new_ids)]})
+
+    def _write_grouped(self, page):
+        partners = self.env["res.partner"]
+        groups, _skipped = group_links(page, "category_id", self.owner_map, self.target_map)
+        for new_ids, owner_ids in groups.items():
+            partners.browse(owner_ids).write({"category_id": [(6, 0, list(new_ids))]})
+
+    def test_grouped_writes(self):
+        per_record = self._count_queries(self._write_per_record)
+        linked = self.partners.filtered("category_id")
+        grouped = self._count_queries(self._write_grouped)
+        # Both wrote the same links
+        self.assertEqual(self.partners.filtered("category_id"), linked)
+        _logger.info(
+            f"{len(self.old_records)} records, {self.LINKS} links: {per_record} queries per record, "
+            f"{grouped} grouped"
+        )
+        self.assertLess(grouped, per_record)
@@ -0,0 +1,52 @@
+import threading
+
+from odoo.tests.common import BaseCase, tagged
+
+from ..tools.scheduler import DagScheduler, break_cycles, count_dependents, topological_stages
+
+
+@tagged("post_install", "-at_install")
+class TestScheduler(BaseCase):
+    def test_topological_stages(self):
+        graph = {
+            "res_partner": set(),
+            "product_product": set(),
+            "sale_order": {"res_partner"},
+            "sale_order_line": {"sale_order", "product_product"},
+        }
+        self.assertEqual(
+            topological_stages(graph),
+            [["product_product", "res_partner"], ["sale_order"], ["sale_order_line"]],
+        )
+        self.assertEqual(topological_stages({}), [])
+
+    def test_break_cycles(self):
+        graph = {"a": {"b"}, "b": {"c"}, "c": {"a"}, "d": {"a", "unknown"}}
+        acyclic = break_cycles(graph, priority=lambda node: node)
+        # The dependencies of the best node of the cycle go, unknown nodes too
+        self.assertEqual(acyclic, {"a": set(), "b": {"c"}, "c": {"a"}, "d": {"a"}})
+        self.assertEqual(topological_stages(acyclic), [["a"], ["c", "d"], ["b"]])
+        # The graph given is left alone
+        self.assertEqual(graph["a"], {"b"})
+
+    def test_count_dependents(self):
+        graph = {"a": set(), "b": {"a"}, "c": {"b"}, "d": {"a"}}
+        self.assertEqual(count_dependents(graph), {"a": 3, "b": 1, "c": 0, "d": 0})
+
+    def test_failure_skips_dependents(self):
+        graph = {"a": set(), "b": {"a"}, "c": {"b"}, "d": set()}
+        ran = []
+        lock = threading.Lock()
+
+        def run_node(node):
+            with lock:
+                ran.append(node)
+            if node == "a":
+                raise ValueError("boom")
+            return True, "ok"
+
+        results = DagScheduler(graph, run_node, max_workers=2).run()
+        self.assertEqual(sorted(ran), ["a", "d"])
+        self.assertEqual({node: result[0] for node, result in results.items()},
+                         {"a": "failed", "b": "skipped", "c": "skipped", "d": "done"})
+        self.assertEqual(results["a"][1], "boom")
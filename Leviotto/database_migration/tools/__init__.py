@@ -0,0 +1,20 @@
+from . import copy_loader
+from . import extract
+from . import upsert
+from . import commit_policy
+from . import scheduler
+from . import pool
+from . import id_map
+from . import id_cache
+from . import index_manager
+from . import session_profile
+from . import maintenance
+from . import staging
+from . import rpc
+from . import m2m
+from . import relational
+from . import properties
+from . import filestore
+from . import images
+from . import watermark
+from . import cdc
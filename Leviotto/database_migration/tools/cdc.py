@@ -0,0 +1,106 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+CHANGE_LOG = "migration_change_log"
+TRIGGER = "migration_capture_change"
+
+
+def install_capture(cursor, table_name):
+    """Log every insert, update and delete of an old table into migration_change_log.
+
+    Creates the change log and the trigger function on first use, then an
+    AFTER ROW trigger on the table: an entry is one (table, row id, I/U/D)
+    per changed row, a delete leaves a D entry as tombstone. Every entry
+    keeps the id of the transaction that wrote it, see read_changes().
+    """
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CHANGE_LOG} (
+            id bigserial PRIMARY KEY,
+            table_name varchar NOT NULL,
+            row_id integer NOT NULL,
+            op char(1) NOT NULL,
+            changed_at timestamp NOT NULL DEFAULT (now() at time zone 'UTC'),
+            txid bigint NOT NULL DEFAULT txid_current()
+        )
+        """
+    )
+    # Logs created before the transaction ids were recorded
+    cursor.execute(f"ALTER TABLE {CHANGE_LOG} ADD COLUMN IF NOT EXISTS txid bigint NOT NULL DEFAULT txid_current()")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {CHANGE_LOG}_table_id_index ON {CHANGE_LOG} (table_name, id)")
+    cursor.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION {TRIGGER}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO {CHANGE_LOG} (table_name, row_id, op) VALUES (TG_TABLE_NAME, OLD.id, 'D');
+            ELSE
+                INSERT INTO {CHANGE_LOG} (table_name, row_id, op) VALUES (TG_TABLE_NAME, NEW.id, left(TG_OP, 1));
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    cursor.execute(f'DROP TRIGGER IF EXISTS {TRIGGER} ON "{table_name}"')
+    # EXECUTE PROCEDURE, still accepted by the versions that introduced EXECUTE FUNCTION
+    cursor.execute(
+        f"""
+        CREATE TRIGGER {TRIGGER} AFTER INSERT OR UPDATE OR DELETE ON "{table_name}"
+        FOR EACH ROW EXECUTE PROCEDURE {TRIGGER}()
+        """
+    )
+
+
+def remove_capture(cursor, table_name):
+    """Drop the trigger of an old table and its pending changes, the log table stays."""
+    cursor.execute(f'DROP TRIGGER IF EXISTS {TRIGGER} ON "{table_name}"')
+    cursor.execute("SELECT to_regclass(%s)", (CHANGE_LOG,))
+    if cursor.fetchone()[0]:
+        cursor.execute(f"DELETE FROM {CHANGE_LOG} WHERE table_name = %s", (table_name,))
+
+
+def read_changes(cursor, table_name, limit=50000):
+    """Net changes of a table: (upserted ids, deleted ids, ids of the log entries read).
+
+    The log is a queue, applied entries are purged by id. Log ids come from
+    a sequence and are taken before commit, so a lower id can still show up
+    after a higher one: only the entries of transactions older than every
+    running one (txid below the snapshot xmin) are read, an entry still in
+    flight waits for the next call. The last operation of a row wins, so a
+    row inserted then updated is one upsert and a row updated then deleted
+    one tombstone. At most ``limit`` entries are read.
+    """
+    cursor.execute(
+        f"""
+        SELECT id, row_id, op FROM {CHANGE_LOG}
+        WHERE table_name = %s AND txid < txid_snapshot_xmin(txid_current_snapshot())
+        ORDER BY id
+        LIMIT %s
+        """,
+        (table_name, limit),
+    )
+    last_ops = {}
+    change_ids = []
+    for change_id, row_id, op in cursor.fetchall():
+        last_ops[row_id] = op
+        change_ids.append(change_id)
+    upserted = sorted(row_id for row_id, op in last_ops.items() if op != "D")
+    deleted = sorted(row_id for row_id, op in last_ops.items() if op == "D")
+    return upserted, deleted, change_ids
+
+
+def purge_changes(cursor, change_ids):
+    """Forget the applied log entries, only those that were read."""
+    cursor.execute(f"DELETE FROM {CHANGE_LOG} WHERE id = ANY(%s)", (list(change_ids),))
+    return cursor.rowcount
+
+
+def changed_rows_query(query, params, old_ids):
+    """Restrict an extraction query selecting ``old_id`` to the captured rows, returns (query, params)."""
+    base_query = query.strip().rstrip(";")
+    return (
+        f"SELECT changed.* FROM ({base_query}) AS changed WHERE changed.old_id = ANY(%s)",
+        tuple(params or ()) + (list(old_ids),),
+    )
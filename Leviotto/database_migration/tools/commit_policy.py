@@ -0,0 +1,128 @@
+import contextlib
+import logging
+import time
+import uuid
+
+_logger = logging.getLogger(__name__)
+
+COMMIT_MODES = [
+    ("record", "Every Record"),
+    ("rows", "Every N Rows"),
+    ("seconds", "Every T Seconds"),
+    ("batch", "Once per Batch"),
+]
+
+
+class CommitPolicy:
+    """Decide when a migration commits, and count what it cost.
+
+    ``cursor`` is either an Odoo cursor or a raw psycopg2 cursor, ``commit``
+    and ``rollback`` the matching callables. Every commit with pending writes
+    forces a WAL flush unless the session runs with synchronous_commit off,
+    so those are reported as fsyncs. Inside a batch commits are held back
+    until the batch ends, the row and time thresholds are then checked at
+    batch boundaries.
+    """
+
+    def __init__(self, cursor, commit, rollback, mode="record", every_rows=1000, every_seconds=5.0):
+        self.cursor = cursor
+        self._commit = commit
+        self._rollback = rollback
+        self.mode = mode or "record"
+        self.every_rows = 1 if self.mode == "record" else max(every_rows or 1, 1)
+        self.every_seconds = every_seconds or 5.0
+        self.pending = 0
+        self.commits = 0
+        self.fsyncs = 0
+        self.rollbacks = 0
+        self.failed_batches = 0
+        self.rows = 0
+        self._in_batch = False
+        self._synchronous = None
+        self._last_commit = time.monotonic()
+
+    def _synchronous_commit(self):
+        if self._synchronous is None:
+            self.cursor.execute("SHOW synchronous_commit")
+            self._synchronous = self.cursor.fetchone()[0] != "off"
+        return self._synchronous
+
+    def _due(self):
+        if self.mode == "seconds":
+            return time.monotonic() - self._last_commit >= self.every_seconds
+        if self.mode == "batch":
+            return not self._in_batch
+        return self.pending >= self.every_rows
+
+    def record(self, count=1):
+        """Account for written rows and commit when the policy says so."""
+        self.pending += count
+        self.rows += count
+        if not self._in_batch and self._due():
+            self.commit()
+
+    def commit(self):
+        """Commit now if anything was written since the last commit."""
+        if not self.pending:
+            return
+        synchronous = self._synchronous_commit()
+        self._commit()
+        self.commits += 1
+        if synchronous:
+            self.fsyncs += 1
+        self.pending = 0
+        self._last_commit = time.monotonic()
+
+    def rollback(self):
+        """Roll back everything written since the last commit."""
+        self._rollback()
+        self.rollbacks += 1
+        self.rows -= self.pending
+        self.pending = 0
+
+    @contextlib.contextmanager
+    def _raw_savepoint(self):
+        name = f"migration_batch_{uuid.uuid4().hex[:8]}"
+        self.cursor.execute(f"SAVEPOINT {name}")
+        try:
+            yield
+        except Exception:
+            self.cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            raise
+        else:
+            self.cursor.execute(f"RELEASE SAVEPOINT {name}")
+
+    @contextlib.contextmanager
+    def batch(self, label=""):
+        """Run one batch inside a savepoint.
+
+        When the batch fails only its own writes are rolled back, the error is
+        logged and the migration goes on with the next batch. In ``record``
+        mode every row is committed on its own and errors propagate as before.
+        """
+        if self.mode == "record":
+            yield
+            return
+        pending_before = self.pending
+        rows_before = self.rows
+        savepoint = self.cursor.savepoint() if hasattr(self.cursor, "savepoint") else self._raw_savepoint()
+        self._in_batch = True
+        try:
+            with savepoint:
+                yield
+        except Exception as e:
+            self.failed_batches += 1
+            self.rollbacks += 1
+            self.pending = pending_before
+            self.rows = rows_before
+            _logger.error(f"Batch {label} failed and was rolled back: {e}")
+        finally:
+            self._in_batch = False
+        if self._due():
+            self.commit()
+
+    def summary(self):
+        return (
+            f"{self.rows} rows written with {self.commits} commits ({self.fsyncs} WAL fsyncs), "
+            f"{self.rollbacks} rollbacks, {self.failed_batches} failed batches"
+        )
@@ -0,0 +1,318 @@
+import datetime
+import decimal
+import io
+import json
+import logging
+import struct
+import time
+
+_logger = logging.getLogger(__name__)
+
+PG_EPOCH_DATE = datetime.date(2000, 1, 1)
+PG_EPOCH = datetime.datetime(2000, 1, 1)
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+BINARY_TRAILER = struct.pack("!h", -1)
+
+
+def _text_escape(value):
+    """Render one value in the COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+    elif isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _encode_numeric(value):
+    """Encode a Decimal in the PostgreSQL numeric binary layout (base 10000 digits)."""
+    value = decimal.Decimal(value)
+    if value.is_nan():
+        return struct.pack("!hhHH", 0, 0, 0xC000, 0)
+    sign, digits, exponent = value.as_tuple()
+    dscale = max(0, -exponent)
+    digits = "".join(map(str, digits)) or "0"
+    if exponent > 0:
+        digits += "0" * exponent
+        exponent = 0
+    elif -exponent > len(digits):
+        digits = digits.zfill(-exponent)
+    integer_part = digits[: len(digits) + exponent] or "0"
+    fraction_part = digits[len(digits) + exponent:]
+    integer_part = integer_part.zfill((len(integer_part) + 3) // 4 * 4)
+    fraction_part = fraction_part.ljust((len(fraction_part) + 3) // 4 * 4, "0")
+    groups = [int(integer_part[i : i + 4]) for i in range(0, len(integer_part), 4)]
+    weight = len(groups) - 1
+    groups += [int(fraction_part[i : i + 4]) for i in range(0, len(fraction_part), 4)]
+    # Strip leading and trailing zero groups, the weight follows the leading ones
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+    return struct.pack(
+        f"!hhHH{len(groups)}H",
+        len(groups),
+        weight,
+        0x4000 if sign else 0,
+        dscale,
+        *groups,
+    )
+
+
+def _encode_date(value):
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return struct.pack("!i", (value - PG_EPOCH_DATE).days)
+
+
+def _encode_timestamp(value):
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value.tzinfo:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    delta = value - PG_EPOCH
+    return struct.pack("!q", (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+
+
+def _encode_text(value):
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).encode("utf-8")
+
+
+BINARY_ENCODERS = {
+    "smallint": lambda v: struct.pack("!h", int(v)),
+    "integer": lambda v: struct.pack("!i", int(v)),
+    "bigint": lambda v: struct.pack("!q", int(v)),
+    "boolean": lambda v: b"\x01" if v else b"\x00",
+    "real": lambda v: struct.pack("!f", float(v)),
+    "double precision": lambda v: struct.pack("!d", float(v)),
+    "numeric": _encode_numeric,
+    "text": _encode_text,
+    "character varying": _encode_text,
+    "character": _encode_text,
+    "json": _encode_text,
+    "jsonb": lambda v: b"\x01" + _encode_text(v),
+    "bytea": lambda v: bytes(v),
+    "date": _encode_date,
+    "timestamp without time zone": _encode_timestamp,
+    "timestamp with time zone": _encode_timestamp,
+}
+
+
+def fetch_column_types(cursor, table_name, column_names):
+    """Return {column: pg type name} for the given columns of a table."""
+    cursor.execute(
+        """
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = %s AND column_name IN %s;
+    """,
+        (table_name, tuple(column_names)),
+    )
+    return dict(cursor.fetchall())
+
+
+class CopySink:
+    """Stream rows into a table through ``COPY ... FROM STDIN``.
+
+    Rows are buffered in memory and shipped every ``buffer_rows`` rows, so the
+    buffer stays small whatever the size of the source table. ``format`` is
+    either ``text`` or ``binary``; the binary format needs an encoder for
+    every column type and falls back to text otherwise.
+
+    With ``skip_existing`` key columns, the rows are copied into a temporary
+    table first and only those whose keys are neither in the table nor
+    earlier in the same flush are inserted, with one anti-join. The others
+    are kept, as written, in ``existing`` for the caller to update, and the
+    (old_id, id) pairs of the inserted rows in ``pairs``.
+    """
+
+    def __init__(self, cursor, table_name, column_names, format="text", related_mappings=None, buffer_rows=10000,
+                 skip_existing=()):
+        self.cursor = cursor
+        self.table_name = table_name
+        self.column_names = list(column_names)
+        self.related_mappings = related_mappings or {}
+        self.buffer_rows = buffer_rows
+        self.format = format
+        self.skip_existing = [key for key in skip_existing if key in self.column_names]
+        self.temp_table = f"tmp_copy_{table_name}"
+        self.rows = 0
+        self.elapsed = 0.0
+        self.existing = []
+        self.pairs = []
+        self._pending = []
+        self._sources = []
+        self._dropped = False
+
+        if format == "binary":
+            column_types = fetch_column_types(cursor, table_name, self.column_names)
+            missing = [
+                name for name in self.column_names
+                if column_types.get(name) not in BINARY_ENCODERS
+            ]
+            if missing:
+                _logger.warning(
+                    f"COPY binary format is not supported for columns {missing} of {table_name}, using text format."
+                )
+                self.format = "text"
+            else:
+                self._encoders = [BINARY_ENCODERS[column_types[name]] for name in self.column_names]
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def _remap(self, record_data):
+        """Replace many2one old ids by current ids using the IdMaps of related_mappings."""
+        for field_name, mapping in self.related_mappings.items():
+            value = record_data.get(field_name)
+            if value is not None:
+                record_data[field_name] = mapping.translate(value, value)
+        return record_data
+
+    def write(self, record_data):
+        """Queue one record (dict of column -> value) for loading."""
+        if self.skip_existing:
+            self._sources.append(dict(record_data))
+        record_data = self._remap(record_data)
+        self._pending.append([record_data.get(name) for name in self.column_names])
+        if len(self._pending) >= self.buffer_rows:
+            self.flush()
+
+    def _build_text_buffer(self):
+        buffer = io.StringIO()
+        for values in self._pending:
+            buffer.write("\t".join(_text_escape(v) for v in values))
+            buffer.write("\n")
+        buffer.seek(0)
+        return buffer
+
+    def _build_binary_buffer(self):
+        buffer = io.BytesIO()
+        buffer.write(BINARY_HEADER)
+        field_count = struct.pack("!h", len(self.column_names))
+        for values in self._pending:
+            buffer.write(field_count)
+            for encoder, value in zip(self._encoders, values):
+                if value is None:
+                    buffer.write(struct.pack("!i", -1))
+                    continue
+                data = encoder(value)
+                buffer.write(struct.pack("!i", len(data)))
+                buffer.write(data)
+        buffer.write(BINARY_TRAILER)
+        buffer.seek(0)
+        return buffer
+
+    def _prepare_temp_table(self):
+        columns = ", ".join(self.column_names)
+        if not self._dropped:
+            # A pooled connection may still hold the temp table of an earlier run
+            self.cursor.execute(f"DROP TABLE IF EXISTS {self.temp_table}")
+            self._dropped = True
+        # Created again when a failed batch rolled it back
+        self.cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {self.temp_table} AS SELECT {columns} FROM {self.table_name} WITH NO DATA"
+        )
+        self.cursor.execute(
+            f"""
+            ALTER TABLE {self.temp_table}
+                ADD COLUMN IF NOT EXISTS _seq bigserial,
+                ADD COLUMN IF NOT EXISTS _existing boolean DEFAULT false
+        """
+        )
+        # _seq numbers the rows of the flush from 1, in the order of _sources
+        self.cursor.execute(f"TRUNCATE {self.temp_table} RESTART IDENTITY")
+
+    def _insert_new(self):
+        """Insert the rows of the temp table whose keys are not taken, returns their count."""
+        taken = " OR ".join(
+            f"EXISTS (SELECT 1 FROM {self.table_name} t WHERE t.{key} = s.{key}) "
+            f"OR EXISTS (SELECT 1 FROM {self.temp_table} d WHERE d.{key} = s.{key} AND d._seq < s._seq)"
+            for key in self.skip_existing
+        )
+        self.cursor.execute(f"UPDATE {self.temp_table} s SET _existing = true WHERE {taken}")
+        columns = ", ".join(self.column_names)
+        returning = "RETURNING old_id, id" if "old_id" in self.column_names else ""
+        self.cursor.execute(
+            f"""
+            INSERT INTO {self.table_name} ({columns})
+            SELECT {columns} FROM {self.temp_table} WHERE NOT _existing ORDER BY _seq
+            {returning}
+        """
+        )
+        inserted = self.cursor.rowcount
+        if returning:
+            self.pairs.extend(self.cursor.fetchall())
+        self.cursor.execute(f"SELECT _seq FROM {self.temp_table} WHERE _existing ORDER BY _seq")
+        self.existing.extend(self._sources[seq - 1] for (seq,) in self.cursor.fetchall())
+        return inserted
+
+    def flush(self):
+        """Send the pending rows to PostgreSQL with a single COPY statement, returns the rows loaded."""
+        if not self._pending:
+            return 0
+        start = time.monotonic()
+        if self.format == "binary":
+            buffer = self._build_binary_buffer()
+        else:
+            buffer = self._build_text_buffer()
+        columns = ", ".join(self.column_names)
+        target = self.table_name
+        if self.skip_existing:
+            self._prepare_temp_table()
+            target = self.temp_table
+        self.cursor.copy_expert(
+            f"COPY {target} ({columns}) FROM STDIN WITH (FORMAT {self.format})",
+            buffer,
+        )
+        count = self._insert_new() if self.skip_existing else len(self._pending)
+        self._pending = []
+        self._sources = []
+        self.rows += count
+        self.elapsed += time.monotonic() - start
+        return count
+
+    def take_existing(self):
+        """The records skipped since the last call, their keys were already taken."""
+        existing, self.existing = self.existing, []
+        return existing
+
+    def take_pairs(self):
+        """(old_id, id) pairs of the rows inserted since the last call."""
+        pairs, self.pairs = self.pairs, []
+        return pairs
+
+    def discard(self):
+        """Drop the rows queued since the last flush, and what was not taken yet."""
+        self._pending = []
+        self._sources = []
+        self.existing = []
+        self.pairs = []
+
+    def close(self):
+        """Flush what is left, drop the temp table and log the throughput."""
+        self.flush()
+        if self._dropped:
+            self.cursor.execute(f"DROP TABLE IF EXISTS {self.temp_table}")
+        _logger.info(
+            f"COPY into {self.table_name} ({self.format}): {self.rows} rows in {self.elapsed:.2f}s ({self.rows_per_second:.0f} rows/sec)"
+        )
+        return self.rows
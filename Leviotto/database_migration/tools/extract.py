@@ -0,0 +1,46 @@
+import itertools
+import logging
+import uuid
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_ITERSIZE = 2000
+
+
+def iter_server_side(conn, query, params=None, itersize=DEFAULT_ITERSIZE, name="migration_extract"):
+    """Yield the rows of a query through a named (server-side) psycopg2 cursor.
+
+    Only ``itersize`` rows are held on the client at a time, so memory stays
+    bounded whatever the size of the table. Named cursors live inside the
+    current transaction, the connection must not be committed while iterating.
+    """
+    cursor = conn.cursor(name=f"{name}_{uuid.uuid4().hex[:8]}")
+    cursor.itersize = itersize
+    try:
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+
+def fetch_rows(conn, query, params=None, stream=False, itersize=DEFAULT_ITERSIZE):
+    """Run a query, streamed through a server-side cursor or fetched all at once."""
+    if stream:
+        return iter_server_side(conn, query, params, itersize=itersize)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def iter_batches(rows, batch_size):
+    """Group any iterable of rows into lists of at most batch_size rows."""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
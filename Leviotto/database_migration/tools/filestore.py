@@ -0,0 +1,191 @@
+import logging
+import os
+import shutil
+import time
+
+from psycopg2.extras import execute_values
+
+from .extract import iter_batches
+
+_logger = logging.getLogger(__name__)
+
+# ir_attachment columns copied from the old database, res_id is remapped
+ATTACHMENT_COLUMNS = [
+    "name",
+    "res_model",
+    "res_field",
+    "res_id",
+    "store_fname",
+    "db_datas",
+    "checksum",
+    "mimetype",
+    "file_size",
+    "type",
+    "public",
+]
+
+
+def old_attachment_query(cursor, table_name, model_name, field_name):
+    """SELECT of the attachments of a binary field in the old database.
+
+    None when the old table keeps the field in a column of its own
+    (attachment=False), its values are not in ir_attachment then. Columns
+    an older ir_attachment lacks are selected as NULL.
+    """
+    cursor.execute(
+        """
+        SELECT table_name, column_name FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND ((table_name = %s AND column_name = %s) OR table_name = 'ir_attachment')
+        """,
+        (table_name, field_name),
+    )
+    columns = set()
+    for table, column in cursor.fetchall():
+        if table == table_name:
+            return None
+        columns.add(column)
+    select = ", ".join(column if column in columns else f"NULL AS {column}" for column in ATTACHMENT_COLUMNS)
+    return (
+        f"SELECT {select} FROM ir_attachment WHERE res_model = %s AND res_field = %s ORDER BY id",
+        (model_name, field_name),
+    )
+
+
+def copy_file(source_root, target_root, store_fname, hardlink=True):
+    """Put a filestore file of the old database into the current filestore.
+
+    Files are named after their checksum, so a file already there is the
+    same content and is kept. Hardlinks fall back to a copy across file
+    systems. Returns "present", "linked", "copied" or "missing".
+    """
+    target = os.path.join(target_root, store_fname)
+    if os.path.exists(target):
+        return "present"
+    source = os.path.join(source_root, store_fname)
+    if not os.path.isfile(source):
+        return "missing"
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if hardlink:
+        try:
+            os.link(source, target)
+            return "linked"
+        except FileExistsError:
+            return "present"
+        except OSError:
+            pass
+    shutil.copyfile(source, target)
+    return "copied"
+
+
+class AttachmentCopier:
+    """Copy the attachments of a binary field between databases, files included.
+
+    Rows are read from the old ir_attachment (see old_attachment_query),
+    their res_id remapped through the owner's id map, their filestore file
+    linked or copied, and inserted with one multi-row INSERT per batch. The
+    attachments the field already has on a migrated owner are replaced, as
+    writing the field would; their files are left for the filestore garbage
+    collection. Rows whose owner is not migrated or whose file is missing
+    are skipped.
+    """
+
+    def __init__(self, cursor, source_root, target_root, owner_map, model_name, field_name,
+                 uid=1, hardlink=True, batch_size=500):
+        self.cursor = cursor
+        self.source_root = source_root
+        self.target_root = target_root
+        self.owner_map = owner_map
+        self.model_name = model_name
+        self.field_name = field_name
+        self.uid = int(uid)
+        self.hardlink = hardlink
+        self.batch_size = max(batch_size or 1, 1)
+        self.files = {"present": 0, "linked": 0, "copied": 0, "missing": 0}
+        self.rows = 0
+        self.inserted = 0
+        self.replaced = 0
+        self.unmapped = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self._seen = {}
+        self._owners = set()
+
+    def _copy_file(self, store_fname):
+        # One filesystem call per distinct file of the run
+        status = self._seen.get(store_fname)
+        if status is None:
+            status = self._seen[store_fname] = copy_file(
+                self.source_root, self.target_root, store_fname, hardlink=self.hardlink
+            )
+            self.files[status] += 1
+        return status
+
+    @property
+    def owner_ids(self):
+        """Current ids of the records that got attachments."""
+        return sorted(self._owners)
+
+    def copy_batch(self, rows):
+        """Copy a list of old ir_attachment rows (ATTACHMENT_COLUMNS order), returns the rows inserted."""
+        start = time.monotonic()
+        res_id_index = ATTACHMENT_COLUMNS.index("res_id")
+        fname_index = ATTACHMENT_COLUMNS.index("store_fname")
+        size_index = ATTACHMENT_COLUMNS.index("file_size")
+        values = []
+        for row in rows:
+            row = list(row)
+            res_id = self.owner_map.translate(row[res_id_index])
+            if not res_id:
+                self.unmapped += 1
+                continue
+            if row[fname_index] and self._copy_file(row[fname_index]) == "missing":
+                continue
+            row[res_id_index] = res_id
+            row[ATTACHMENT_COLUMNS.index("res_model")] = self.model_name
+            row[ATTACHMENT_COLUMNS.index("res_field")] = self.field_name
+            self.bytes += row[size_index] or 0
+            values.append(tuple(row) + (self.uid, self.uid))
+        # Replace once per owner, its rows may span batches
+        new_owners = {row[res_id_index] for row in values} - self._owners
+        if new_owners:
+            self.cursor.execute(
+                "DELETE FROM ir_attachment WHERE res_model = %s AND res_field = %s AND res_id = ANY(%s)",
+                (self.model_name, self.field_name, list(new_owners)),
+            )
+            self.replaced += self.cursor.rowcount
+            self._owners |= new_owners
+        if values:
+            columns = ", ".join(ATTACHMENT_COLUMNS)
+            execute_values(
+                self.cursor,
+                f"""
+                INSERT INTO ir_attachment ({columns}, create_uid, write_uid, create_date, write_date)
+                VALUES %s
+                """,
+                values,
+                template="(" + ", ".join(["%s"] * (len(ATTACHMENT_COLUMNS) + 2))
+                + ", now() at time zone 'UTC', now() at time zone 'UTC')",
+                page_size=len(values),
+            )
+            self.inserted += self.cursor.rowcount
+        self.rows += len(rows)
+        self.elapsed += time.monotonic() - start
+        return len(values)
+
+    def copy(self, rows, on_batch=None):
+        """Copy an iterable of old rows batch by batch, ``on_batch(rows)`` after each one."""
+        for batch in iter_batches(rows, self.batch_size):
+            inserted = self.copy_batch(batch)
+            if on_batch:
+                on_batch(inserted)
+        return self.inserted
+
+    def summary(self):
+        rate = self.bytes / 1048576 / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.inserted} attachments of {self.model_name}.{self.field_name} copied in {self.elapsed:.1f}s "
+            f"({self.bytes / 1048576:.1f} MiB, {rate:.1f} MiB/s): files {self.files['linked']} linked, "
+            f"{self.files['copied']} copied, {self.files['present']} already present, "
+            f"{self.files['missing']} missing; {self.replaced} replaced, {self.unmapped} owners not migrated"
+        )
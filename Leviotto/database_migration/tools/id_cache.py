@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from .id_map import DEFAULT_COMPACT_THRESHOLD, make_id_map
+
+_logger = logging.getLogger(__name__)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+DEFAULT_MAX_ENTRIES = 5000000
+
+
+class IdMapCache:
+    """Lazily loaded id maps, keyed by model, shared by the migrate actions.
+
+    A map is loaded on first use with the ``loader`` the caller passes, on
+    the caller's own cursor, and kept until the model is invalidated (after
+    records were migrated into it) or evicted, least recently used first,
+    once the cache holds more than ``max_entries`` ids. Maps of at least
+    ``compact_threshold`` integer ids are stored as CompactIdMap.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, compact_threshold=DEFAULT_COMPACT_THRESHOLD, name=""):
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self.compact_threshold = compact_threshold
+        self.name = name
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.load_seconds = 0.0
+        self.started = time.monotonic()
+        self._retired_hits = 0
+        self._retired_misses = 0
+
+    def get(self, model_name, loader, key="old_id"):
+        """Return the id map of a model, loading it with ``loader(model_name, key)`` on a miss.
+
+        The loader returns (key, id) pairs or a dict.
+        """
+        cache_key = (model_name, key)
+        with self._lock:
+            id_map = self._maps.get(cache_key)
+            if id_map is not None:
+                self._maps.move_to_end(cache_key)
+                self.hits += 1
+                return id_map
+            loading = self._loading.setdefault(cache_key, threading.Lock())
+
+        # One thread loads a model, the others wait for its result
+        with loading:
+            with self._lock:
+                id_map = self._maps.get(cache_key)
+                if id_map is not None:
+                    self._maps.move_to_end(cache_key)
+                    self.hits += 1
+                    return id_map
+            start = time.monotonic()
+            id_map = make_id_map(loader(model_name, key), self.compact_threshold)
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.misses += 1
+                self.load_seconds += elapsed
+                self._maps[cache_key] = id_map
+                self._evict()
+                self._loading.pop(cache_key, None)
+        _logger.info(
+            f"Id cache {self.name}: loaded {len(id_map)} ids of {model_name} in {elapsed:.2f}s"
+        )
+        return id_map
+
+    def _evict(self):
+        entries = sum(len(id_map) for id_map in self._maps.values())
+        while entries > self.max_entries and len(self._maps) > 1:
+            cache_key, id_map = self._maps.popitem(last=False)
+            self._retire(id_map)
+            entries -= len(id_map)
+            self.evictions += 1
+            _logger.info(f"Id cache {self.name}: evicted {cache_key[0]} ({len(id_map)} ids)")
+
+    def _retire(self, id_map):
+        self._retired_hits += id_map.hits
+        self._retired_misses += id_map.misses
+
+    def invalidate(self, model_name):
+        """Forget the maps of a model, its next use reloads them."""
+        with self._lock:
+            for cache_key in [k for k in self._maps if k[0] == model_name]:
+                self._retire(self._maps.pop(cache_key))
+                self.invalidations += 1
+
+    def clear(self):
+        """Start a new run: drop every map and reset the counters."""
+        with self._lock:
+            self._maps.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+            self.load_seconds = 0.0
+            self._retired_hits = self._retired_misses = 0
+            self.started = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            maps = list(self._maps.items())
+            loads = self.hits + self.misses
+            lookup_hits = self._retired_hits + sum(m.hits for _k, m in maps)
+            lookup_misses = self._retired_misses + sum(m.misses for _k, m in maps)
+            lookups = lookup_hits + lookup_misses
+            return {
+                "models": len(maps),
+                "entries": sum(len(m) for _k, m in maps),
+                "bytes": sum(m.nbytes for _k, m in maps),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / loads if loads else 0.0,
+                "lookups": lookups,
+                "lookup_hit_rate": lookup_hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "load_seconds": self.load_seconds,
+            }
+
+    def summary(self):
+        stats = self.stats()
+        return (
+            f"{stats['models']} models / {stats['entries']} ids cached "
+            f"(~{stats['bytes'] / 1048576:.1f} MiB), map hit rate {stats['hit_rate']:.0%} "
+            f"({stats['misses']} loads in {stats['load_seconds']:.1f}s), "
+            f"{stats['lookups']} lookups, {stats['lookup_hit_rate']:.0%} translated, "
+            f"{stats['evictions']} evicted, {stats['invalidations']} invalidated"
+        )
+
+
+def get_id_cache(key, max_entries=DEFAULT_MAX_ENTRIES, compact_threshold=DEFAULT_COMPACT_THRESHOLD, name=""):
+    """Return the id cache registered under key, creating it on first use."""
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = IdMapCache(
+                max_entries=max_entries, compact_threshold=compact_threshold, name=name
+            )
+        else:
+            cache.max_entries = max_entries or cache.max_entries
+            cache.compact_threshold = compact_threshold
+        return cache
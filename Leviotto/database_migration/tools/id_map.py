@@ -0,0 +1,213 @@
+"""old_id -> current id maps.
+
+Run this file directly for a micro-benchmark of the dict and the compact
+maps: ``python id_map.py [entries] [lookups]``.
+"""
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from operator import itemgetter
+
+# Dense key ranges (span up to this many times the entry count) get a direct index
+DENSE_FACTOR = 2
+DEFAULT_COMPACT_THRESHOLD = 100000
+
+
+class IdMap(dict):
+    """old_id -> current id map of one model, counting its translations.
+
+    The counters are updated without a lock, concurrent workers may lose an
+    increment now and then, which is fine for statistics.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hits = 0
+        self.misses = 0
+
+    def translate(self, value, default=None):
+        """Current id of an old id, ``default`` when it is not migrated (yet)."""
+        try:
+            new_id = self[value]
+        except (KeyError, TypeError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return new_id
+
+    def translate_many(self, values, default=None):
+        return [self.translate(value, default) for value in values]
+
+    @property
+    def nbytes(self):
+        """Rough memory use: the hash table plus two small ints per entry."""
+        return sys.getsizeof(self) + len(self) * 2 * sys.getsizeof(2 ** 40)
+
+
+class CompactIdMap:
+    """Read-only integer id map backed by ``array('q')``, about 16 bytes per entry.
+
+    Sparse keys are kept as two sorted arrays searched with bisect. When the
+    keys are dense, the current ids are stored in one array indexed by
+    ``old_id - offset``, 0 marking a missing id (Odoo ids start at 1). The
+    lookup interface is the one of IdMap, so the remapping code takes both.
+    """
+
+    def __init__(self, keys, values, offset=None):
+        self._keys = keys
+        self._values = values
+        self._offset = offset
+        self._len = len(keys) if offset is None else sum(1 for v in values if v)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Build from (old_id, id) pairs, the last pair wins for duplicate old ids like in a dict."""
+        keys = array("q")
+        values = array("q")
+        # sorted() is stable, so duplicates keep their order
+        for key, value in sorted(pairs, key=itemgetter(0)):
+            if keys and keys[-1] == key:
+                values[-1] = value
+            else:
+                keys.append(key)
+                values.append(value)
+        if keys and keys[-1] - keys[0] + 1 <= DENSE_FACTOR * len(keys):
+            offset = keys[0]
+            table = array("q", bytes(8 * (keys[-1] - offset + 1)))
+            for key, value in zip(keys, values):
+                table[key - offset] = value
+            return cls(array("q"), table, offset=offset)
+        return cls(keys, values)
+
+    def _lookup(self, value):
+        try:
+            if self._offset is not None:
+                index = value - self._offset
+                if 0 <= index < len(self._values):
+                    return self._values[index] or None
+                return None
+            index = bisect_left(self._keys, value)
+        except TypeError:
+            return None
+        if index < len(self._keys) and self._keys[index] == value:
+            return self._values[index]
+        return None
+
+    def translate(self, value, default=None):
+        """Current id of an old id, ``default`` when it is not migrated (yet)."""
+        new_id = self._lookup(value)
+        if new_id is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return new_id
+
+    def translate_many(self, values, default=None):
+        """Translate a batch of old ids, in order."""
+        lookup = self._lookup
+        result = []
+        for value in values:
+            new_id = lookup(value)
+            if new_id is None:
+                self.misses += 1
+                result.append(default)
+            else:
+                self.hits += 1
+                result.append(new_id)
+        return result
+
+    def get(self, value, default=None):
+        new_id = self._lookup(value)
+        return default if new_id is None else new_id
+
+    def __getitem__(self, value):
+        new_id = self._lookup(value)
+        if new_id is None:
+            raise KeyError(value)
+        return new_id
+
+    def __contains__(self, value):
+        return self._lookup(value) is not None
+
+    def __len__(self):
+        return self._len
+
+    def items(self):
+        if self._offset is None:
+            return zip(self._keys, self._values)
+        return (
+            (index + self._offset, value)
+            for index, value in enumerate(self._values)
+            if value
+        )
+
+    @property
+    def nbytes(self):
+        return (
+            sys.getsizeof(self)
+            + self._keys.buffer_info()[1] * self._keys.itemsize
+            + self._values.buffer_info()[1] * self._values.itemsize
+        )
+
+
+def make_id_map(pairs, compact_threshold=DEFAULT_COMPACT_THRESHOLD):
+    """IdMap for small maps or non-integer keys, CompactIdMap from ``compact_threshold`` entries on."""
+    if isinstance(pairs, dict):
+        pairs = pairs.items()
+    pairs = list(pairs)
+    if (
+        compact_threshold
+        and len(pairs) >= compact_threshold
+        and all(type(key) is int for key, _value in pairs)
+    ):
+        return CompactIdMap.from_pairs(pairs)
+    return IdMap(pairs)
+
+
+def benchmark(entries=1000000, lookups=500000):
+    """Compare memory and lookups per second of IdMap and CompactIdMap."""
+    import random
+    import tracemalloc
+
+    rng = random.Random(42)
+    layouts = {
+        "dense": list(range(1, entries + 1)),
+        "sparse": sorted(rng.sample(range(1, entries * 20), entries)),
+    }
+    for layout, old_ids in layouts.items():
+        probes = [rng.choice(old_ids) for _i in range(lookups // 2)]
+        probes += [rng.randrange(entries * 20) for _i in range(lookups - len(probes))]
+
+        # Fresh int objects, like the rows fetched from the database
+        def fetch():
+            return ((old_id + 0, index + 1000000000) for index, old_id in enumerate(old_ids))
+
+        for label, build in (
+            ("dict", lambda: IdMap(fetch())),
+            ("compact", lambda: CompactIdMap.from_pairs(fetch())),
+        ):
+            tracemalloc.start()
+            id_map = build()
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            start = time.perf_counter()
+            translate = id_map.translate
+            for value in probes:
+                translate(value)
+            single = lookups / (time.perf_counter() - start)
+            start = time.perf_counter()
+            id_map.translate_many(probes)
+            batch = lookups / (time.perf_counter() - start)
+            print(
+                f"{layout:6} {label:7} {entries} ids: {memory / 1048576:7.1f} MiB "
+                f"({memory / entries:5.1f} B/id), {single:12,.0f} lookups/s, "
+                f"{batch:12,.0f} batched lookups/s"
+            )
+            del id_map
+
+
+if __name__ == "__main__":
+    benchmark(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,107 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from odoo.tools.image import image_process
+
+_logger = logging.getLogger(__name__)
+
+
+def variant_fields(model, field_name):
+    """(name, max width, max height) of the stored image fields resized from ``field_name``.
+
+    Like image_1024 ... image_128, related to image_1920 with a max size.
+    """
+    variants = []
+    for field in model._fields.values():
+        if (
+            field.type == "binary"
+            and field.store
+            and getattr(field, "related", None) == field_name
+            and (getattr(field, "max_width", 0) or getattr(field, "max_height", 0))
+        ):
+            variants.append((field.name, field.max_width, field.max_height))
+    return variants
+
+
+def resize_variants(job):
+    """Resize one original image into its variants in this process, (record id, {field: bytes})."""
+    record_id, data, sizes = job
+    try:
+        return record_id, {name: image_process(data, size=(width, height)) for name, width, height in sizes}
+    except Exception as e:
+        _logger.warning(f"Image variants of record {record_id} not generated: {e}")
+        return record_id, {}
+
+
+class VariantResizer:
+    """Resize original images into their variants on a process pool.
+
+    The pool runs inside threaded Odoo workers and the migration threads, so
+    its processes are not forked from them: a fork could copy a lock held by
+    another thread (logging, psycopg2, imports) and hang the child. They
+    come from the forkserver, or are spawned where it is not available. A
+    fresh interpreter cannot import this addon, odoo.addons is only set up
+    by the server, so the processes run image_process from odoo.tools
+    itself, one task per variant. When the pool cannot start or breaks, the
+    images are resized in this process instead.
+    """
+
+    def __init__(self, max_workers=0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pool = None
+        self.in_process = False
+
+    def __enter__(self):
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        try:
+            self.pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        except (OSError, ValueError) as e:
+            self._fall_back(e)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+        return False
+
+    def _fall_back(self, error):
+        _logger.warning(f"Image process pool unavailable, resizing in this process: {error}")
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = None
+        self.in_process = True
+
+    def resize(self, jobs):
+        """(record id, {field: bytes}) of every (record id, data, sizes) job."""
+        if self.pool:
+            try:
+                return self._resize_on_pool(jobs)
+            except (BrokenProcessPool, OSError) as e:
+                # The processes start with the first task, their failures show up here
+                self._fall_back(e)
+        return [resize_variants(job) for job in jobs]
+
+    def _resize_on_pool(self, jobs):
+        queued = [
+            (
+                record_id,
+                {name: self.pool.submit(image_process, data, size=(width, height)) for name, width, height in sizes},
+            )
+            for record_id, data, sizes in jobs
+        ]
+        results = []
+        for record_id, futures in queued:
+            images = {}
+            for name, future in futures.items():
+                try:
+                    images[name] = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    _logger.warning(f"Image variant {name} of record {record_id} not generated: {e}")
+            results.append((record_id, images))
+        return results
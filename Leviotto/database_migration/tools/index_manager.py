@@ -0,0 +1,123 @@
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+_logger = logging.getLogger(__name__)
+
+# Columns the loaders look records up by, their indexes stay during a load
+KEEP_COLUMNS = ("old_id", "default_code")
+
+
+def snapshot_indexes(cursor, table_name, keep_columns=KEEP_COLUMNS):
+    """Definitions of the indexes of a table, from pg_indexes.
+
+    Each index comes with ``droppable``: primary keys, unique indexes,
+    indexes backing a constraint and indexes on one of ``keep_columns`` are
+    never dropped, they guard or serve the load itself.
+    """
+    cursor.execute(
+        """
+        SELECT pi.indexname, pi.indexdef, ix.indisprimary, ix.indisunique,
+               EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = ix.indexrelid),
+               ARRAY(
+                   SELECT a.attname FROM pg_attribute a
+                   WHERE a.attrelid = ix.indrelid AND a.attnum = ANY(ix.indkey)
+               )
+        FROM pg_indexes pi
+        JOIN pg_class i ON i.relname = pi.indexname
+        JOIN pg_namespace n ON n.oid = i.relnamespace AND n.nspname = pi.schemaname
+        JOIN pg_index ix ON ix.indexrelid = i.oid
+        WHERE pi.tablename = %s AND pi.schemaname = current_schema()
+        ORDER BY pi.indexname
+        """,
+        (table_name,),
+    )
+    indexes = []
+    for name, definition, primary, unique, constraint, columns in cursor.fetchall():
+        indexes.append(
+            {
+                "name": name,
+                "definition": definition,
+                "columns": list(columns),
+                "droppable": not (
+                    primary
+                    or unique
+                    or constraint
+                    or any(column in keep_columns for column in columns)
+                ),
+            }
+        )
+    return indexes
+
+
+def drop_indexes(cursor, indexes):
+    """Drop the droppable indexes of a snapshot, return their definitions."""
+    dropped = []
+    for index in indexes:
+        if index["droppable"]:
+            cursor.execute(f'DROP INDEX IF EXISTS "{index["name"]}"')
+            dropped.append(index["definition"])
+    return dropped
+
+
+def if_not_exists(definition):
+    return re.sub(
+        r"^CREATE (UNIQUE )?INDEX (?!IF NOT EXISTS)",
+        lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS ",
+        definition,
+    )
+
+
+def old_id_index_definition(cursor, table_name):
+    """CREATE INDEX statement for old_id, None when the column is missing or already leads an index."""
+    cursor.execute(
+        """
+        SELECT EXISTS (
+                   SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'old_id'
+               ),
+               EXISTS (
+                   SELECT 1 FROM pg_index ix
+                   JOIN pg_class t ON t.oid = ix.indrelid
+                   JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = ix.indkey[0]
+                   WHERE t.relname = %s
+                     AND t.relnamespace = (SELECT oid FROM pg_namespace WHERE nspname = current_schema())
+                     AND a.attname = 'old_id'
+               )
+        """,
+        (table_name, table_name),
+    )
+    has_column, has_index = cursor.fetchone()
+    if has_column and not has_index:
+        return f'CREATE INDEX IF NOT EXISTS "{table_name}__old_id_index" ON "{table_name}" USING btree (old_id)'
+    return None
+
+
+def rebuild_indexes(cursor_factory, definitions, maintenance_work_mem="1GB", max_workers=4):
+    """Create indexes in parallel, each on its own cursor and transaction.
+
+    ``cursor_factory`` returns a context manager yielding a cursor that
+    commits on exit, like ``registry.cursor``. Returns the seconds spent per
+    definition, failures are logged and left out.
+    """
+
+    def build(definition):
+        start = time.monotonic()
+        with cursor_factory() as cr:
+            cr.execute("SET LOCAL maintenance_work_mem = %s", (maintenance_work_mem,))
+            cr.execute(if_not_exists(definition))
+        return time.monotonic() - start
+
+    timings = {}
+    if not definitions:
+        return timings
+    with ThreadPoolExecutor(max_workers=max(min(max_workers, len(definitions)), 1)) as pool:
+        futures = {pool.submit(build, definition): definition for definition in definitions}
+        for future in as_completed(futures):
+            definition = futures[future]
+            try:
+                timings[definition] = future.result()
+            except Exception as e:
+                _logger.error(f"Rebuilding index failed: {definition}: {e}")
+    return timings
@@ -0,0 +1,120 @@
+import logging
+import time
+
+from psycopg2.extras import execute_values
+
+from .extract import iter_batches
+
+_logger = logging.getLogger(__name__)
+
+
+def old_relation(cursor, model_name, field_name):
+    """(relation table, column1, column2) of a many2many field of the old database.
+
+    Read from ir_model_fields, None when the field is not a stored
+    many2many or the old version does not record its relation table.
+    """
+    cursor.execute(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'ir_model_fields' AND column_name = 'relation_table'
+        )
+        """
+    )
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute(
+        """
+        SELECT relation_table, column1, column2 FROM ir_model_fields
+        WHERE model = %s AND name = %s AND ttype = 'many2many'
+        """,
+        (model_name, field_name),
+    )
+    row = cursor.fetchone()
+    if not row or not all(row):
+        return None
+    return tuple(row)
+
+
+class Many2manyCopier:
+    """Copy the links of a many2many field from the old rel table into the current one.
+
+    The (owner, target) pairs are remapped through the id maps of both
+    models and inserted with multi-row INSERTs, duplicates ignored. The
+    links of a migrated owner are replaced, like the (6, 0, ids) write of
+    the XML-RPC path: its current links are deleted the first time it shows
+    up. Pairs whose owner is not migrated are skipped, targets that are not
+    migrated are dropped from the links.
+    """
+
+    def __init__(self, cursor, relation, column1, column2, owner_map, target_map, batch_size=10000):
+        self.cursor = cursor
+        self.relation = relation
+        self.column1 = column1
+        self.column2 = column2
+        self.owner_map = owner_map
+        self.target_map = target_map
+        self.batch_size = max(batch_size or 1, 1)
+        self.pairs = 0
+        self.inserted = 0
+        self.unmapped = 0
+        self.deleted = 0
+        self.elapsed = 0.0
+        self._owners = set()
+
+    def copy_batch(self, pairs):
+        """Remap and insert a list of old (owner, target) pairs, returns the rows inserted."""
+        start = time.monotonic()
+        links = []
+        owners = set()
+        for old_owner, old_target in pairs:
+            owner = self.owner_map.translate(old_owner)
+            if not owner:
+                self.unmapped += 1
+                continue
+            owners.add(owner)
+            target = self.target_map.translate(old_target)
+            if target:
+                links.append((owner, target))
+            else:
+                self.unmapped += 1
+        new_owners = owners - self._owners
+        if new_owners:
+            self.cursor.execute(
+                f'DELETE FROM "{self.relation}" WHERE "{self.column1}" = ANY(%s)',
+                (list(new_owners),),
+            )
+            self.deleted += self.cursor.rowcount
+            self._owners |= new_owners
+        inserted = 0
+        if links:
+            execute_values(
+                self.cursor,
+                f'INSERT INTO "{self.relation}" ("{self.column1}", "{self.column2}") VALUES %s '
+                "ON CONFLICT DO NOTHING",
+                links,
+                # One statement per batch, rowcount only covers the last page
+                page_size=len(links),
+            )
+            inserted = self.cursor.rowcount
+        self.pairs += len(pairs)
+        self.inserted += inserted
+        self.elapsed += time.monotonic() - start
+        return inserted
+
+    def copy(self, pairs, on_batch=None):
+        """Copy an iterable of old pairs batch by batch, ``on_batch(rows)`` after each one."""
+        for batch in iter_batches(pairs, self.batch_size):
+            inserted = self.copy_batch(batch)
+            if on_batch:
+                on_batch(inserted)
+        return self.inserted
+
+    def summary(self):
+        rate = self.pairs / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.pairs} links copied into {self.relation} in {self.elapsed:.2f}s ({rate:.0f} links/sec, "
+            f"{self.inserted} inserted, {self.deleted} replaced, {self.unmapped} not migrated)"
+        )
@@ -0,0 +1,60 @@
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+MAINTENANCE_MODES = [
+    ("none", "Nothing"),
+    ("analyze", "ANALYZE"),
+    ("auto", "ANALYZE, VACUUM When Useful"),
+    ("vacuum", "VACUUM ANALYZE"),
+]
+
+# VACUUM pays off when this share of the rows is dead...
+DEAD_RATIO = 0.1
+# ...or when less of the table than this is marked all-visible (no index-only scans)
+VISIBLE_RATIO = 0.5
+
+
+def needs_vacuum(cursor, table_name):
+    """Whether a freshly loaded table gains from a VACUUM, not only an ANALYZE."""
+    cursor.execute(
+        """
+        SELECT s.n_live_tup, s.n_dead_tup, c.relpages, c.relallvisible
+        FROM pg_stat_user_tables s
+        JOIN pg_class c ON c.oid = s.relid
+        WHERE s.relname = %s AND s.schemaname = current_schema()
+        """,
+        (table_name,),
+    )
+    row = cursor.fetchone()
+    if not row:
+        return False
+    live, dead, pages, visible = row
+    if dead and dead > DEAD_RATIO * max(live, 1):
+        return True
+    return bool(pages) and visible < VISIBLE_RATIO * pages
+
+
+def maintain_table(cursor_factory, table_name, mode="auto"):
+    """Refresh the planner statistics of a loaded table on a connection of its own.
+
+    VACUUM cannot run in a transaction, so the cursor is switched to
+    autocommit for the statement and back before it returns to the pool.
+    Returns the statement run and its duration, (None, 0.0) for mode none.
+    """
+    if not mode or mode == "none":
+        return None, 0.0
+    start = time.monotonic()
+    with cursor_factory() as cr:
+        vacuum = mode == "vacuum" or (mode == "auto" and needs_vacuum(cr, table_name))
+        statement = f'VACUUM (ANALYZE) "{table_name}"' if vacuum else f'ANALYZE "{table_name}"'
+        cr.commit()
+        cr._cnx.autocommit = True
+        try:
+            cr.execute(statement)
+        finally:
+            cr._cnx.autocommit = False
+    elapsed = time.monotonic() - start
+    _logger.info(f"{statement} took {elapsed:.1f}s")
+    return statement, elapsed
@@ -0,0 +1,202 @@
+import contextlib
+import logging
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+_logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolExhausted(psycopg2.OperationalError):
+    """No connection became free before the timeout."""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers the pool it belongs to."""
+
+    pool = None
+    last_used = 0.0
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections to one database.
+
+    Idle connections older than ``idle_timeout`` seconds are closed (down to
+    ``min_size``), connections idle for more than ``health_check_interval``
+    seconds are pinged before being handed out. Returned connections are
+    rolled back and their session state discarded, so settings and temp
+    tables never leak from one user to the next.
+    """
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=8, idle_timeout=300.0,
+                 health_check_interval=30.0, acquire_timeout=60.0, name=""):
+        self.connect_kwargs = dict(connect_kwargs)
+        self.min_size = max(min_size or 0, 0)
+        self.max_size = max(max_size or 1, 1)
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.name = name or self.connect_kwargs.get("dbname", "")
+        self._idle = []
+        self._in_use = set()
+        self._condition = threading.Condition()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.health_failures = 0
+        self.waits = 0
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self.connect_kwargs)
+        conn.pool = self
+        return conn
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def evict_idle(self):
+        """Close idle connections unused for longer than idle_timeout, keeping min_size."""
+        now = time.monotonic()
+        with self._condition:
+            keep, expired = [], []
+            for conn in self._idle:
+                total = len(keep) + len(self._in_use)
+                if now - conn.last_used > self.idle_timeout and total >= self.min_size:
+                    expired.append(conn)
+                else:
+                    keep.append(conn)
+            self._idle = keep
+            self.evicted += len(expired)
+        for conn in expired:
+            self._discard(conn)
+        return len(expired)
+
+    def getconn(self):
+        """Hand out an idle connection (hit) or open a new one (miss)."""
+        self.evict_idle()
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._is_healthy(conn):
+                        self.hits += 1
+                        self._in_use.add(conn)
+                        return conn
+                    self.health_failures += 1
+                    self._discard(conn)
+                if len(self._in_use) < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhausted(
+                        f"No free connection to {self.name} after {self.acquire_timeout:.0f}s (max {self.max_size})"
+                    )
+                self.waits += 1
+                self._condition.wait(remaining)
+            self.misses += 1
+            placeholder = object()
+            self._in_use.add(placeholder)
+        try:
+            conn = self._connect()
+        finally:
+            with self._condition:
+                self._in_use.discard(placeholder)
+        with self._condition:
+            self._in_use.add(conn)
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Give a connection back, cleaning its transaction and session state."""
+        if not close and not conn.closed:
+            try:
+                conn.rollback()
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute("DISCARD ALL")
+                conn.autocommit = False
+            except psycopg2.Error:
+                close = True
+        with self._condition:
+            self._in_use.discard(conn)
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._condition:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "evicted": self.evicted,
+                "health_failures": self.health_failures,
+                "waits": self.waits,
+            }
+
+
+def get_pool(key, connect_kwargs, **options):
+    """Return the pool registered under key, rebuilding it if the connection settings changed."""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool and pool.connect_kwargs == dict(connect_kwargs):
+            pool.min_size = options.get("min_size", pool.min_size)
+            pool.max_size = options.get("max_size", pool.max_size)
+            pool.idle_timeout = options.get("idle_timeout", pool.idle_timeout)
+            return pool
+        if pool:
+            pool.closeall()
+        pool = _pools[key] = ConnectionPool(connect_kwargs, **options)
+        return pool
+
+
+def release(conn):
+    """Return a connection to its pool, or close it when it does not come from one."""
+    if conn is None:
+        return
+    pool = getattr(conn, "pool", None)
+    if pool:
+        pool.putconn(conn)
+    else:
+        conn.close()
@@ -0,0 +1,168 @@
+import json
+import logging
+import time
+
+from psycopg2.extras import execute_values
+
+_logger = logging.getLogger(__name__)
+
+# ir_property column holding each field type (Odoo 17 and before)
+PROPERTY_COLUMNS = {
+    "many2one": "value_reference",
+    "char": "value_text",
+    "text": "value_text",
+    "html": "value_text",
+    "selection": "value_text",
+    "integer": "value_integer",
+    "boolean": "value_integer",
+    "float": "value_float",
+    "date": "value_datetime",
+    "datetime": "value_datetime",
+}
+
+
+def property_storage(cursor, table_name, column_name):
+    """Where a company-dependent field lives: "jsonb" (a column of the table, Odoo 18+) or "ir_property"."""
+    cursor.execute(
+        """
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s
+        """,
+        (table_name, column_name),
+    )
+    row = cursor.fetchone()
+    return "jsonb" if row and row[0] == "jsonb" else "ir_property"
+
+
+class PropertyWriter:
+    """Set-based writer of company-dependent fields for one company.
+
+    Values are collected with add() and written by flush(), one or two
+    statements per field whatever the number of records: an UPDATE of the
+    existing ir_property rows then an INSERT of the missing ones, or a
+    single UPDATE merging the company key into the jsonb column when the
+    target version stores company-dependent values that way. The ORM cache
+    is not touched, the caller invalidates it.
+    """
+
+    def __init__(self, cursor, model_name, table_name, company_id, fields_info, uid=1):
+        """``fields_info`` maps a field name to (ir_model_fields id, type, comodel)."""
+        self.cursor = cursor
+        self.model_name = model_name
+        self.table_name = table_name
+        self.company_id = int(company_id)
+        self.fields_info = {
+            name: info for name, info in fields_info.items() if info[1] in PROPERTY_COLUMNS
+        }
+        self.uid = int(uid)
+        self.storage = {
+            name: property_storage(cursor, table_name, name) for name in self.fields_info
+        }
+        self.pending = {}
+        self.rows = 0
+        self.updated = 0
+        self.inserted = 0
+        self.statements = 0
+        self.elapsed = 0.0
+
+    def handles(self, field_name):
+        return field_name in self.fields_info
+
+    def add(self, record_id, field_name, value):
+        self.pending.setdefault(field_name, {})[record_id] = value
+
+    def _property_value(self, field_name, value):
+        _field_id, field_type, comodel = self.fields_info[field_name]
+        if value is False or value is None:
+            return None
+        if field_type == "many2one":
+            return f"{comodel},{int(value)}"
+        if field_type == "boolean":
+            return 1 if value else 0
+        return value
+
+    def _write_ir_property(self, field_name, values):
+        field_id, field_type, _comodel = self.fields_info[field_name]
+        column = PROPERTY_COLUMNS[field_type]
+        rows = [
+            (f"{self.model_name},{record_id}", self._property_value(field_name, value))
+            for record_id, value in values.items()
+        ]
+        cast = {"value_integer": "integer", "value_float": "float8", "value_datetime": "timestamp"}.get(column, "text")
+        execute_values(
+            self.cursor,
+            f"""
+            UPDATE ir_property p SET {column} = v.value::{cast},
+                   write_uid = {self.uid}, write_date = now() at time zone 'UTC'
+            FROM (VALUES %s) AS v(res_id, value)
+            WHERE p.fields_id = {int(field_id)} AND p.company_id = {self.company_id} AND p.res_id = v.res_id
+            """,
+            rows,
+            page_size=len(rows),
+        )
+        self.updated += self.cursor.rowcount
+        execute_values(
+            self.cursor,
+            f"""
+            INSERT INTO ir_property
+                (name, res_id, company_id, fields_id, type, {column},
+                 create_uid, create_date, write_uid, write_date)
+            SELECT '{field_name}', v.res_id, {self.company_id}, {int(field_id)}, '{field_type}', v.value::{cast},
+                   {self.uid}, now() at time zone 'UTC', {self.uid}, now() at time zone 'UTC'
+            FROM (VALUES %s) AS v(res_id, value)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM ir_property p
+                WHERE p.fields_id = {int(field_id)} AND p.company_id = {self.company_id} AND p.res_id = v.res_id
+            )
+            """,
+            rows,
+            page_size=len(rows),
+        )
+        self.inserted += self.cursor.rowcount
+        self.statements += 2
+
+    def _write_jsonb(self, field_name, values):
+        _field_id, field_type, _comodel = self.fields_info[field_name]
+        rows = [
+            (record_id, json.dumps(None if value is False and field_type != "boolean" else value))
+            for record_id, value in values.items()
+        ]
+        execute_values(
+            self.cursor,
+            f"""
+            UPDATE "{self.table_name}" t
+            SET "{field_name}" = COALESCE(t."{field_name}", '{{}}'::jsonb)
+                || jsonb_build_object('{self.company_id}', v.value::jsonb)
+            FROM (VALUES %s) AS v(id, value)
+            WHERE t.id = v.id
+            """,
+            rows,
+            page_size=len(rows),
+        )
+        self.updated += self.cursor.rowcount
+        self.statements += 1
+
+    def flush(self):
+        """Write the collected values, returns the number of values written."""
+        start = time.monotonic()
+        written = 0
+        for field_name, values in self.pending.items():
+            if not values:
+                continue
+            if self.storage[field_name] == "jsonb":
+                self._write_jsonb(field_name, values)
+            else:
+                self._write_ir_property(field_name, values)
+            written += len(values)
+        self.pending = {}
+        self.rows += written
+        self.elapsed += time.monotonic() - start
+        return written
+
+    def summary(self):
+        rate = self.rows / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.rows} company-dependent values of {self.model_name} written in {self.elapsed:.2f}s "
+            f"({rate:.0f} values/sec, {self.updated} updated, {self.inserted} inserted) "
+            f"with {self.statements} statements"
+        )
@@ -0,0 +1,30 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def group_links(old_records, field_name, owner_map, target_map):
+    """Remap the x2many values of a page of old records, grouped by link set.
+
+    ``old_records`` are read() dicts with the old ids of ``field_name``.
+    Returns ({sorted tuple of new ids: [owner ids]}, skipped) where skipped
+    counts the records left alone: no links in the old database or owner
+    not migrated. Links to records that are not migrated are dropped, as
+    the (6, 0, ids) write of one record always did. Owners sharing a link
+    set are written together by the caller.
+    """
+    groups = {}
+    skipped = 0
+    for old_record in old_records:
+        related_ids = old_record.get(field_name)
+        if not isinstance(related_ids, list):
+            skipped += 1
+            continue
+        related_ids = [rid for rid in related_ids if isinstance(rid, int)]
+        owner = owner_map.translate(old_record["id"]) if related_ids else None
+        if not owner:
+            skipped += 1
+            continue
+        links = tuple(sorted({new_id for new_id in map(target_map.translate, related_ids) if new_id}))
+        groups.setdefault(links, []).append(owner)
+    return groups, skipped
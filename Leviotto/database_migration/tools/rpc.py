@@ -0,0 +1,310 @@
+import contextlib
+import http.client
+import logging
+import socket
+import threading
+import time
+import xmlrpc.client
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+_logger = logging.getLogger(__name__)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Worth another try: the old server or the network hiccuped, the call itself is fine
+TRANSIENT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    socket.timeout,
+    http.client.HTTPException,
+    xmlrpc.client.ProtocolError,
+)
+
+
+def call_with_retry(func, *args, retries=3, backoff=1.0, label="XML-RPC call"):
+    """Call ``func(*args)``, retrying transient errors with exponential backoff."""
+    attempt = 0
+    while True:
+        try:
+            return func(*args)
+        except TRANSIENT_ERRORS as e:
+            if attempt >= retries:
+                raise
+            delay = backoff * 2 ** attempt
+            attempt += 1
+            _logger.warning(f"{label} failed ({e}), retry {attempt}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class PagedReader:
+    """Read a model of the old server page by page, over several XML-RPC clients.
+
+    The ids are searched first (ordered, so pages are id ranges), then every
+    page is read with its own ``read`` call on a pool of ``max_workers``
+    threads. ``checkout`` lends a ServerProxy for one call (they are not
+    thread-safe), like RpcSession.object_proxy, so the threads reuse the
+    kept-alive connections of the session instead of opening their own.
+    Pages are yielded as soon as they arrive, at most ``2 * max_workers``
+    are in flight, so memory stays bounded whatever the size of the model.
+    """
+
+    def __init__(self, checkout, db, uid, password, model, fields, domain=None,
+                 page_size=500, max_workers=4, retries=3, backoff=1.0, context=None):
+        self.checkout = checkout
+        self.db = db
+        self.uid = uid
+        self.password = password
+        self.model = model
+        self.fields = list(fields)
+        self.domain = domain or []
+        self.page_size = max(page_size or 1, 1)
+        self.max_workers = max(max_workers or 1, 1)
+        self.retries = retries
+        self.backoff = backoff
+        self.context = context or {}
+        self.pages = 0
+        self.records = 0
+        self.calls = 0
+        self.elapsed = 0.0
+        # calls is counted by the page threads
+        self._lock = threading.Lock()
+
+    def _execute(self, method, args, kwargs, label):
+        def call():
+            with self._lock:
+                self.calls += 1
+            with self.checkout() as proxy:
+                return proxy.execute_kw(
+                    self.db, self.uid, self.password, self.model, method, args, kwargs
+                )
+
+        return call_with_retry(call, retries=self.retries, backoff=self.backoff, label=label)
+
+    def search_ids(self):
+        return self._execute(
+            "search", [self.domain], {"order": "id", "context": self.context},
+            f"search {self.model}",
+        )
+
+    def read_page(self, ids):
+        return self._execute(
+            "read", [ids], {"fields": self.fields, "context": self.context},
+            f"read {self.model} {ids[0]}..{ids[-1]}",
+        )
+
+    def __iter__(self):
+        start = time.monotonic()
+        ids = self.search_ids()
+        chunks = iter(
+            [ids[i:i + self.page_size] for i in range(0, len(ids), self.page_size)]
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = set()
+            while True:
+                for chunk in chunks:
+                    running.add(pool.submit(self.read_page, chunk))
+                    if len(running) >= 2 * self.max_workers:
+                        break
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = future.result()
+                    self.pages += 1
+                    self.records += len(page)
+                    yield page
+        self.elapsed = time.monotonic() - start
+        _logger.info(self.summary())
+
+    def summary(self):
+        return (
+            f"{self.records} {self.model} records read in {self.pages} pages of {self.page_size} "
+            f"with {self.calls} calls over {self.max_workers} clients in {self.elapsed:.1f}s"
+        )
+
+
+class KeepAliveTransport(xmlrpc.client.Transport):
+    """XML-RPC transport that keeps its HTTP/1.1 connection open between calls.
+
+    The standard transport already reuses its connection while the server
+    keeps it alive (and reconnects once when it was dropped meanwhile);
+    this one adds a socket timeout, counts the round-trips and gzips the
+    request bodies larger than ``encode_threshold`` when asked to. gzipped
+    responses are accepted and decoded in any case.
+    """
+
+    def __init__(self, on_request=None, timeout=None, gzip_requests=False, **kwargs):
+        super().__init__(**kwargs)
+        self.on_request = on_request
+        self.timeout = timeout
+        self.encode_threshold = 1400 if gzip_requests else None
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        if self.timeout:
+            connection.timeout = self.timeout
+        return connection
+
+    def request(self, host, handler, request_body, verbose=False):
+        if self.on_request:
+            self.on_request()
+        return super().request(host, handler, request_body, verbose=verbose)
+
+
+class SafeKeepAliveTransport(KeepAliveTransport, xmlrpc.client.SafeTransport):
+    """KeepAliveTransport over HTTPS."""
+
+
+class RpcSession:
+    """XML-RPC session to the old server, shared by the migrate actions of a connection.
+
+    ServerProxies are not thread-safe, so a call checks one out of the idle
+    proxies of its service and gives it back afterwards. Each has a
+    keep-alive transport: the session holds at most as many connections as
+    calls ever ran at once, and they outlive the threads and the actions
+    that used them, so a connection pays the TCP/TLS handshake once. The
+    uid is authenticated once and reused, AccessDenied on a reused uid
+    authenticates again. ``round_trips`` counts the HTTP requests sent by
+    all the proxies of the session.
+    """
+
+    def __init__(self, url, db, login, password, timeout=300, gzip_requests=False,
+                 retries=3, backoff=1.0, name=""):
+        self.url = (url or "").rstrip("/")
+        self.db = db
+        self.login = login
+        self.password = password
+        self.timeout = timeout
+        self.gzip_requests = gzip_requests
+        self.retries = retries
+        self.backoff = backoff
+        self.name = name or db
+        self.uid = None
+        self.round_trips = 0
+        self._lock = threading.Lock()
+        # service -> idle ServerProxies; close() starts a new generation
+        self._idle = {}
+        self._generation = 0
+        self._transports = []
+
+    @property
+    def settings(self):
+        return (self.url, self.db, self.login, self.password)
+
+    def _count_request(self):
+        with self._lock:
+            self.round_trips += 1
+
+    def _new_proxy(self, service):
+        cls = SafeKeepAliveTransport if self.url.startswith("https") else KeepAliveTransport
+        transport = cls(self._count_request, timeout=self.timeout, gzip_requests=self.gzip_requests)
+        with self._lock:
+            self._transports.append(transport)
+        return xmlrpc.client.ServerProxy(
+            f"{self.url}/xmlrpc/2/{service}", transport=transport, allow_none=True
+        )
+
+    @contextlib.contextmanager
+    def proxy(self, service="object"):
+        """Lend a ServerProxy of ``service`` for one call, its connection stays open."""
+        with self._lock:
+            generation = self._generation
+            idle = self._idle.setdefault(service, [])
+            proxy = idle.pop() if idle else None
+        if proxy is None:
+            proxy = self._new_proxy(service)
+        try:
+            yield proxy
+        finally:
+            with self._lock:
+                if generation == self._generation:
+                    self._idle[service].append(proxy)
+                    proxy = None
+            if proxy is not None:
+                # The session was closed meanwhile, the proxy may carry old options
+                proxy("transport").close()
+
+    def object_proxy(self):
+        return self.proxy("object")
+
+    def authenticate(self, refresh=False):
+        """uid on the old server, authenticated on first use only (False when refused)."""
+        if refresh or not self.uid:
+
+            def call(*call_args):
+                with self.proxy("common") as proxy:
+                    return proxy.authenticate(*call_args)
+
+            self.uid = call_with_retry(
+                call,
+                self.db,
+                self.login,
+                self.password,
+                {},
+                retries=self.retries,
+                backoff=self.backoff,
+                label=f"authenticate on {self.name}",
+            )
+        return self.uid
+
+    def execute(self, model, method, args=(), kwargs=None):
+        """execute_kw on the old server, retrying transient errors."""
+        for attempt in range(2):
+            uid = self.authenticate()
+            if not uid:
+                raise ValueError("Failed to authenticate to the old database.")
+
+            def call(*call_args):
+                with self.object_proxy() as proxy:
+                    return proxy.execute_kw(*call_args)
+
+            try:
+                return call_with_retry(
+                    call,
+                    self.db,
+                    uid,
+                    self.password,
+                    model,
+                    method,
+                    list(args),
+                    kwargs or {},
+                    retries=self.retries,
+                    backoff=self.backoff,
+                    label=f"{model}.{method} on {self.name}",
+                )
+            except xmlrpc.client.Fault as e:
+                if attempt or "AccessDenied" not in str(e.faultString):
+                    raise
+                # The reused uid is stale (password changed, user archived...)
+                self.uid = None
+
+    def close(self):
+        """Close the open connections, proxies in use are dropped when they come back."""
+        with self._lock:
+            transports, self._transports = self._transports, []
+            self._idle = {}
+            self._generation += 1
+        for transport in transports:
+            transport.close()
+
+    def summary(self):
+        return f"{self.round_trips} XML-RPC round-trips to {self.name}"
+
+
+def get_rpc_session(key, url, db, login, password, **options):
+    """Return the session registered under key, rebuilding it if the credentials changed."""
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session and session.settings == ((url or "").rstrip("/"), db, login, password):
+            changed = {option: value for option, value in options.items() if getattr(session, option) != value}
+            if changed:
+                # The idle proxies are built with the old options
+                session.close()
+                for option, value in changed.items():
+                    setattr(session, option, value)
+            return session
+        if session:
+            session.close()
+        session = _sessions[key] = RpcSession(url, db, login, password, **options)
+        return session
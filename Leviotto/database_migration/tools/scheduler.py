@@ -0,0 +1,146 @@
+import heapq
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+_logger = logging.getLogger(__name__)
+
+
+def break_cycles(graph, priority):
+    """Return a copy of graph {node: set(dependencies)} without cycles.
+
+    Nodes are peeled off in topological order, when only cycles are left the
+    dependencies of the node with the best priority are dropped.
+    """
+    graph = {node: set(deps) & set(graph) for node, deps in graph.items()}
+    remaining = {node: set(deps) for node, deps in graph.items()}
+    while remaining:
+        free = [node for node, deps in remaining.items() if not deps]
+        if not free:
+            node = min(remaining, key=priority)
+            _logger.warning(
+                f"Dependency cycle on {node}, ignoring its dependencies {sorted(remaining[node])}"
+            )
+            graph[node] -= remaining[node]
+            remaining[node] = set()
+            continue
+        for node in free:
+            del remaining[node]
+        for deps in remaining.values():
+            deps.difference_update(free)
+    return graph
+
+
+def topological_stages(graph):
+    """Group an acyclic graph into stages, each stage only depends on the previous ones."""
+    remaining = {node: set(deps) for node, deps in graph.items()}
+    stages = []
+    while remaining:
+        stage = sorted(node for node, deps in remaining.items() if not deps)
+        stages.append(stage)
+        for node in stage:
+            del remaining[node]
+        for deps in remaining.values():
+            deps.difference_update(stage)
+    return stages
+
+
+def count_dependents(graph):
+    """Return {node: number of nodes depending on it, directly or not}."""
+    dependents = defaultdict(set)
+    for node, deps in graph.items():
+        for dep in deps:
+            dependents[dep].add(node)
+
+    counts = {}
+    for node in graph:
+        seen = set()
+        stack = [node]
+        while stack:
+            for child in dependents[stack.pop()]:
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        counts[node] = len(seen)
+    return counts
+
+
+class DagScheduler:
+    """Run the nodes of a dependency graph on a thread pool.
+
+    A node starts as soon as all its dependencies are done. Among the ready
+    nodes, the ones most others depend on (lookup tables) go first, then the
+    smallest ones, so the big tables at the end of the chains can start as
+    early as possible. When a node fails, everything depending on it is skipped.
+
+    ``run_node(node)`` returns ``(ok, info)``.
+    """
+
+    def __init__(self, graph, run_node, max_workers=4, sizes=None):
+        self.sizes = sizes or {}
+        self.graph = break_cycles(graph, self._base_priority)
+        self.run_node = run_node
+        self.max_workers = max(max_workers or 1, 1)
+        self.dependents_count = count_dependents(self.graph)
+        self.results = {}
+
+    def _base_priority(self, node):
+        return self.sizes.get(node, 0), node
+
+    def _priority(self, node):
+        return -self.dependents_count.get(node, 0), self.sizes.get(node, 0), node
+
+    def _timed_run(self, node):
+        start = time.monotonic()
+        try:
+            ok, info = self.run_node(node)
+        except Exception as e:
+            ok, info = False, str(e)
+        return ok, info, time.monotonic() - start
+
+    def _skip_dependents(self, node, dependents):
+        stack = [node]
+        while stack:
+            for child in dependents[stack.pop()]:
+                if child not in self.results:
+                    self.results[child] = ("skipped", f"dependency {node} failed", 0.0)
+                    stack.append(child)
+
+    def run(self):
+        """Run the whole graph and return {node: (state, info, seconds)}."""
+        dependents = defaultdict(set)
+        indegree = {}
+        for node, deps in self.graph.items():
+            indegree[node] = len(deps)
+            for dep in deps:
+                dependents[dep].add(node)
+
+        ready = [(self._priority(node), node) for node, count in indegree.items() if not count]
+        heapq.heapify(ready)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while ready or running:
+                while ready and len(running) < self.max_workers:
+                    node = heapq.heappop(ready)[1]
+                    if node in self.results:
+                        continue
+                    running[pool.submit(self._timed_run, node)] = node
+                if not running:
+                    break
+
+                done, _pending = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    ok, info, seconds = future.result()
+                    self.results[node] = ("done" if ok else "failed", info, seconds)
+                    _logger.info(f"Migration of {node} {'done' if ok else 'failed'} in {seconds:.1f}s: {info}")
+                    if not ok:
+                        self._skip_dependents(node, dependents)
+                        continue
+                    for child in dependents[node]:
+                        indegree[child] -= 1
+                        if not indegree[child] and child not in self.results:
+                            heapq.heappush(ready, (self._priority(child), child))
+        return self.results
@@ -0,0 +1,151 @@
+import contextlib
+import logging
+import time
+
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+SESSION_PROFILES = [
+    ("default", "Default Settings"),
+    ("bulk_load", "Bulk Load"),
+]
+
+
+def bulk_load_settings(work_mem="256MB", statement_timeout=0):
+    """Settings of the bulk load profile.
+
+    synchronous_commit off trades the durability of the last commits for
+    no WAL flush per commit, session_replication_role replica skips the FK
+    triggers (check_foreign_keys replaces them before the final commit).
+    """
+    settings = {
+        "synchronous_commit": "off",
+        "work_mem": work_mem or "256MB",
+        "session_replication_role": "replica",
+    }
+    if statement_timeout:
+        settings["statement_timeout"] = f"{int(statement_timeout * 1000)}ms"
+    return settings
+
+
+class SessionProfile:
+    """Apply session settings to a write connection and put the old values back.
+
+    Settings are set at session level, so they survive the commits of a
+    commit policy, and are reset when the profile ends because the
+    connection goes back to a pool afterwards. A setting the role may not
+    change (session_replication_role needs a superuser) is skipped with a
+    warning. Used as a context manager, the time spent under the profile is
+    logged.
+    """
+
+    def __init__(self, cursor, settings, name="bulk_load"):
+        self.cursor = cursor
+        self.settings = dict(settings or {})
+        self.name = name
+        self.previous = {}
+        self.skipped = {}
+        self.start = None
+        self.elapsed = 0.0
+
+    @property
+    def skips_triggers(self):
+        return self.previous.get("session_replication_role") is not None
+
+    def apply(self):
+        for setting, value in self.settings.items():
+            self.cursor.execute("SAVEPOINT session_profile")
+            try:
+                self.cursor.execute("SELECT current_setting(%s)", (setting,))
+                previous = self.cursor.fetchone()[0]
+                self.cursor.execute("SELECT set_config(%s, %s, false)", (setting, value))
+                self.cursor.execute("RELEASE SAVEPOINT session_profile")
+                self.previous[setting] = previous
+            except psycopg2.Error as e:
+                self.cursor.execute("ROLLBACK TO SAVEPOINT session_profile")
+                self.skipped[setting] = str(e).strip()
+                _logger.warning(f"Session profile {self.name}: {setting} left unchanged: {e}")
+        self.start = time.monotonic()
+        return self
+
+    def reset(self):
+        if self.start is None:
+            return
+        self.elapsed = time.monotonic() - self.start
+        self.start = None
+        try:
+            self._restore()
+        except psycopg2.Error:
+            # An aborted transaction refuses every statement until rolled back
+            self.cursor.rollback()
+            self._restore()
+        _logger.info(
+            f"Session profile {self.name}: {self.elapsed:.1f}s with "
+            + ", ".join(f"{setting}={self.settings[setting]}" for setting in self.previous)
+        )
+
+    def _restore(self):
+        for setting, value in self.previous.items():
+            self.cursor.execute("SELECT set_config(%s, %s, false)", (setting, value))
+
+    def __enter__(self):
+        return self.apply()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.reset()
+        return False
+
+
+def session_profile(cursor, settings, name="bulk_load"):
+    """SessionProfile context for ``settings``, a no-op without settings."""
+    if not settings:
+        return contextlib.nullcontext()
+    return SessionProfile(cursor, settings, name=name)
+
+
+def check_foreign_keys(cursor, table_name, sample=5):
+    """Look for rows of a table whose foreign keys point nowhere.
+
+    This is the check the FK triggers would have made while loading under
+    session_replication_role replica. Returns (constraint, referenced
+    table, rows, keys) for every violated constraint, ``keys`` being up to
+    ``sample`` of the missing key values.
+    """
+    cursor.execute(
+        """
+        SELECT c.conname, c.confrelid::regclass::text,
+               ARRAY(
+                   SELECT a.attname FROM unnest(c.conkey) WITH ORDINALITY AS k(attnum, n)
+                   JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+                   ORDER BY k.n
+               ),
+               ARRAY(
+                   SELECT a.attname FROM unnest(c.confkey) WITH ORDINALITY AS k(attnum, n)
+                   JOIN pg_attribute a ON a.attrelid = c.confrelid AND a.attnum = k.attnum
+                   ORDER BY k.n
+               )
+        FROM pg_constraint c
+        WHERE c.contype = 'f' AND c.conrelid = %s::regclass
+        """,
+        (f'"{table_name}"',),
+    )
+    violations = []
+    for name, referenced, columns, referenced_columns in cursor.fetchall():
+        not_null = " AND ".join(f't."{column}" IS NOT NULL' for column in columns)
+        join = " AND ".join(
+            f'r."{ref}" = t."{column}"' for column, ref in zip(columns, referenced_columns)
+        )
+        orphans = f"""
+            FROM "{table_name}" t
+            WHERE {not_null}
+              AND NOT EXISTS (SELECT 1 FROM {referenced} r WHERE {join})
+        """
+        cursor.execute(f"SELECT count(*) {orphans}")
+        count = cursor.fetchone()[0]
+        if count:
+            key = ", ".join(f't."{column}"' for column in columns)
+            cursor.execute(f"SELECT DISTINCT {key} {orphans} LIMIT %s", (sample,))
+            keys = [row[0] if len(row) == 1 else row for row in cursor.fetchall()]
+            violations.append((name, referenced, count, keys))
+    return violations
@@ -0,0 +1,52 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def has_write_date(cursor, table_name):
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'write_date'
+        """,
+        (table_name,),
+    )
+    return bool(cursor.fetchone())
+
+
+def high_water_mark(cursor, table_name):
+    """(write_date, id) of the last written row of an old table, (None, None) when it is empty.
+
+    Two max() lookups instead of sorting the table: with an index on
+    write_date (and the primary key) both are index probes, without one a
+    single scan.
+    """
+    cursor.execute(f"SELECT max(write_date) FROM {table_name}")
+    mark_date = cursor.fetchone()[0]
+    if mark_date is None:
+        return None, None
+    cursor.execute(f"SELECT max(id) FROM {table_name} WHERE write_date = %s", (mark_date,))
+    return mark_date, cursor.fetchone()[0]
+
+
+def delta_query(query, params, table_name, mark_date, mark_id):
+    """Restrict an extraction query selecting ``old_id`` to the rows changed after a mark.
+
+    Changed means a later (write_date, id) than the mark, so rows sharing
+    the write_date of the mark are not lost. Rows without write_date, only
+    inserted by raw SQL, are always taken. Returns (query, params).
+    """
+    base_query = query.strip().rstrip(";")
+    return (
+        f"""
+        SELECT delta.* FROM ({base_query}) AS delta
+        JOIN {table_name} w ON w.id = delta.old_id
+        WHERE w.write_date IS NULL OR (w.write_date, w.id) > (%s, %s)
+        """,
+        tuple(params or ()) + (mark_date, mark_id),
+    )
+
+
+def count_rows(cursor, query, params=None):
+    cursor.execute(f"SELECT count(*) FROM ({query.strip().rstrip(';')}) AS counted", params or None)
+    return cursor.fetchone()[0]